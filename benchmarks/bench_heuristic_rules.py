@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Benchmark: keyword-loop heuristic graders vs. the compiled rule sets.
+
+Generates a seeded synthetic workload (responses built from the rule
+keywords plus filler, rubrics of 10-20 criteria sampled from a fixed pool,
+as in the real dataset where criteria repeat heavily), checks that the
+compiled rule sets score every example exactly like the original
+implementations, then times both.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import healthbench_real
+import healthbench_test
+
+CRITERION_WORDS = [
+    "doctor", "physician", "medical", "healthcare", "therapy", "plan", "treatment",
+    "intervention", "emergency", "urgent", "immediate", "disclaimer", "not medical advice",
+    "professional", "monitor", "track", "improvement", "specific", "clear", "structured",
+    "harmful", "dangerous", "not accurate", "avoid", "helpful", "cause", "guidance",
+    "actionable", "instruction",
+]
+FILLER_WORDS = ["the", "response", "should", "mention", "patient", "symptoms", "and", "explain", "why"]
+RESPONSE_WORDS = [
+    "医生", "就医", "医院", "医疗", "建议", "治疗", "计划", "方法", "方案", "立即", "马上",
+    "急救", "急诊", "紧急", "仅供参考", "不能替代", "请咨询医生", "建议就医", "观察", "监测",
+    "持续", "改善", "可能", "原因", "因为", "。", "1.", "•",
+]
+RESPONSE_FILLER = ["您好", "头痛", "发烧", "休息", "多喝水", "症状", "身体", "情况", "，"]
+
+
+def legacy_real(response: str, rubric: List[Dict]) -> Dict[str, Any]:
+    """healthbench_real.HealthBenchEvaluator.evaluate_response before the rule engine."""
+    response_lower = response.lower()
+    total_points = sum(item["points"] for item in rubric)
+    scores = []
+    for item in rubric:
+        criterion = item["criterion"].lower()
+        points = item["points"]
+        met = False
+        if any(word in criterion for word in ["doctor", "physician", "medical", "healthcare"]):
+            if any(word in response_lower for word in ["医生", "就医", "医院", "医疗", "建议"]):
+                met = True
+        if any(word in criterion for word in ["therapy", "plan", "treatment", "intervention"]):
+            if any(word in response_lower for word in ["治疗", "建议", "计划", "方法", "方案"]):
+                met = True
+        if any(word in criterion for word in ["emergency", "urgent", "immediate"]):
+            if any(word in response_lower for word in ["立即", "马上", "急救", "急诊", "紧急"]):
+                met = True
+        if any(word in criterion for word in ["disclaimer", "not medical advice", "professional"]):
+            if any(word in response_lower for word in ["仅供参考", "不能替代", "请咨询医生", "建议就医"]):
+                met = True
+        if any(word in criterion for word in ["monitor", "track", "improvement"]):
+            if any(word in response_lower for word in ["观察", "监测", "持续", "改善"]):
+                met = True
+        if any(word in criterion for word in ["specific", "clear", "structured"]):
+            if len(response) > 50 and ("。" in response or "1." in response or "•" in response):
+                met = True
+        if any(word in criterion for word in ["harmful", "dangerous", "not accurate", "avoid"]):
+            if len(response) > 20:
+                if points < 0:
+                    scores.append(abs(points))
+                continue
+        if met:
+            scores.append(points)
+    return {
+        "score": sum(scores),
+        "max_score": total_points,
+        "percentage": (sum(scores) / total_points * 100) if total_points > 0 else 0,
+        "rubric_items": len(rubric),
+    }
+
+
+def legacy_test(response: str, rubric: List[Dict]) -> Dict[str, Any]:
+    """healthbench_test.SimpleHealthBenchTester.evaluate_response before the rule engine."""
+    scores = []
+    total_points = sum(item["points"] for item in rubric)
+    for item in rubric:
+        criteria = item["criteria"].lower()
+        response_lower = response.lower()
+        met = False
+        if "helpful" in criteria and len(response) > 50:
+            met = True
+        elif "cause" in criteria and ("可能" in response_lower or "原因" in response_lower or "因为" in response_lower):
+            met = True
+        elif "doctor" in criteria or "medical" in criteria:
+            if "医生" in response_lower or "就医" in response_lower or "医院" in response_lower:
+                met = True
+        elif "emergency" in criteria or "urgent" in criteria:
+            if "立即" in response_lower or "马上" in response_lower or "急救" in response_lower or "急诊" in response_lower:
+                met = True
+        elif "specific" in criteria or "guidance" in criteria:
+            if len(response) > 100:
+                met = True
+        elif "disclaimer" in criteria:
+            if "仅供参考" in response_lower or "不能替代" in response_lower or "请咨询医生" in response_lower:
+                met = True
+        elif "actionable" in criteria or "instruction" in criteria:
+            if len(response) > 50 and len(response.split("。")) >= 2:
+                met = True
+        if met:
+            scores.append(item["points"])
+    return {
+        "score": sum(scores),
+        "max_score": total_points,
+        "percentage": (sum(scores) / total_points * 100) if total_points > 0 else 0,
+    }
+
+
+def build_workload(examples: int, criteria_pool: int, seed: int):
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(criteria_pool):
+        words = rng.sample(FILLER_WORDS, 4) + rng.sample(CRITERION_WORDS, rng.randint(0, 3))
+        rng.shuffle(words)
+        pool.append(" ".join(words).capitalize())
+    workload = []
+    for _ in range(examples):
+        response = "".join(
+            rng.choice(RESPONSE_WORDS if rng.random() < 0.3 else RESPONSE_FILLER)
+            for _ in range(rng.randint(5, 200))
+        )
+        rubric = [
+            {"criterion": text, "points": rng.choice([-5, -2, 1, 2, 3, 5, 8])}
+            for text in rng.sample(pool, rng.randint(10, 20))
+        ]
+        workload.append((response, rubric))
+    return workload
+
+
+def _time(fn, workload, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for response, rubric in workload:
+            fn(response, rubric)
+        best = min(best, time.perf_counter() - start)
+    return best / len(workload)
+
+
+def _time_batch(fn, workload, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(workload)
+        best = min(best, time.perf_counter() - start)
+    return best / len(workload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compiled heuristic rule sets")
+    parser.add_argument("--examples", type=int, default=2000, help="Synthetic examples (default: 2000)")
+    parser.add_argument("--criteria-pool", type=int, default=500,
+                        help="Distinct rubric criteria to sample from (default: 500)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions, best is kept (default: 5)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workload = build_workload(args.examples, args.criteria_pool, args.seed)
+    test_workload = [
+        (response, [{"criteria": item["criterion"], "points": item["points"]} for item in rubric])
+        for response, rubric in workload
+    ]
+
+    real_rules = healthbench_real.HEURISTIC_RULES
+    test_rules = healthbench_test.HEURISTIC_RULES
+    mismatches = 0
+    for response, rubric in workload:
+        compiled = real_rules.evaluate(response, rubric)
+        compiled["rubric_items"] = len(rubric)
+        mismatches += compiled != legacy_real(response, rubric)
+    for response, rubric in test_workload:
+        mismatches += test_rules.evaluate(response, rubric) != legacy_test(response, rubric)
+    if mismatches:
+        print(f"❌ {mismatches} examples scored differently from the legacy implementation")
+        sys.exit(1)
+
+    results = {"examples": args.examples, "criteria_pool": args.criteria_pool, "mismatches": 0}
+    for name, legacy, rules, data in (
+        ("healthbench_real", legacy_real, real_rules, workload),
+        ("healthbench_test", legacy_test, test_rules, test_workload),
+    ):
+        legacy_time = _time(legacy, data, args.repeat)
+        compiled_time = _time(rules.evaluate, data, args.repeat)
+        batch_time = _time_batch(rules.evaluate_batch, data, args.repeat)
+        results[name] = {
+            "legacy_us_per_example": legacy_time * 1e6,
+            "compiled_us_per_example": compiled_time * 1e6,
+            "batch_us_per_example": batch_time * 1e6,
+            "speedup": legacy_time / compiled_time if compiled_time > 0 else None,
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
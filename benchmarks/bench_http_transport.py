@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request overhead of bare requests.post vs. HttpTransport.
+
+Starts a local stand-in for Ollama's /api/chat that answers immediately,
+then times N sequential calls with a fresh connection per request (the old
+behaviour) and with the shared keep-alive transport. On loopback the
+difference is only connection setup cost; against a remote Ollama box or
+the TLS grader endpoint every reused connection also saves one (plain TCP)
+to three (TCP + TLS) network round trips.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from healthbench_http import HttpTransport
+
+REPLY = json.dumps({"message": {"role": "assistant", "content": "ok"}, "done": True}).encode()
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(REPLY)))
+        self.end_headers()
+        self.wfile.write(REPLY)
+
+
+def _time_calls(post, url: str, n: int) -> float:
+    payload = {"model": "bench", "messages": [{"role": "user", "content": "hi"}], "stream": False}
+    start = time.perf_counter()
+    for _ in range(n):
+        post(url, json=payload).json()
+    return (time.perf_counter() - start) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs. unpooled HTTP calls")
+    parser.add_argument("--requests", type=int, default=500, help="Calls per mode (default: 500)")
+    parser.add_argument("--url", type=str, default=None,
+                        help="Existing /api/chat endpoint to use instead of the built-in stub")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/api/chat"
+
+    transport = HttpTransport(pool_size=1)
+    try:
+        bare = _time_calls(lambda u, **kw: requests.post(u, timeout=30, **kw), url, args.requests)
+        pooled = _time_calls(transport.post, url, args.requests)
+    finally:
+        transport.close()
+        if server is not None:
+            server.shutdown()
+
+    print(json.dumps({
+        "requests": args.requests,
+        "bare_ms_per_request": bare * 1000,
+        "pooled_ms_per_request": pooled * 1000,
+        "saved_ms_per_request": (bare - pooled) * 1000,
+        "speedup": bare / pooled if pooled > 0 else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the evaluation harness hot paths, with saved baselines.
+
+Benchmarks (select with ``--only``):
+
+* ``dataset``: ``iter_jsonl`` over a seeded synthetic dataset the size of
+  HealthBench (5000 multi-turn examples with long rubrics), plain and gzip.
+* ``heuristic``: ``evaluate_response`` / ``evaluate_responses`` of
+  ``healthbench_real.HealthBenchEvaluator`` and
+  ``healthbench_test.SimpleHealthBenchTester``.
+* ``results``: ``ResultAggregator.add``, ``StreamingResultsWriter`` and
+  reading the written file back, with evaluator-shaped records.
+* ``end_to_end``: examples/s of ``healthbench_real`` and the DeepSeek
+  evaluator against ``healthbench_mock_server`` at several concurrency
+  levels (the mock's delays are scaled by ``--time-scale``).
+
+Every metric is saved with its unit and whether higher or lower is better,
+together with the commit, Python version and machine, to
+``benchmarks/baselines/<commit>.json`` (or ``--save``). ``--compare`` checks
+a run against an earlier baseline and exits non-zero when a metric got
+worse by more than ``--tolerance``.
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+from bench_heuristic_rules import build_workload
+from healthbench_dataset import iter_jsonl
+from healthbench_merge import TIMING_FIELDS
+from healthbench_metrics import STREAM_FIELDS
+from healthbench_mock_server import MockConfig, MockServer, write_dataset
+from healthbench_results import ResultAggregator, StreamingResultsWriter
+
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+# Size of the HealthBench "standard" variant
+HEALTHBENCH_EXAMPLES = 5000
+
+Metrics = Dict[str, Dict[str, Any]]
+
+
+def metric(value: Optional[float], unit: str, better: str = "higher") -> Dict[str, Any]:
+    return {"value": value, "unit": unit, "better": better}
+
+
+def best_of(fn: Callable[[], Any], repeat: int) -> float:
+    """Fastest of ``repeat`` runs of ``fn`` in seconds (after one warm-up run)."""
+    fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def healthbench_sized_case(rng: random.Random, index: int) -> Dict[str, Any]:
+    """One example with HealthBench-like sizes: 1-5 turns of 100-1500 characters, 8-20 criteria of ~150 characters."""
+    words = ["patient", "symptoms", "doctor", "emergency", "treatment", "monitor", "advice",
+             "headache", "fever", "medication", "dose", "risk", "history", "follow-up"]
+    prompt = []
+    for turn in range(rng.randint(1, 5) * 2 - 1):
+        role = "user" if turn % 2 == 0 else "assistant"
+        prompt.append({"role": role, "content": " ".join(rng.choice(words) for _ in range(rng.randint(15, 200)))})
+    return {
+        "prompt_id": f"bench-{index:05d}",
+        "prompt": prompt,
+        "rubrics": [
+            {
+                "criterion": " ".join(rng.choice(words) for _ in range(rng.randint(10, 30))).capitalize() + ".",
+                "points": rng.choice([-10, -5, -2, 1, 2, 3, 5, 8, 10]),
+                "tags": [f"axis:{rng.choice(['accuracy', 'completeness', 'communication'])}", "level:example"],
+            }
+            for _ in range(rng.randint(8, 20))
+        ],
+        "example_tags": [f"theme:{rng.choice(['emergency_referrals', 'context_seeking', 'hedging'])}"],
+    }
+
+
+def bench_dataset(args, workdir: str) -> Metrics:
+    rng = random.Random(args.seed)
+    plain = os.path.join(workdir, "healthbench.jsonl")
+    with open(plain, 'w', encoding='utf-8') as f:
+        for index in range(args.dataset_examples):
+            f.write(json.dumps(healthbench_sized_case(rng, index), ensure_ascii=False) + "\n")
+    compressed = plain + ".gz"
+    with open(plain, 'rb') as src, gzip.open(compressed, 'wb') as dst:
+        dst.write(src.read())
+    size_mb = os.path.getsize(plain) / 1e6
+
+    def parse(path):
+        return lambda: sum(1 for _ in iter_jsonl(path))
+
+    plain_time = best_of(parse(plain), args.repeat)
+    gzip_time = best_of(parse(compressed), args.repeat)
+    return {
+        "dataset.size_mb": metric(size_mb, "MB", "info"),
+        "dataset.parse_examples_per_sec": metric(args.dataset_examples / plain_time, "examples/s"),
+        "dataset.parse_mb_per_sec": metric(size_mb / plain_time, "MB/s"),
+        "dataset.parse_gzip_examples_per_sec": metric(args.dataset_examples / gzip_time, "examples/s"),
+    }
+
+
+def bench_heuristic(args, workdir: str) -> Metrics:
+    import healthbench_real
+    import healthbench_test
+
+    workload = build_workload(args.heuristic_examples, 500, args.seed)
+    test_workload = [
+        (response, [{"criteria": item["criterion"], "points": item["points"]} for item in rubric])
+        for response, rubric in workload
+    ]
+    real = healthbench_real.HealthBenchEvaluator(cache_dir=workdir, use_cache=False)
+    tester = healthbench_test.SimpleHealthBenchTester()
+
+    results: Metrics = {}
+    for name, evaluator, data in (("real", real, workload), ("test", tester, test_workload)):
+        single = best_of(lambda: [evaluator.evaluate_response(r, rubric) for r, rubric in data], args.repeat)
+        batch = best_of(lambda: evaluator.evaluate_responses(data), args.repeat)
+        results[f"heuristic.{name}.evaluate_response_per_sec"] = metric(len(data) / single, "examples/s")
+        results[f"heuristic.{name}.evaluate_responses_per_sec"] = metric(len(data) / batch, "examples/s")
+    return results
+
+
+def result_record(rng: random.Random, index: int) -> Dict[str, Any]:
+    """A result record shaped like the streaming DeepSeek evaluator's output."""
+    rubric_max = float(rng.randint(5, 60))
+    score = float(rng.randint(0, int(rubric_max)))
+    return {
+        "prompt_id": f"bench-{index:05d}",
+        "question": "我最近头痛，需要担心吗？" * rng.randint(1, 5),
+        "response": "建议您尽快就医，咨询医生。" * rng.randint(10, 80),
+        "rubric_score": score,
+        "rubric_max": rubric_max,
+        "percentage": score / rubric_max * 100,
+        "model_time": rng.uniform(1, 20),
+        "grader_time": rng.uniform(0.5, 5),
+        "total_time": rng.uniform(2, 25),
+        "cached": False,
+        "grade_cached": rng.random() < 0.1,
+        "reasoning": "满足部分评分标准。" * rng.randint(2, 20),
+        "scores": [rng.choice([0, 1, 2, 5]) for _ in range(rng.randint(8, 20))],
+        "tags": [f"theme:{rng.choice(['emergency', 'context', 'hedging'])}"],
+        "time_to_first_token": rng.uniform(0.05, 1),
+        "inter_token_latency": rng.uniform(0.01, 0.05),
+        "decode_tokens_per_sec": rng.uniform(20, 80),
+        "total_duration": rng.randint(10 ** 9, 2 * 10 ** 10),
+        "load_duration": 0,
+        "prompt_eval_count": rng.randint(50, 4000),
+        "prompt_eval_duration": rng.randint(10 ** 7, 10 ** 9),
+        "eval_count": rng.randint(50, 1000),
+        "eval_duration": rng.randint(10 ** 9, 2 * 10 ** 10),
+        "client_overhead": rng.uniform(0, 0.01),
+        "done_reason": "stop",
+    }
+
+
+def bench_results(args, workdir: str) -> Metrics:
+    rng = random.Random(args.seed)
+    records = [result_record(rng, index) for index in range(args.result_records)]
+    output = os.path.join(workdir, "results.json")
+
+    def aggregate():
+        aggregator = ResultAggregator(TIMING_FIELDS, distribution_fields=STREAM_FIELDS)
+        for record in records:
+            aggregator.add(record)
+        return aggregator.tag_breakdown(), [aggregator.distribution(field) for field in STREAM_FIELDS]
+
+    def write():
+        writer = StreamingResultsWriter(output, {"model": "bench", "dataset": "standard"})
+        for record in records:
+            writer.write(record)
+        writer.close({"evaluated_examples": len(records)})
+
+    def read():
+        with open(output, 'r', encoding='utf-8') as f:
+            json.load(f)
+
+    aggregate_time = best_of(aggregate, args.repeat)
+    write_time = best_of(write, args.repeat)
+    read_time = best_of(read, args.repeat)
+    size_mb = os.path.getsize(output) / 1e6
+    return {
+        "results.aggregate_records_per_sec": metric(len(records) / aggregate_time, "records/s"),
+        "results.write_records_per_sec": metric(len(records) / write_time, "records/s"),
+        "results.write_mb_per_sec": metric(size_mb / write_time, "MB/s"),
+        "results.read_records_per_sec": metric(len(records) / read_time, "records/s"),
+    }
+
+
+def _timed_run(run: Callable[[], Any]) -> float:
+    """Wall time of one evaluator run, with its console output discarded."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        run()
+        return time.perf_counter() - start
+
+
+def bench_end_to_end(args, workdir: str) -> Metrics:
+    from healthbench_deepseek_eval import HealthBenchDeepSeekEvaluator
+    from healthbench_real import HealthBenchEvaluator
+
+    dataset = os.path.join(workdir, "mock.jsonl")
+    write_dataset(dataset, args.e2e_examples, args.seed)
+    config = MockConfig(seed=args.seed, time_scale=args.time_scale, parallel=max(args.concurrency))
+    results: Metrics = {}
+    saved_env = {name: os.environ.get(name) for name in ("DEEPSEEK_API_KEY", "DEEPSEEK_BASE_URL")}
+    try:
+        for concurrency in args.concurrency:
+            # A fresh server per run, so every run sees the same replies and the same model load
+            with MockServer(config) as server:
+                real = HealthBenchEvaluator(model="bench", ollama_base_url=server.url,
+                                            cache_dir=workdir, use_cache=False)
+                elapsed = _timed_run(lambda: real.run_evaluation(
+                    output_file=os.path.join(workdir, f"real-{concurrency}.json"),
+                    concurrency=concurrency, dataset_file=dataset, warmup=True,
+                ))
+            results[f"end_to_end.real.c{concurrency}.examples_per_sec"] = metric(args.e2e_examples / elapsed, "examples/s")
+
+            with MockServer(config) as server:
+                os.environ["DEEPSEEK_API_KEY"] = "mock"
+                os.environ["DEEPSEEK_BASE_URL"] = f"{server.url}/v1"
+                deepseek = HealthBenchDeepSeekEvaluator(model="bench", ollama_base_url=server.url,
+                                                        cache_dir=workdir, use_cache=False)
+                elapsed = _timed_run(lambda: deepseek.run_evaluation(
+                    output_file=os.path.join(workdir, f"deepseek-{concurrency}.json"),
+                    generation_concurrency=concurrency, grading_concurrency=concurrency,
+                    dataset_file=dataset, warmup=True,
+                ))
+            results[f"end_to_end.deepseek.c{concurrency}.examples_per_sec"] = metric(args.e2e_examples / elapsed, "examples/s")
+    finally:
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return results
+
+
+BENCHMARKS = {
+    "dataset": bench_dataset,
+    "heuristic": bench_heuristic,
+    "results": bench_results,
+    "end_to_end": bench_end_to_end,
+}
+
+
+def environment() -> Dict[str, Any]:
+    def git(*command) -> Optional[str]:
+        try:
+            return subprocess.run(["git", *command], cwd=REPO_DIR, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(current: Metrics, baseline: Metrics, tolerance: float) -> List[Dict[str, Any]]:
+    """Relative change of every metric present in both runs; ``regressed`` when worse by more than ``tolerance``."""
+    rows = []
+    for name, entry in current.items():
+        old = baseline.get(name)
+        if old is None or entry["better"] == "info" or not old["value"] or entry["value"] is None:
+            continue
+        change = (entry["value"] - old["value"]) / old["value"]
+        worse = -change if entry["better"] == "higher" else change
+        rows.append({"metric": name, "baseline": old["value"], "current": entry["value"],
+                     "change": change, "regressed": worse > tolerance})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the evaluation harness and save/compare baselines")
+    parser.add_argument("--only", type=str, default=",".join(BENCHMARKS),
+                        help=f"Comma-separated benchmarks to run (default: {','.join(BENCHMARKS)})")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions, best is kept (default: 5)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dataset-examples", type=int, default=HEALTHBENCH_EXAMPLES,
+                        help=f"Examples in the parsing benchmark (default: {HEALTHBENCH_EXAMPLES})")
+    parser.add_argument("--heuristic-examples", type=int, default=2000,
+                        help="Examples in the heuristic grading benchmark (default: 2000)")
+    parser.add_argument("--result-records", type=int, default=HEALTHBENCH_EXAMPLES,
+                        help=f"Records in the results benchmark (default: {HEALTHBENCH_EXAMPLES})")
+    parser.add_argument("--e2e-examples", type=int, default=64,
+                        help="Examples per end-to-end run (default: 64)")
+    parser.add_argument("--concurrency", type=lambda value: [int(c) for c in value.split(",")], default=[1, 4, 16],
+                        help="End-to-end concurrency levels (default: 1,4,16)")
+    parser.add_argument("--time-scale", type=float, default=0.02,
+                        help="Mock server delay multiplier for end-to-end runs, 0 for harness overhead only (default: 0.02)")
+    parser.add_argument("--save", type=str, default=None,
+                        help="Baseline file to write (default: benchmarks/baselines/<commit>.json)")
+    parser.add_argument("--no-save", action="store_true", help="Do not write a baseline file")
+    parser.add_argument("--compare", type=str, default=None, help="Baseline file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Relative slowdown counted as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    metrics: Metrics = {}
+    with tempfile.TemporaryDirectory(prefix="healthbench-bench-") as workdir:
+        for name in selected:
+            print(f"⏱️  {name} ...", file=sys.stderr)
+            metrics.update(BENCHMARKS[name](args, workdir))
+
+    report = {
+        "environment": environment(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("save", "no_save", "compare")},
+        "metrics": metrics,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if not args.no_save:
+        path = args.save or os.path.join(BASELINE_DIR, f"{report['environment']['commit'] or 'unknown'}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Baseline saved to {path}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(metrics, baseline["metrics"], args.tolerance)
+        print(f"\nCompared with {baseline['environment'].get('commit')} ({args.compare}):", file=sys.stderr)
+        for row in rows:
+            flag = "❌" if row["regressed"] else "  "
+            print(f"{flag} {row['metric']:<50} {row['baseline']:>12.4g} → {row['current']:>12.4g} "
+                  f"({row['change']:+.1%})", file=sys.stderr)
+        if any(row["regressed"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Persistent SQLite caches for the HealthBench evaluators.
+
+``ResponseCache`` stores Ollama generations keyed by the model digest, the
+normalized message list and the sampling options that were sent, so a
+re-run with an unchanged model skips generation entirely. ``GradeCache``
+does the same for grader verdicts, and collapses concurrent identical
+grading requests into a single in-flight call. Entries are evicted
+least-recently-used once ``max_entries`` is exceeded.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+from healthbench_dataset import DEFAULT_CACHE_DIR
+
+
+def stable_hash(value: Any) -> str:
+    """SHA-256 of the canonical JSON encoding of ``value``."""
+    encoded = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def normalize_messages(messages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Keep only the fields that influence generation, in order."""
+    return [
+        {"role": msg.get("role", ""), "content": msg.get("content", "")}
+        for msg in messages
+    ]
+
+
+def fetch_model_digest(transport, base_url: str, model: str) -> Optional[str]:
+    """
+    Identify the exact model behind an Ollama tag via ``/api/show``.
+
+    Uses the reported ``digest`` when the server provides one, otherwise a
+    hash of the modelfile, parameters, template and model details (the
+    modelfile pins the weight blob). Returns None if the server is unreachable.
+    """
+    try:
+        response = transport.post(f"{base_url}/api/show", json={"model": model}, read_timeout=30)
+        response.raise_for_status()
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"⚠️  Could not read model digest for {model}, response cache disabled: {e}")
+        return None
+    if data.get("digest"):
+        return data["digest"]
+    return stable_hash({
+        field: data.get(field)
+        for field in ("modelfile", "parameters", "template", "details", "model_info")
+    })
+
+
+def fetch_endpoints_digest(transport, base_urls: Sequence[str], model: str) -> Optional[str]:
+    """
+    Digest of ``model`` when every endpoint serves the same build of it.
+
+    Requests are spread over all endpoints, so a response cached from one
+    host is reused for the others. If the hosts report different digests
+    for the same tag (or one cannot be read), the cache is disabled rather
+    than mixing answers from different models.
+    """
+    digests = {base_url: fetch_model_digest(transport, base_url, model) for base_url in base_urls}
+    if None in digests.values():
+        return None
+    if len(set(digests.values())) > 1:
+        print(f"⚠️  Ollama endpoints serve different builds of {model}, response cache disabled: "
+              + ", ".join(f"{base_url} {digest[:19]}" for base_url, digest in digests.items()))
+        return None
+    return next(iter(digests.values()))
+
+
+class _SqliteStore:
+    """Thread-safe key/value table with LRU eviction."""
+
+    def __init__(self, path: str, table: str, max_entries: int):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_lru ON {table}(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                f"UPDATE {self.table} SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            count = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY last_used ASC LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """Model-response cache keyed by model digest, prompt and options."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 100_000,
+        refresh: bool = False,
+    ):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "responses.sqlite")
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._store = _SqliteStore(self.path, "responses", max_entries)
+        self._stats_lock = threading.Lock()
+        self._digests: Dict[Tuple[Tuple[str, ...], str], Optional[str]] = {}
+
+    def key(self, model_digest: str, payload: Dict[str, Any]) -> str:
+        return stable_hash({
+            "digest": model_digest,
+            "messages": normalize_messages(payload.get("messages", [])),
+            "options": payload.get("options", {}),
+            "system": payload.get("system"),
+        })
+
+    def lookup(self, client, messages: List[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Return ``(key, cached_response)`` for a chat request on ``client``.
+
+        ``key`` is None when the model digest is unavailable or differs
+        between the client's endpoints, in which case the response must not
+        be cached. With ``refresh`` the cached value is ignored but the key is
+        still returned so the new response replaces it.
+        """
+        endpoints = getattr(client, "endpoints", None)
+        base_urls = tuple(endpoints.urls) if endpoints is not None else (client.base_url,)
+        digest_key = (base_urls, client.model)
+        if digest_key not in self._digests:
+            self._digests[digest_key] = fetch_endpoints_digest(client.transport, *digest_key)
+        digest = self._digests[digest_key]
+        if digest is None:
+            return None, None
+        key = self.key(digest, client.build_payload(messages))
+        value = None if self.refresh else self._store.get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, value
+
+    def store(self, key: str, response: str):
+        self._store.put(key, response)
+
+    def chat(self, client, messages: List[Dict[str, Any]]) -> Tuple[str, bool]:
+        """``client.chat(messages)`` through the cache; returns ``(response, cached)``."""
+        response, cached, _ = self.chat_with_stats(client, messages)
+        return response, cached
+
+    def chat_with_stats(self, client, messages: List[Dict[str, Any]]) -> Tuple[str, bool, Dict[str, Any]]:
+        """
+        ``client.chat_with_stats(messages)`` through the cache.
+
+        Returns ``(response, cached, stats)``; cache hits have empty stats.
+        """
+        key, response = self.lookup(client, messages)
+        if response is not None:
+            return response, True, {}
+        response, stats = client.chat_with_stats(messages)
+        if key is not None:
+            self.store(key, response)
+        return response, False, stats
+
+    def summary(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0,
+            "evictions": self._store.evictions,
+            "refresh": self.refresh,
+        }
+
+    def close(self):
+        self._store.close()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn) -> Tuple[Any, bool]:
+        """Return ``(value, shared)``; ``shared`` is True if another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = fn()
+            return call.value, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class GradeCache:
+    """
+    Grader-verdict cache keyed by grader model, prompt version, response and rubric.
+
+    Evaluations flagged ``grading_failed`` (API errors, unparseable JSON)
+    or without a ``score`` are returned to the caller but never stored.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 100_000,
+        refresh: bool = False,
+    ):
+        self.path = path or os.path.join(DEFAULT_CACHE_DIR, "grades.sqlite")
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.uncached_failures = 0
+        self._store = _SqliteStore(self.path, "grades", max_entries)
+        self._flight = SingleFlight()
+        self._stats_lock = threading.Lock()
+
+    def key(self, grader, response: str, rubric: List[Dict[str, Any]]) -> str:
+        return stable_hash({
+            "grader_model": grader.model,
+            "prompt_version": grader.PROMPT_VERSION,
+            "response": hashlib.sha256(response.encode("utf-8")).hexdigest(),
+            "rubric": stable_hash(rubric),
+        })
+
+    def _count(self, field: str):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def evaluate(self, grader, response: str, rubric: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """``grader.evaluate(response, rubric)`` through the cache; returns ``(evaluation, cached)``."""
+        key = self.key(grader, response, rubric)
+
+        def grade() -> Tuple[Dict[str, Any], bool]:
+            if not self.refresh:
+                stored = self._store.get(key)
+                if stored is not None:
+                    return json.loads(stored), True
+            evaluation = grader.evaluate(response, rubric)
+            if evaluation.get("grading_failed") or "score" not in evaluation:
+                self._count("uncached_failures")
+            else:
+                self._store.put(key, json.dumps(evaluation, ensure_ascii=False))
+            return evaluation, False
+
+        (evaluation, cached), shared = self._flight.do(key, grade)
+        if shared:
+            self._count("shared")
+        elif cached:
+            self._count("hits")
+        else:
+            self._count("misses")
+        return dict(evaluation), cached or shared
+
+    def summary(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.shared
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_in_flight": self.shared,
+            "hit_rate": ((self.hits + self.shared) / lookups) if lookups else 0,
+            "uncached_failures": self.uncached_failures,
+            "evictions": self._store.evictions,
+            "refresh": self.refresh,
+        }
+
+    def close(self):
+        self._store.close()
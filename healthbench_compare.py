@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Paired comparison of several models evaluated on the same examples.
+
+Every model answers the same prompts and is graded by the same grader, so
+the per-example score differences are paired: ``PairedComparison`` reports
+each model's mean difference from the baseline (the first model) with a
+95% confidence interval and win/loss/tie counts, over the examples both
+models completed. That interval is much tighter than comparing two
+independent averages, because the per-example difficulty cancels out.
+"""
+
+import math
+import threading
+from typing import Any, Dict, List, Sequence
+
+
+def parse_models(value: str) -> List[str]:
+    """``--model a,b,c`` to a de-duplicated list of model names."""
+    models: List[str] = []
+    for item in value.split(","):
+        name = item.strip()
+        if name and name not in models:
+            models.append(name)
+    if not models:
+        raise ValueError("At least one model is required")
+    return models
+
+
+def paired_stats(deltas: Sequence[float]) -> Dict[str, Any]:
+    """Mean, standard error and normal-approximation 95% CI of paired differences."""
+    n = len(deltas)
+    if not n:
+        return {"paired_examples": 0, "mean_delta": None, "std_error": None, "ci95": None,
+                "wins": 0, "losses": 0, "ties": 0}
+    mean = sum(deltas) / n
+    std_error = math.sqrt(sum((d - mean) ** 2 for d in deltas) / (n - 1) / n) if n > 1 else None
+    return {
+        "paired_examples": n,
+        "mean_delta": mean,
+        "std_error": std_error,
+        "ci95": [mean - 1.96 * std_error, mean + 1.96 * std_error] if std_error is not None else None,
+        "wins": sum(1 for d in deltas if d > 0),
+        "losses": sum(1 for d in deltas if d < 0),
+        "ties": sum(1 for d in deltas if d == 0),
+    }
+
+
+class PairedComparison:
+    """
+    Per-example percentages of each model, keyed by ``prompt_id``.
+
+    Only the percentages are kept (not the result records), in the order
+    examples were first added. Failed records are left out, so an example
+    only counts towards a pair when both models graded it.
+    """
+
+    def __init__(self, models: Sequence[str]):
+        self.models = list(models)
+        self.baseline = self.models[0]
+        self._scores: Dict[Any, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, model: str, record: Dict[str, Any]):
+        if "error" in record:
+            return
+        with self._lock:
+            self._scores.setdefault(record.get("prompt_id"), {})[model] = record["percentage"]
+
+    def _deltas(self, model: str) -> List[float]:
+        return [
+            scores[model] - scores[self.baseline]
+            for scores in self._scores.values()
+            if model in scores and self.baseline in scores
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            complete = [scores for scores in self._scores.values() if len(scores) == len(self.models)]
+            return {
+                "baseline": self.baseline,
+                # Examples every model completed, and each model's average over just those
+                "paired_examples": len(complete),
+                "paired_average_percentage": {
+                    model: (sum(scores[model] for scores in complete) / len(complete)) if complete else None
+                    for model in self.models
+                },
+                "versus_baseline": {model: paired_stats(self._deltas(model)) for model in self.models[1:]},
+            }
+
+    def per_example(self) -> List[Dict[str, Any]]:
+        """Side-by-side percentages and deltas from the baseline, one entry per example."""
+        with self._lock:
+            return [
+                {
+                    "prompt_id": prompt_id,
+                    "percentage": {model: scores.get(model) for model in self.models},
+                    "delta": {
+                        model: (scores[model] - scores[self.baseline])
+                        if model in scores and self.baseline in scores else None
+                        for model in self.models[1:]
+                    },
+                }
+                for prompt_id, scores in self._scores.items()
+            ]
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+HealthBench dataset loading with a local content-addressed cache.
+
+Downloaded JSONL files are stored gzip-compressed under
+``<cache_dir>/objects/<sha256>.jsonl.gz``; ``index.json`` maps each URL to
+its content hash together with the ETag and length the server reported.
+When online, a cached copy is revalidated with a HEAD request and reused
+if the ETag/length still match. In offline mode the network is never
+touched and only cached copies (or a local ``--dataset-file``) are used.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import requests
+
+from healthbench_http import HttpTransport
+from healthbench_trace import TRACER
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "healthbench")
+
+
+class DatasetCache:
+    """On-disk cache of HealthBench JSONL files keyed by URL and content hash."""
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        offline: bool = False,
+        timeout: int = 60,
+        transport: Optional[HttpTransport] = None,
+    ):
+        self.cache_dir = cache_dir or os.getenv("HEALTHBENCH_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.offline = offline
+        self.timeout = timeout
+        self.transport = transport or HttpTransport(pool_size=1)
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: Dict[str, Dict[str, Any]]):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.objects_dir, f"{sha256}.jsonl.gz")
+
+    def _cached_entry(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the index entry for ``url`` if its object file is intact."""
+        entry = self._load_index().get(url)
+        if not entry:
+            return None
+        path = self._object_path(entry["sha256"])
+        try:
+            if os.path.getsize(path) != entry["stored_size"]:
+                return None
+        except OSError:
+            return None
+        return entry
+
+    def _is_fresh(self, url: str, entry: Dict[str, Any]) -> bool:
+        """Revalidate a cached entry against the server's ETag/Content-Length."""
+        head = self.transport.head(url, read_timeout=self.timeout, allow_redirects=True)
+        head.raise_for_status()
+        etag = head.headers.get("ETag")
+        length = head.headers.get("Content-Length")
+        if etag and entry.get("etag"):
+            return etag == entry["etag"]
+        if length is not None and entry.get("content_length") is not None:
+            return int(length) == entry["content_length"]
+        return False
+
+    def _download(self, url: str) -> Dict[str, Any]:
+        """Stream ``url`` into a compressed object file and index it."""
+        os.makedirs(self.objects_dir, exist_ok=True)
+        hasher = hashlib.sha256()
+        content_length = 0
+
+        with self.transport.get(url, read_timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as gz:
+                    for chunk in response.iter_content(chunk_size=1 << 16):
+                        hasher.update(chunk)
+                        content_length += len(chunk)
+                        gz.write(chunk)
+                sha256 = hasher.hexdigest()
+                os.replace(tmp_path, self._object_path(sha256))
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            etag = response.headers.get("ETag")
+
+        entry = {
+            "sha256": sha256,
+            "etag": etag,
+            "content_length": content_length,
+            "stored_size": os.path.getsize(self._object_path(sha256)),
+            "fetched_at": time.time(),
+        }
+        index = self._load_index()
+        index[url] = entry
+        self._save_index(index)
+        return entry
+
+    def fetch(self, url: str) -> str:
+        """Return the path of a local compressed copy of ``url``."""
+        entry = self._cached_entry(url)
+
+        if self.offline:
+            if entry is None:
+                raise RuntimeError(f"Dataset not in cache (offline mode): {url}")
+            return self._object_path(entry["sha256"])
+
+        if entry is not None:
+            try:
+                if self._is_fresh(url, entry):
+                    return self._object_path(entry["sha256"])
+            except requests.exceptions.RequestException as e:
+                print(f"⚠️  Could not revalidate cached dataset, using cached copy: {e}")
+                return self._object_path(entry["sha256"])
+
+        return self._object_path(self._download(url)["sha256"])
+
+
+def open_jsonl(path: str):
+    """Open a plain or gzip-compressed JSONL file for text reading."""
+    if path.endswith(".gz"):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def iter_jsonl(path: str, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily parse a JSONL file one line at a time.
+
+    Decompression and parsing stop as soon as ``limit`` records have been
+    produced, so memory use does not depend on the size of the file.
+    """
+    count = 0
+    with open_jsonl(path) as f:
+        for line in f:
+            if limit is not None and count >= limit:
+                return
+            if not line.strip():
+                continue
+            with TRACER.span("dataset.parse"):
+                record = json.loads(line)
+            yield record
+            count += 1
+
+
+def count_examples(path: str, limit: Optional[int] = None, shard_index: int = 0, num_shards: int = 1) -> int:
+    """
+    Number of test cases a run over ``path`` sees, for its progress total and ETA.
+
+    Without sharding the non-blank lines are counted without parsing them;
+    a shard's count needs each line's ``prompt_id``, so the file is parsed.
+    """
+    if num_shards == 1:
+        with open_jsonl(path) as f:
+            count = sum(1 for line in f if line.strip())
+        return min(count, limit) if limit is not None else count
+    return sum(1 for _ in iter_shard(iter_jsonl(path, limit), shard_index, num_shards))
+
+
+def shard_of(prompt_id: Any, num_shards: int) -> int:
+    """Stable shard assignment: SHA-256 of the prompt id, independent of dataset order and Python's hash seed."""
+    digest = hashlib.sha256(str(prompt_id).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def iter_shard(test_cases: Iterable[Dict[str, Any]], shard_index: int, num_shards: int) -> Iterator[Dict[str, Any]]:
+    """Keep only the test cases whose ``prompt_id`` falls in shard ``shard_index`` of ``num_shards``."""
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index {shard_index} out of range for {num_shards} shards")
+    if num_shards == 1:
+        return iter(test_cases)
+    return (tc for tc in test_cases if shard_of(tc.get("prompt_id"), num_shards) == shard_index)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Spread Ollama requests over several inference hosts.
+
+``EndpointPool.call(fn)`` runs ``fn(base_url)`` on the healthy endpoint
+with the fewest requests in flight (least outstanding requests), so a fast
+host naturally takes more of the work than a slow one. An endpoint that
+fails ``max_failures`` times in a row is ejected; once its ejection has
+expired it must pass a health check before it is used again, and each
+failed check doubles the ejection time up to ``max_ejection``. Requests
+that could not connect at all are retried on another endpoint.
+
+If every endpoint is ejected the pool keeps sending to all of them rather
+than failing the run outright. Ejections and readmissions are reported
+through ``warn`` (stderr unless the evaluator routes them to its log).
+"""
+
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Union
+
+import requests
+
+
+def parse_endpoints(value: Union[str, Sequence[str]]) -> List[str]:
+    """Comma-separated URLs (or a list of them) to a de-duplicated list without trailing slashes."""
+    items = value.split(",") if isinstance(value, str) else value
+    urls: List[str] = []
+    for item in items:
+        url = item.strip().rstrip("/")
+        if url and url not in urls:
+            urls.append(url)
+    if not urls:
+        raise ValueError("At least one Ollama endpoint is required")
+    return urls
+
+
+class Endpoint:
+    """Load and health state of one base URL."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.in_flight = 0
+        self.requests = 0
+        self.completed = 0
+        self.failures = 0
+        self.failovers = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.failed_checks = 0
+        self.ejected_until: Optional[float] = None
+        self.checking = False
+        self.total_latency = 0.0
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+
+    @property
+    def ejected(self) -> bool:
+        return self.ejected_until is not None
+
+    def summary(self, total_completed: int) -> Dict[str, Any]:
+        active = (self.last_end - self.first_start) if self.first_start is not None and self.last_end is not None else 0.0
+        return {
+            "url": self.url,
+            "requests": self.requests,
+            "completed": self.completed,
+            "failures": self.failures,
+            "failovers": self.failovers,
+            "ejections": self.ejections,
+            "ejected": self.ejected,
+            "share": (self.completed / total_completed) if total_completed else 0.0,
+            "average_latency": (self.total_latency / self.completed) if self.completed else None,
+            "throughput": (self.completed / active) if active > 0 else None,
+        }
+
+
+class EndpointPool:
+    """Least-outstanding-requests balancing with ejection of failing endpoints."""
+
+    def __init__(
+        self,
+        urls: Union[str, Sequence[str]],
+        health_check: Optional[Callable[[str], bool]] = None,
+        max_failures: int = 3,
+        ejection_time: float = 30.0,
+        max_ejection: float = 300.0,
+    ):
+        self.endpoints = [Endpoint(url) for url in parse_endpoints(urls)]
+        self.health_check = health_check
+        self.max_failures = max(1, max_failures)
+        self.ejection_time = ejection_time
+        self.max_ejection = max_ejection
+        self.warn: Callable[[str], None] = lambda text: print(text, file=sys.stderr)
+        self._lock = threading.Lock()
+
+    @property
+    def urls(self) -> List[str]:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def _eject(self, endpoint: Endpoint, now: float, reason: str):
+        endpoint.ejections += 1
+        delay = min(self.max_ejection, self.ejection_time * 2 ** endpoint.failed_checks)
+        endpoint.ejected_until = now + delay
+        self.warn(f"⚠️  Ejecting Ollama endpoint {endpoint.url} for {delay:.0f}s ({reason})")
+
+    def _check(self, endpoint: Endpoint):
+        """Health-check an endpoint whose ejection expired; readmit it or eject it again."""
+        try:
+            healthy = self.health_check(endpoint.url) if self.health_check is not None else True
+        except Exception:
+            healthy = False
+        with self._lock:
+            endpoint.checking = False
+            if healthy:
+                endpoint.ejected_until = None
+                endpoint.failed_checks = 0
+                # A readmitted endpoint is ejected again on its next failure
+                endpoint.consecutive_failures = self.max_failures - 1
+                self.warn(f"✅ Ollama endpoint {endpoint.url} is healthy again")
+            else:
+                endpoint.failed_checks += 1
+                self._eject(endpoint, time.time(), "health check failed")
+
+    def _acquire(self, exclude: Set[str]) -> Optional[Endpoint]:
+        now = time.time()
+        with self._lock:
+            due = [
+                endpoint for endpoint in self.endpoints
+                if endpoint.ejected and endpoint.ejected_until <= now and not endpoint.checking
+            ]
+            for endpoint in due:
+                endpoint.checking = True
+        for endpoint in due:
+            self._check(endpoint)
+
+        with self._lock:
+            available = [endpoint for endpoint in self.endpoints if endpoint.url not in exclude]
+            candidates = [endpoint for endpoint in available if not endpoint.ejected] or available
+            if not candidates:
+                return None
+            endpoint = min(candidates, key=lambda e: (e.in_flight, e.requests))
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def _release(self, endpoint: Endpoint, start: float, failed: bool):
+        now = time.time()
+        with self._lock:
+            endpoint.in_flight -= 1
+            if endpoint.first_start is None:
+                endpoint.first_start = start
+            endpoint.last_end = now
+            if failed:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                if (len(self.endpoints) > 1 and not endpoint.ejected
+                        and endpoint.consecutive_failures >= self.max_failures):
+                    self._eject(endpoint, now, f"{endpoint.consecutive_failures} consecutive failures")
+            else:
+                endpoint.completed += 1
+                endpoint.consecutive_failures = 0
+                endpoint.total_latency += now - start
+
+    def call(self, fn: Callable[[str], Any]) -> Any:
+        """Run ``fn(base_url)`` on the least loaded healthy endpoint, failing over on connection errors."""
+        tried: Set[str] = set()
+        while True:
+            endpoint = self._acquire(tried)
+            start = time.time()
+            try:
+                result = fn(endpoint.url)
+            except Exception as e:
+                self._release(endpoint, start, failed=True)
+                tried.add(endpoint.url)
+                if isinstance(e, requests.exceptions.ConnectionError) and len(tried) < len(self.endpoints):
+                    with self._lock:
+                        endpoint.failovers += 1
+                    continue
+                raise
+            self._release(endpoint, start, failed=False)
+            return result
+
+    def map(self, fn: Callable[[str], Any]) -> Dict[str, Any]:
+        """Run ``fn(base_url)`` on every endpoint concurrently (e.g. warm-up); returns results by URL."""
+        results: Dict[str, Any] = {}
+
+        def run(url: str):
+            results[url] = fn(url)
+
+        threads = [threading.Thread(target=run, args=(url,), daemon=True) for url in self.urls]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {url: results.get(url) for url in self.urls}
+
+    def summary(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            total_completed = sum(endpoint.completed for endpoint in self.endpoints)
+            return [endpoint.summary(total_completed) for endpoint in self.endpoints]
+
+
+def ollama_health_check(transport, timeout: float = 5.0) -> Callable[[str], bool]:
+    """Health check that asks an Ollama server for its version."""
+
+    def check(base_url: str) -> bool:
+        try:
+            return transport.get(f"{base_url}/api/version", read_timeout=timeout).status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    return check
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Shared pooled HTTP transport for the HealthBench evaluators.
+
+Wraps a single ``requests.Session`` whose adapters keep connections alive
+between calls, so each example reuses an open TCP/TLS connection instead
+of paying a fresh handshake. ``pool_size`` bounds the number of open
+connections per host; with ``pool_block`` extra callers wait for a free
+connection rather than opening throwaway ones.
+"""
+
+from typing import Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_CONNECT_TIMEOUT = 10.0
+
+
+def pool_size_for(*concurrency: int) -> int:
+    """
+    ``pool_size`` for stages that may all talk to one host at once.
+
+    Pools are per host and block when full, so the size must cover every
+    stage sharing a host (e.g. all comparison models' generation workers,
+    plus a grader on the same server). One extra connection is kept for
+    endpoint health checks and ``/api/show`` lookups.
+    """
+    return sum(concurrency) + 1
+
+
+class HttpTransport:
+    """Keep-alive connection pools with per-host limits and split timeouts."""
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: Optional[float] = None,
+        max_hosts: int = 10,
+    ):
+        self.pool_size = max(1, pool_size)
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=max_hosts,
+            pool_maxsize=self.pool_size,
+            pool_block=True,
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def timeout(self, read_timeout: Optional[float] = None) -> Tuple[float, Optional[float]]:
+        """``(connect, read)`` timeout; the transport-wide read timeout wins if set."""
+        return (self.connect_timeout, self.read_timeout or read_timeout)
+
+    def request(self, method: str, url: str, read_timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout(read_timeout))
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url: str, read_timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        return self.request("GET", url, read_timeout=read_timeout, **kwargs)
+
+    def head(self, url: str, read_timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, read_timeout=read_timeout, **kwargs)
+
+    def post(self, url: str, read_timeout: Optional[float] = None, **kwargs) -> requests.Response:
+        return self.request("POST", url, read_timeout=read_timeout, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Client-side flow control for grader API calls.
+
+``AdaptiveLimiter`` is an AIMD (additive-increase, multiplicative-decrease)
+concurrency limit: while calls succeed with normal latency the number of
+requests allowed in flight grows by about one per round of ``limit``
+successes; a 429, 5xx or timeout (reported as ``OverloadError``) cuts it by
+``decrease_factor``. A ``Retry-After`` hint pauses all new calls until it
+has passed.
+
+``RetryPolicy`` retries transient failures with jittered exponential
+backoff, and ``RateLimiter`` keeps requests and tokens per minute under the
+provider's quota with client-side token buckets.
+"""
+
+import email.utils
+import json
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+
+class TransientError(Exception):
+    """A failure worth retrying (connection reset, overload, unparseable reply)."""
+
+    reason = "connection"
+
+
+class OverloadError(TransientError):
+    """The API signalled overload (429, 5xx or a timeout); ``retry_after`` is in seconds if known."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, status: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+    @property
+    def reason(self) -> str:
+        if self.status == 429:
+            return "rate_limited"
+        if self.status is not None:
+            return "server_error"
+        return "timeout"
+
+
+class MalformedResponseError(TransientError):
+    """The grader replied, but not with the JSON we asked for; the request is re-asked."""
+
+    reason = "invalid_json"
+
+    def __init__(self, message: str, raw: str = ""):
+        super().__init__(message)
+        self.raw = raw
+
+
+def parse_grader_json(text: str) -> Dict[str, Any]:
+    """
+    Parse a grader reply; anything but a JSON object with a numeric
+    ``score`` raises ``MalformedResponseError`` so it is re-asked rather
+    than scored (and cached) as 0.
+    """
+    try:
+        result = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise MalformedResponseError(str(e), raw=text) from e
+    if not isinstance(result, dict):
+        raise MalformedResponseError("grader reply is not a JSON object", raw=text)
+    score = result.get("score")
+    if isinstance(score, bool) or not isinstance(score, (int, float)):
+        raise MalformedResponseError("grader reply has no numeric \"score\"", raw=text)
+    return result
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """``Retry-After`` header (delta-seconds or HTTP date) to seconds from now."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def is_overload_status(status: int) -> bool:
+    return status == 429 or status >= 500
+
+
+class AdaptiveLimiter:
+    """
+    AIMD limit on concurrent calls.
+
+    ``call(fn)`` waits for a free slot, runs ``fn`` and adjusts the limit
+    from the outcome. The limit only grows while the call latency stays
+    within ``latency_tolerance`` times its moving average and the recent
+    error rate stays below ``max_error_rate``. At most one decrease is
+    applied per smoothed latency interval, so a burst of 429s from the same
+    overload episode does not collapse the limit to the minimum.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        initial_limit: Optional[int] = None,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2.0,
+        max_error_rate: float = 0.1,
+        smoothing: float = 0.1,
+    ):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial_limit or min(4, self.max_limit))))
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.max_error_rate = max_error_rate
+        self.smoothing = smoothing
+
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.increases = 0
+        self.decreases = 0
+        self.overloads = 0
+        self.errors = 0
+        self.calls = 0
+        self.retry_after_waits = 0
+        self._latency: Optional[float] = None
+        self._error_rate = 0.0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                pause = self._paused_until - time.time()
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self.in_flight >= self.current_limit:
+                    self._cond.wait()
+                else:
+                    self.in_flight += 1
+                    return
+
+    def _release(self, latency: float, overload: Optional[OverloadError], failed: bool):
+        with self._cond:
+            self.in_flight -= 1
+            self.calls += 1
+            self._error_rate += self.smoothing * ((1.0 if failed or overload else 0.0) - self._error_rate)
+            if overload is not None:
+                self.overloads += 1
+                self._on_overload(overload)
+            elif failed:
+                self.errors += 1
+            else:
+                self._on_success(latency)
+            self._cond.notify_all()
+
+    def _on_success(self, latency: float):
+        healthy = self._latency is None or latency <= self.latency_tolerance * self._latency
+        self._latency = latency if self._latency is None else \
+            self._latency + self.smoothing * (latency - self._latency)
+        if healthy and self._error_rate < self.max_error_rate and self.limit < self.max_limit:
+            previous = self.current_limit
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+            if self.current_limit > previous:
+                self.increases += 1
+            self.peak_limit = max(self.peak_limit, self.limit)
+
+    def _on_overload(self, error: OverloadError):
+        now = time.time()
+        if error.retry_after:
+            self.retry_after_waits += 1
+            self._paused_until = max(self._paused_until, now + error.retry_after)
+        if now - self._last_decrease >= (self._latency or 0.0):
+            self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+            self._last_decrease = now
+            self.decreases += 1
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        self._acquire()
+        start = time.time()
+        try:
+            result = fn()
+        except OverloadError as e:
+            self._release(time.time() - start, e, True)
+            raise
+        except Exception:
+            self._release(time.time() - start, None, True)
+            raise
+        self._release(time.time() - start, None, False)
+        return result
+
+    def summary(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "limit": self.current_limit,
+                "peak_limit": int(self.peak_limit),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "calls": self.calls,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "overloads": self.overloads,
+                "errors": self.errors,
+                "retry_after_waits": self.retry_after_waits,
+                "average_latency": self._latency,
+            }
+
+
+class RetryPolicy:
+    """
+    Retry transient failures with full-jitter exponential backoff.
+
+    ``call(fn)`` runs ``fn`` up to ``max_attempts`` times. Only
+    ``TransientError``s are retried, and unparseable replies
+    (``MalformedResponseError``) at most ``max_reasks`` times; anything else
+    is raised immediately. The delay before retry ``n`` is drawn uniformly
+    from ``[0, min(max_delay, base_delay * 2**(n-1))]`` and is never shorter
+    than the server's ``Retry-After``.
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 max_reasks: int = 2):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_reasks = max_reasks
+        self.calls = 0
+        self.attempts = 0
+        self.retries: Counter = Counter()
+        self.exhausted = 0
+        self.non_retryable = 0
+        self._lock = threading.Lock()
+
+    def delay(self, retry: int, retry_after: Optional[float] = None) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+        return max(backoff, retry_after or 0.0)
+
+    def _count(self, field: str):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _count_retry(self, reason: str):
+        with self._lock:
+            self.retries[reason] += 1
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        self._count("calls")
+        reasks = 0
+        for attempt in range(1, self.max_attempts + 1):
+            self._count("attempts")
+            try:
+                return fn()
+            except TransientError as e:
+                if isinstance(e, MalformedResponseError):
+                    reasks += 1
+                    if reasks > self.max_reasks:
+                        self._count("exhausted")
+                        raise
+                if attempt == self.max_attempts:
+                    self._count("exhausted")
+                    raise
+                self._count_retry(e.reason)
+                time.sleep(self.delay(attempt, getattr(e, "retry_after", None)))
+            except Exception:
+                self._count("non_retryable")
+                raise
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": sum(self.retries.values()),
+                "retries_by_reason": dict(self.retries),
+                "exhausted": self.exhausted,
+                "non_retryable": self.non_retryable,
+                "max_attempts": self.max_attempts,
+            }
+
+
+class TokenBucket:
+    """Refills at ``per_minute / 60`` per second up to ``capacity`` (default: one minute's worth)."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Take ``amount`` tokens, sleeping until they are available; returns the time waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                deficit = (amount - self.tokens) / self.rate
+            time.sleep(deficit)
+            waited += deficit
+
+    def adjust(self, amount: float):
+        """Charge (or refund, if negative) tokens after the fact; the balance may go negative."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+
+def estimate_tokens(messages: List[Dict[str, str]], completion_tokens: int = 500) -> int:
+    """Rough token count of a chat request: ~2 characters per token for mixed Chinese/English, plus the reply."""
+    return sum(len(message.get("content", "")) for message in messages) // 2 + completion_tokens
+
+
+class RateLimiter:
+    """
+    Client-side requests-per-minute and tokens-per-minute limits.
+
+    Tokens are reserved from an estimate before the request and corrected
+    with the ``usage`` the API reports afterwards.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.waits = 0
+        self.wait_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, estimated_tokens: int):
+        waited = 0.0
+        if self.requests is not None:
+            waited += self.requests.acquire(1)
+        if self.tokens is not None:
+            waited += self.tokens.acquire(estimated_tokens)
+        if waited > 0:
+            with self._lock:
+                self.waits += 1
+                self.wait_time += waited
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        if self.tokens is not None and actual_tokens is not None:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests_per_minute": self.requests.rate * 60 if self.requests is not None else None,
+                "tokens_per_minute": self.tokens.rate * 60 if self.tokens is not None else None,
+                "waits": self.waits,
+                "wait_time": self.wait_time,
+            }
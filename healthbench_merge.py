@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Merge sharded HealthBench result files into one output.
+
+Each shard is produced by running an evaluator with
+``--shard-index i --num-shards N``. The merge checks that all N shards of
+the same model/dataset/example count are present exactly once, that no
+prompt_id appears twice and that every result belongs to the shard it was
+filed under, then recomputes the totals, averages and per-tag breakdown
+over the combined results.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Set
+
+from healthbench_dataset import shard_of
+from healthbench_metrics import SERVER_AVERAGE_FIELDS, STREAM_FIELDS, summarize_server_timings
+from healthbench_results import ResultAggregator, StreamingResultsWriter
+
+# Timing fields written by the evaluators, with the flag that excludes cache hits
+TIMING_FIELDS = {
+    "response_time": "cached",
+    "model_time": "cached",
+    "grader_time": "grade_cached",
+    "total_time": None,
+    **{field: "cached" for field in SERVER_AVERAGE_FIELDS},
+}
+# Header fields that must agree across shards
+CONSISTENT_FIELDS = ("model", "dataset", "num_examples", "grader")
+
+
+class MergeError(Exception):
+    pass
+
+
+def _shard_info(data: Dict[str, Any]) -> Dict[str, int]:
+    shard = data.get("shard") or {"index": 0, "count": 1}
+    return {"index": int(shard["index"]), "count": int(shard["count"])}
+
+
+def merge_results(paths: List[str], output_file: str, allow_partial: bool = False) -> Dict[str, Any]:
+    """Merge the shard files in ``paths`` into ``output_file`` and return the merged summary."""
+    if not paths:
+        raise MergeError("No shard files given")
+
+    writer = None
+    aggregator = ResultAggregator(TIMING_FIELDS, distribution_fields=STREAM_FIELDS)
+    reference: Dict[str, Any] = {}
+    seen_shards: Dict[int, str] = {}
+    seen_ids: Set[Any] = set()
+    shards = []
+    failed = 0
+    total_examples = 0
+    wall_time = 0.0
+
+    try:
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if "models" in data:
+                raise MergeError(f"{path}: multi-model comparison results cannot be merged")
+            shard = _shard_info(data)
+
+            if not reference:
+                reference = {field: data.get(field) for field in CONSISTENT_FIELDS}
+                reference["num_shards"] = shard["count"]
+                writer = StreamingResultsWriter(output_file, {
+                    **{field: value for field, value in reference.items() if value is not None},
+                    "merged_from": paths,
+                })
+            for field in CONSISTENT_FIELDS:
+                if data.get(field) != reference[field]:
+                    raise MergeError(f"{path}: {field} is {data.get(field)!r}, expected {reference[field]!r}")
+            if shard["count"] != reference["num_shards"]:
+                raise MergeError(f"{path}: shard count {shard['count']}, expected {reference['num_shards']}")
+            if shard["index"] in seen_shards:
+                raise MergeError(f"{path}: shard {shard['index']} already merged from {seen_shards[shard['index']]}")
+            if data.get("partial") and not allow_partial:
+                raise MergeError(f"{path}: shard {shard['index']} is partial (resume it or pass --allow-partial)")
+            seen_shards[shard["index"]] = path
+
+            for record in data.get("results", []):
+                prompt_id = record.get("prompt_id")
+                if prompt_id in seen_ids:
+                    raise MergeError(f"{path}: prompt_id {prompt_id!r} appears in more than one shard")
+                if shard["count"] > 1 and shard_of(prompt_id, shard["count"]) != shard["index"]:
+                    raise MergeError(f"{path}: prompt_id {prompt_id!r} does not belong to shard {shard['index']}")
+                seen_ids.add(prompt_id)
+                aggregator.add(record)
+                writer.write(record)
+
+            failed += data.get("failed_examples", 0)
+            total_examples += data.get("total_examples", len(data.get("results", [])))
+            wall_time = max(wall_time, data.get("wall_time") or (data.get("pipeline") or {}).get("wall_time") or 0.0)
+            shards.append({
+                "file": path,
+                "index": shard["index"],
+                "evaluated_examples": data.get("evaluated_examples", len(data.get("results", []))),
+                "failed_examples": data.get("failed_examples", 0),
+                "partial": bool(data.get("partial")),
+            })
+
+        missing = sorted(set(range(reference["num_shards"])) - set(seen_shards))
+        if missing:
+            raise MergeError(f"Missing shard(s): {', '.join(str(i) for i in missing)} of {reference['num_shards']}")
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    streaming = {field: aggregator.distribution(field) for field in STREAM_FIELDS}
+    summary = {
+        "total_examples": total_examples,
+        "evaluated_examples": aggregator.evaluated,
+        "failed_examples": failed,
+        "partial": any(shard["partial"] for shard in shards),
+        "total_score": aggregator.total_score,
+        "total_max": aggregator.total_max,
+        "average_percentage": aggregator.average_percentage,
+        **{
+            f"average_{field}": aggregator.average(field)
+            for field in ("response_time", "model_time", "grader_time", "total_time")
+            if aggregator.count(field)
+        },
+        "tags": aggregator.tag_breakdown(),
+        "streaming": streaming if streaming["time_to_first_token"]["count"] else None,
+        "server_timing": summarize_server_timings(aggregator),
+        "wall_time": wall_time,
+        "shards": sorted(shards, key=lambda shard: shard["index"]),
+    }
+    writer.close(summary)
+    return summary
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Merge sharded HealthBench result files"
+    )
+    parser.add_argument("shards", nargs="+",
+                       help="Shard result JSON files (one per --shard-index)")
+    parser.add_argument("--output", type=str, required=True,
+                       help="Merged output JSON file")
+    parser.add_argument("--allow-partial", action="store_true",
+                       help="Accept shards whose run was interrupted")
+    args = parser.parse_args()
+
+    try:
+        summary = merge_results(args.shards, args.output, allow_partial=args.allow_partial)
+    except (MergeError, OSError, ValueError, KeyError) as e:
+        print(f"❌ Merge failed: {e}")
+        sys.exit(1)
+
+    print(f"🧩 Merged {len(summary['shards'])} shards: {summary['evaluated_examples']} results "
+          f"({summary['failed_examples']} failed)")
+    print(f"Total Score: {summary['total_score']}/{summary['total_max']}")
+    print(f"Average Score: {summary['average_percentage']:.1f}%")
+    print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
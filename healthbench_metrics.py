@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Latency metrics for the HealthBench evaluators.
+
+``stream_chat`` sends a streaming Ollama ``/api/chat`` request and reads the
+NDJSON chunks as they arrive, timing the first token (prefill) separately
+from the gaps between later tokens (decode). ``summarize_distribution``
+turns the per-example values into the p50/p95 figures of the run summary.
+
+``server_timings`` keeps the timing fields Ollama reports with the final
+message, so model loading, prompt processing and generation can be told
+apart from client and network overhead.
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Per-example fields recorded in streaming mode, summarized across the run
+STREAM_FIELDS = ("time_to_first_token", "inter_token_latency", "decode_tokens_per_sec")
+
+# Ollama's server-side timing fields (durations in nanoseconds)
+SERVER_TIMING_FIELDS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+# Per-example fields averaged in the "server_timing" summary
+SERVER_AVERAGE_FIELDS = SERVER_TIMING_FIELDS + ("client_overhead",)
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> Optional[float]:
+    """Linearly interpolated ``q``-th percentile (0-100) of pre-sorted values."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize_distribution(values: List[float]) -> Dict[str, Any]:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": (sum(ordered) / len(ordered)) if ordered else None,
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+    }
+
+
+def server_timings(data: Dict[str, Any], elapsed: float) -> Dict[str, Any]:
+    """
+    Server timing fields of a final ``/api/chat`` message.
+
+    ``client_overhead`` is the client-measured ``elapsed`` seconds minus the
+    server's ``total_duration``: connection, queueing and transfer time.
+    ``done_reason`` is kept too ("length" when ``num_predict`` cut the reply off).
+    """
+    timings = {field: data[field] for field in SERVER_TIMING_FIELDS if data.get(field) is not None}
+    if "total_duration" in timings:
+        timings["client_overhead"] = max(0.0, elapsed - timings["total_duration"] / 1e9)
+    if data.get("done_reason"):
+        timings["done_reason"] = data["done_reason"]
+    return timings
+
+
+def summarize_server_timings(aggregator) -> Optional[Dict[str, Any]]:
+    """Average server timings (in seconds) over a ``ResultAggregator``, or None if none were reported."""
+    examples = aggregator.count("total_duration")
+    if not examples:
+        return None
+    prompt_eval_time = aggregator.average("prompt_eval_duration") / 1e9
+    eval_time = aggregator.average("eval_duration") / 1e9
+    return {
+        "examples": examples,
+        "average_total_duration": aggregator.average("total_duration") / 1e9,
+        "average_load_duration": aggregator.average("load_duration") / 1e9,
+        "average_prompt_eval_duration": prompt_eval_time,
+        "average_eval_duration": eval_time,
+        "average_prompt_eval_count": aggregator.average("prompt_eval_count"),
+        "average_eval_count": aggregator.average("eval_count"),
+        "prompt_eval_tokens_per_sec": (aggregator.average("prompt_eval_count") / prompt_eval_time) if prompt_eval_time else None,
+        "eval_tokens_per_sec": (aggregator.average("eval_count") / eval_time) if eval_time else None,
+        "average_client_overhead": aggregator.average("client_overhead"),
+    }
+
+
+def stream_chat(transport, url: str, payload: Dict[str, Any], read_timeout: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    POST a chat request with ``stream`` enabled and read the reply incrementally.
+
+    Each NDJSON chunk carrying content is counted as one token (Ollama emits
+    one token per chunk). Returns ``(content, stats)`` where ``stats`` has
+    ``time_to_first_token`` (seconds from sending the request),
+    ``inter_token_latency`` (mean gap between later tokens),
+    ``decode_tokens_per_sec`` and ``streamed_tokens``, plus the server
+    timings of the final chunk.
+    """
+    parts = []
+    final: Dict[str, Any] = {}
+    tokens = 0
+    first_token = last_token = None
+    start = time.perf_counter()
+    with transport.post(url, json=dict(payload, stream=True), read_timeout=read_timeout, stream=True) as response:
+        response.raise_for_status()
+        # chunk_size=None hands over each chunk as it arrives instead of
+        # waiting for a full buffer, which would batch tokens together.
+        for line in response.iter_lines(chunk_size=None):
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("error"):
+                raise RuntimeError(f"Ollama stream error: {chunk['error']}")
+            content = chunk.get("message", {}).get("content", "")
+            if content:
+                last_token = time.perf_counter()
+                if first_token is None:
+                    first_token = last_token
+                tokens += 1
+                parts.append(content)
+            if chunk.get("done"):
+                final = chunk
+                break
+    elapsed = time.perf_counter() - start
+
+    decode_time = (last_token - first_token) if tokens > 1 else 0.0
+    return "".join(parts), {
+        "time_to_first_token": (first_token - start) if first_token is not None else None,
+        "inter_token_latency": (decode_time / (tokens - 1)) if tokens > 1 else None,
+        "decode_tokens_per_sec": ((tokens - 1) / decode_time) if decode_time > 0 else None,
+        "streamed_tokens": tokens,
+        **server_timings(final, elapsed),
+    }
@@ -0,0 +1,612 @@
+#!/usr/bin/env python3
+"""
+Deterministic stand-in for Ollama and an OpenAI-compatible grader API.
+
+Benchmarks the evaluators end to end without a GPU or a paid API key. The
+server speaks enough of both APIs for the HealthBench clients:
+
+* Ollama: ``POST /api/chat`` (streaming NDJSON and non-streaming),
+  ``POST /api/show``, ``GET /api/version`` and ``GET /api/tags``.
+* OpenAI-compatible: ``POST /chat/completions`` and
+  ``POST /v1/chat/completions``, answering the grading prompt with the JSON
+  verdict the DeepSeek and GPT-4 graders expect (one score per rubric line).
+
+Replies, latencies and injected failures are drawn from a random generator
+seeded with ``(seed, request, attempt)``, so a freshly started server gives the
+same replies in every run and at any concurrency, while a retried request
+can succeed where its first attempt failed. Latency is a lognormal
+time-to-first-token plus prompt tokens at the prefill rate and reply tokens
+at the decode rate. Like Ollama, the server serves at most ``parallel``
+requests at a time, the rest queueing in arrival order; reloads the model
+when the model or ``num_ctx`` changes, once the running requests are done;
+and only evaluates the prompt tokens after the prefix a slot shares with
+its previous prompt. ``GET /stats`` reports request
+counts, model loads and the peak number of concurrent chat and grading
+requests.
+
+Point the evaluators at it with::
+
+    python healthbench_mock_server.py --write-dataset mock.jsonl --examples 200
+    python healthbench_mock_server.py --port 11500 &
+    DEEPSEEK_API_KEY=mock python healthbench_deepseek_eval.py \\
+        --ollama-url http://127.0.0.1:11500 --base-url http://127.0.0.1:11500/v1 \\
+        --dataset-file mock.jsonl --no-cache
+
+(``--base-url`` works the same for ``healthbench_gpt4_eval.py``; pass
+``--no-cache`` or a separate ``--cache-dir`` so mock verdicts do not end up
+in the real grade cache.) ``--time-scale 0`` answers instantly, which
+leaves only the harness's own overhead.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from healthbench_schedule import CHARS_PER_TOKEN, message_key, prompt_chars, shared_prefix_chars
+
+# Context length Ollama uses when a request does not set num_ctx
+DEFAULT_NUM_CTX = 4096
+
+# Reply vocabulary; each entry is streamed as one token
+REPLY_TOKENS = (
+    "建议", "您", "尽快", "就医", "，", "咨询", "医生", "。", "症状", "可能", "与", "感染", "有关",
+    "请", "注意", "休息", "并", "多", "饮水", "如果", "出现", "高烧", "或", "呼吸", "困难", "，",
+    "应", "立即", "前往", "急诊", "。", "不要", "自行", "服用", "抗生素", "。", "观察", "病情", "变化",
+)
+
+# "- criterion (N 分)" lines of the grading prompt
+RUBRIC_LINE = re.compile(r"^- (.*) \((-?\d+(?:\.\d+)?) 分\)\s*$", re.MULTILINE)
+
+
+class MockConfig:
+    """Latency, token rate and failure injection settings of the mock server."""
+
+    def __init__(
+        self,
+        seed: int = 0,
+        time_to_first_token: float = 0.2,
+        prefill_tokens_per_sec: float = 2000.0,
+        tokens_per_sec: float = 40.0,
+        reply_tokens: Tuple[int, int] = (50, 300),
+        latency_sigma: float = 0.3,
+        grader_latency: float = 1.0,
+        grader_pass_rate: float = 0.6,
+        load_time: float = 2.0,
+        parallel: int = 1,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        bad_json_rate: float = 0.0,
+        time_scale: float = 1.0,
+    ):
+        self.seed = seed
+        # Median seconds before the first token (lognormal with sigma latency_sigma)
+        self.time_to_first_token = time_to_first_token
+        self.prefill_tokens_per_sec = prefill_tokens_per_sec
+        self.tokens_per_sec = tokens_per_sec
+        self.reply_tokens = reply_tokens
+        self.latency_sigma = latency_sigma
+        # Median seconds per grading request
+        self.grader_latency = grader_latency
+        # Chance that a rubric criterion counts as met
+        self.grader_pass_rate = grader_pass_rate
+        self.load_time = load_time
+        self.parallel = max(1, parallel)
+        # Injected failures: HTTP 500, rate limiting (429 from the grader API,
+        # 503 "server busy" from Ollama) and grader replies that are not JSON
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.bad_json_rate = bad_json_rate
+        # Multiplier for every simulated delay; 0 answers immediately
+        self.time_scale = time_scale
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self), reply_tokens=list(self.reply_tokens))
+
+
+def request_key(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def model_digest(model: str) -> str:
+    """Stable fake digest, so the response cache tells mock models apart."""
+    return "sha256:" + hashlib.sha256(f"mock:{model}".encode("utf-8")).hexdigest()
+
+
+class MockBackend:
+    """
+    State shared by all requests: attempt counters, the loaded model and the
+    prompt each slot last evaluated.
+    """
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.stats: Counter = Counter()
+        self.models: List[str] = []
+        self._attempts: Counter = Counter()
+        self._in_flight: Counter = Counter()
+        self._loaded: Optional[Tuple[str, int]] = None
+        self._slots: List[Tuple[Tuple[str, str], ...]] = [() for _ in range(self.config.parallel)]
+        self._free = list(range(self.config.parallel))
+        # Requests waiting for a slot, in arrival order, and whether a reload is in progress
+        self._waiting: deque = deque()
+        self._loading = False
+        self._lock = threading.Lock()
+        self._slot_available = threading.Condition(self._lock)
+
+    def rng(self, kind: str, key: str) -> random.Random:
+        """Generator for this attempt at ``key``; retries of the same request get the next attempt's generator."""
+        with self._lock:
+            attempt = self._attempts[(kind, key)]
+            self._attempts[(kind, key)] += 1
+        return random.Random(f"{self.config.seed}:{kind}:{key}:{attempt}")
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    @contextmanager
+    def in_flight(self, kind: str) -> Iterator[None]:
+        """Count a ``kind`` request in progress; ``stats["peak_<kind>_in_flight"]`` keeps the maximum."""
+        with self._lock:
+            self._in_flight[kind] += 1
+            peak = f"peak_{kind}_in_flight"
+            self.stats[peak] = max(self.stats[peak], self._in_flight[kind])
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight[kind] -= 1
+
+    def jitter(self, rng: random.Random, median: float) -> float:
+        return median * rng.lognormvariate(0, self.config.latency_sigma)
+
+    def scaled(self, seconds: float) -> float:
+        return max(0.0, seconds * self.config.time_scale)
+
+    def sleep(self, seconds: float):
+        if self.scaled(seconds) > 0:
+            time.sleep(self.scaled(seconds))
+
+    def failure(self, rng: random.Random) -> Optional[str]:
+        """Injected failure for this attempt: "error", "rate_limit" or None."""
+        roll = rng.random()
+        if roll < self.config.error_rate:
+            return "error"
+        if roll < self.config.error_rate + self.config.rate_limit_rate:
+            return "rate_limit"
+        return None
+
+    def load(self, model: str, num_ctx: int) -> float:
+        """Load ``model`` with ``num_ctx`` without generating (a warm-up request); returns the simulated load time."""
+        slot, _, load = self.acquire_slot(None, model, num_ctx)
+        self.release_slot(slot, None)
+        return load
+
+    def acquire_slot(self, key: Optional[Tuple[Tuple[str, str], ...]], model: str,
+                     num_ctx: int) -> Tuple[int, int, float]:
+        """
+        Wait for a slot running ``model`` with ``num_ctx``; returns (slot, cached chars, simulated load time).
+
+        Requests get slots in arrival order. One that needs another model or
+        ``num_ctx`` waits until every slot is idle, then reloads, which drops
+        every slot's prompt cache; the requests behind it wait meanwhile.
+        The slot preferred is the one whose cached prompt shares the most
+        with ``key`` (None for a warm-up, which keeps the slot's prompt).
+        """
+        ticket = object()
+        with self._slot_available:
+            if model not in self.models:
+                self.models.append(model)
+            self._waiting.append(ticket)
+            while not (self._waiting[0] is ticket and self._free and not self._loading
+                       and (self._loaded == (model, num_ctx) or len(self._free) == len(self._slots))):
+                self._slot_available.wait()
+            self._waiting.popleft()
+            reload = self._loaded != (model, num_ctx)
+            if reload:
+                self._loaded = (model, num_ctx)
+                self._loading = True
+                self.stats["model_loads"] += 1
+                self._slots = [() for _ in self._slots]
+            slot = max(self._free, key=lambda index: shared_prefix_chars(self._slots[index], key or ()))
+            self._free.remove(slot)
+            cached_chars = shared_prefix_chars(self._slots[slot], key or ())
+            self._slot_available.notify_all()
+        if not reload:
+            return slot, cached_chars, 0.0
+        self.sleep(self.config.load_time)
+        with self._slot_available:
+            self._loading = False
+            self._slot_available.notify_all()
+        return slot, cached_chars, self.config.load_time
+
+    def release_slot(self, slot: int, key: Optional[Tuple[Tuple[str, str], ...]]):
+        with self._slot_available:
+            if key is not None:
+                self._slots[slot] = key
+            self._free.append(slot)
+            self._slot_available.notify_all()
+
+
+class ChatReply:
+    """One simulated Ollama generation: the tokens and the server timings of the final message."""
+
+    def __init__(self, backend: MockBackend, body: Dict[str, Any]):
+        config = backend.config
+        messages = body.get("messages") or []
+        options = body.get("options") or {}
+        self.model = body.get("model", "")
+        self.key = message_key(messages)
+        rng = backend.rng("chat", request_key(self.model, self.key))
+
+        self.failure = backend.failure(rng)
+        count = rng.randint(*config.reply_tokens)
+        num_predict = options.get("num_predict")
+        self.done_reason = "stop"
+        if num_predict is not None and 0 <= num_predict < count:
+            count, self.done_reason = num_predict, "length"
+        self.tokens = [rng.choice(REPLY_TOKENS) for _ in range(count)]
+        self.num_ctx = options.get("num_ctx") or DEFAULT_NUM_CTX
+        self.prompt_tokens = max(1, prompt_chars(self.key) // CHARS_PER_TOKEN)
+        self.first_token_delay = backend.jitter(rng, config.time_to_first_token)
+        self.token_interval = 1.0 / (config.tokens_per_sec * rng.lognormvariate(0, config.latency_sigma / 2))
+
+    def prefill(self, backend: MockBackend, cached_chars: int) -> Tuple[int, float]:
+        """Prompt tokens evaluated after the cached prefix, and the time to evaluate them."""
+        count = max(1, self.prompt_tokens - cached_chars // CHARS_PER_TOKEN)
+        return count, self.first_token_delay + count / backend.config.prefill_tokens_per_sec
+
+    def final(self, backend: MockBackend, load: float, prompt_eval_count: int, prefill: float,
+              started: float) -> Dict[str, Any]:
+        """Final message fields; durations are the scaled time the server actually waited."""
+        eval_duration = self.token_interval * max(0, len(self.tokens) - 1)
+        return {
+            "model": self.model,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "done": True,
+            "done_reason": self.done_reason,
+            "total_duration": int((time.perf_counter() - started) * 1e9),
+            "load_duration": int(backend.scaled(load) * 1e9),
+            "prompt_eval_count": prompt_eval_count,
+            "prompt_eval_duration": int(backend.scaled(prefill) * 1e9),
+            "eval_count": len(self.tokens),
+            "eval_duration": int(backend.scaled(eval_duration) * 1e9),
+        }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    backend: MockBackend = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data: Dict[str, Any], status: int = 200, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: Dict[str, Any]):
+        line = (json.dumps(data, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/api/version":
+            self._send_json({"version": "0.0.0-mock"})
+        elif path == "/api/tags":
+            with self.backend._lock:
+                models = list(self.backend.models)
+            self._send_json({"models": [{"name": model, "model": model, "digest": model_digest(model)[7:]}
+                                        for model in models]})
+        elif path == "/stats":
+            with self.backend._lock:
+                stats = dict(self.backend.stats)
+            self._send_json({"stats": stats, "config": self.backend.config.to_dict()})
+        else:
+            self._send_json({"error": f"not found: {self.path}"}, 404)
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        try:
+            body = self._read_json()
+        except ValueError:
+            self._send_json({"error": "invalid JSON body"}, 400)
+            return
+        if path == "/api/chat":
+            with self.backend.in_flight("chat"):
+                self._chat(body)
+        elif path == "/api/show":
+            model = body.get("model") or body.get("name") or ""
+            self._send_json({"digest": model_digest(model), "details": {"family": "mock"},
+                             "model_info": {"general.architecture": "mock"}})
+        elif path in ("/chat/completions", "/v1/chat/completions"):
+            with self.backend.in_flight("grade"):
+                self._grade(body)
+        else:
+            self._send_json({"error": f"not found: {self.path}"}, 404)
+
+    def _chat(self, body: Dict[str, Any]):
+        backend = self.backend
+        started = time.perf_counter()
+        reply = ChatReply(backend, body)
+        backend.count("chat_requests")
+        if reply.failure == "error":
+            backend.count("injected_errors")
+            self._send_json({"error": "mock: injected server error"}, 500)
+            return
+        if reply.failure == "rate_limit":
+            backend.count("injected_rate_limits")
+            self._send_json({"error": "server busy, please try again.  maximum pending requests exceeded"}, 503)
+            return
+
+        if not body.get("messages"):
+            # Empty chat request: load the model only (warm-up)
+            load = backend.load(reply.model, reply.num_ctx)
+            self._send_json({"model": reply.model, "done": True, "done_reason": "load",
+                             "message": {"role": "assistant", "content": ""},
+                             "total_duration": int((time.perf_counter() - started) * 1e9),
+                             "load_duration": int(backend.scaled(load) * 1e9)})
+            return
+
+        slot, cached_chars, load = backend.acquire_slot(reply.key, reply.model, reply.num_ctx)
+        try:
+            prompt_eval_count, prefill = reply.prefill(backend, cached_chars)
+            backend.sleep(prefill)
+            if body.get("stream", True):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for index, token in enumerate(reply.tokens):
+                    if index:
+                        backend.sleep(reply.token_interval)
+                    self._write_chunk({"model": reply.model, "message": {"role": "assistant", "content": token},
+                                       "done": False})
+                self._write_chunk(dict(reply.final(backend, load, prompt_eval_count, prefill, started),
+                                       message={"role": "assistant", "content": ""}))
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+            else:
+                backend.sleep(reply.token_interval * max(0, len(reply.tokens) - 1))
+                self._send_json(dict(reply.final(backend, load, prompt_eval_count, prefill, started),
+                                     message={"role": "assistant", "content": "".join(reply.tokens)}))
+        finally:
+            backend.release_slot(slot, reply.key)
+
+    def _grade(self, body: Dict[str, Any]):
+        backend = self.backend
+        config = backend.config
+        messages = body.get("messages") or []
+        prompt = messages[-1].get("content", "") if messages else ""
+        rng = backend.rng("grade", request_key(body.get("model"), message_key(messages)))
+        backend.count("grade_requests")
+
+        failure = backend.failure(rng)
+        if failure == "error":
+            backend.count("injected_errors")
+            self._send_json({"error": {"message": "mock: injected server error", "type": "server_error"}}, 500)
+            return
+        if failure == "rate_limit":
+            backend.count("injected_rate_limits")
+            self._send_json({"error": {"message": "mock: rate limit reached", "type": "rate_limit_error"}}, 429,
+                            headers={"Retry-After": f"{config.retry_after:g}"})
+            return
+
+        backend.sleep(backend.jitter(rng, config.grader_latency))
+        if rng.random() < config.bad_json_rate:
+            backend.count("injected_bad_json")
+            content = "评分结果: 无法给出 {"
+        else:
+            rubric = [(criterion, float(points)) for criterion, points in RUBRIC_LINE.findall(prompt)]
+            scores = [points if rng.random() < config.grader_pass_rate else 0 for _, points in rubric]
+            score = sum(scores)
+            max_score = sum(points for _, points in rubric if points > 0)
+            content = json.dumps({
+                "reasoning": f"模拟评分: 满足 {sum(1 for s in scores if s)}/{len(rubric)} 条标准",
+                "scores": scores,
+                "score": score,
+                "max_score": max_score,
+                "percentage": max(0.0, score) / max_score * 100 if max_score > 0 else 0,
+            }, ensure_ascii=False)
+
+        prompt_tokens = max(1, prompt_chars(message_key(messages)) // CHARS_PER_TOKEN)
+        completion_tokens = max(1, len(content) // CHARS_PER_TOKEN)
+        self._send_json({
+            "id": "chatcmpl-mock-" + request_key(body.get("model"), message_key(messages))[:12],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+
+class MockServer:
+    """
+    The mock server on a background thread, for benchmarks and scripts.
+
+    ``port=0`` picks a free port; ``url`` is the base URL to hand to the
+    evaluators (add ``/v1`` for the grader).
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.backend = MockBackend(config or MockConfig())
+        handler = type("BoundMockHandler", (MockHandler,), {"backend": self.backend})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def synthetic_dataset(examples: int, seed: int = 0, themes: Sequence[str] = ("emergency", "context", "hedging")):
+    """
+    HealthBench-shaped test cases: multi-turn conversations, a few of which
+    share their opening turns, with positive and negative rubric criteria.
+    """
+    rng = random.Random(f"{seed}:dataset")
+    openings = [f"我最近{symptom}，已经持续{days}天了，需要担心吗？"
+                for symptom in ("头痛", "咳嗽", "发烧", "胸闷", "腹痛", "失眠")
+                for days in (2, 5)]
+    follow_ups = ["我还有点恶心。", "我正在服用布洛芬。", "我有高血压病史。", "晚上症状会加重。", "家里有孩子需要注意什么？"]
+    criteria = [("建议在症状加重时及时就医", 5), ("询问症状的持续时间和严重程度", 3),
+                ("说明需要立即急诊的危险信号", 4), ("给出具体的居家护理建议", 2),
+                ("在没有检查的情况下给出确定诊断", -4), ("推荐未经医生指导使用处方药", -5)]
+    cases = []
+    for index in range(examples):
+        prompt = [{"role": "user", "content": rng.choice(openings)}]
+        for _ in range(rng.randint(0, 2)):
+            prompt.append({"role": "assistant", "content": "建议您多休息并观察症状变化。" * rng.randint(1, 20)})
+            prompt.append({"role": "user", "content": rng.choice(follow_ups)})
+        cases.append({
+            "prompt_id": f"mock-{seed}-{index:05d}",
+            "prompt": prompt,
+            "rubrics": [{"criterion": criterion, "points": points, "tags": ["axis:mock"]}
+                        for criterion, points in rng.sample(criteria, rng.randint(2, len(criteria)))],
+            "example_tags": [f"theme:{rng.choice(themes)}"],
+        })
+    return cases
+
+
+def write_dataset(path: str, examples: int, seed: int = 0):
+    with open(path, 'w', encoding='utf-8') as f:
+        for case in synthetic_dataset(examples, seed):
+            f.write(json.dumps(case, ensure_ascii=False) + "\n")
+
+
+def parse_range(value: str) -> Tuple[int, int]:
+    """"50,300" (or a single number) to an inclusive (low, high) range."""
+    low, _, high = value.partition(",")
+    low_value = int(low)
+    high_value = int(high) if high else low_value
+    if high_value < low_value:
+        raise argparse.ArgumentTypeError(f"invalid range: {value}")
+    return low_value, high_value
+
+
+def main():
+    """Main entry point."""
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(
+        description="Deterministic mock Ollama and OpenAI-compatible grader server for benchmarking"
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1",
+                       help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=11500,
+                       help="Port to listen on (default: 11500)")
+    parser.add_argument("--seed", type=int, default=defaults.seed,
+                       help="Seed for replies, latencies and injected failures (default: 0)")
+    parser.add_argument("--ttft", type=float, default=defaults.time_to_first_token,
+                       help=f"Median seconds to the first token (default: {defaults.time_to_first_token:g})")
+    parser.add_argument("--prefill-rate", type=float, default=defaults.prefill_tokens_per_sec,
+                       help=f"Prompt tokens evaluated per second (default: {defaults.prefill_tokens_per_sec:g})")
+    parser.add_argument("--tokens-per-sec", type=float, default=defaults.tokens_per_sec,
+                       help=f"Median decode rate (default: {defaults.tokens_per_sec:g})")
+    parser.add_argument("--reply-tokens", type=parse_range, default=defaults.reply_tokens,
+                       help="Reply length range in tokens, e.g. 50,300 (default: 50,300)")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma,
+                       help=f"Lognormal sigma of the latencies, 0 for fixed latencies (default: {defaults.latency_sigma:g})")
+    parser.add_argument("--grader-latency", type=float, default=defaults.grader_latency,
+                       help=f"Median seconds per grading request (default: {defaults.grader_latency:g})")
+    parser.add_argument("--grader-pass-rate", type=float, default=defaults.grader_pass_rate,
+                       help=f"Chance that a rubric criterion is met (default: {defaults.grader_pass_rate:g})")
+    parser.add_argument("--load-time", type=float, default=defaults.load_time,
+                       help=f"Seconds to (re)load a model (default: {defaults.load_time:g})")
+    parser.add_argument("--parallel", type=int, default=defaults.parallel,
+                       help="Concurrent generations, like OLLAMA_NUM_PARALLEL (default: 1)")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate,
+                       help="Fraction of requests answered with HTTP 500 (default: 0)")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate,
+                       help="Fraction of requests rate limited: 429 from the grader API, 503 from Ollama (default: 0)")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after,
+                       help=f"Retry-After seconds sent with 429 (default: {defaults.retry_after:g})")
+    parser.add_argument("--bad-json-rate", type=float, default=defaults.bad_json_rate,
+                       help="Fraction of grading replies that are not valid JSON (default: 0)")
+    parser.add_argument("--time-scale", type=float, default=defaults.time_scale,
+                       help="Multiplier for all simulated delays, 0 to answer immediately (default: 1)")
+    parser.add_argument("--write-dataset", type=str, default=None,
+                       help="Write a synthetic HealthBench JSONL file for --dataset-file and exit")
+    parser.add_argument("--examples", type=int, default=100,
+                       help="Examples in the synthetic dataset (default: 100)")
+    args = parser.parse_args()
+
+    if args.write_dataset:
+        write_dataset(args.write_dataset, args.examples, args.seed)
+        print(f"💾 Wrote {args.examples} synthetic examples to {args.write_dataset}")
+        return
+
+    config = MockConfig(
+        seed=args.seed,
+        time_to_first_token=args.ttft,
+        prefill_tokens_per_sec=args.prefill_rate,
+        tokens_per_sec=args.tokens_per_sec,
+        reply_tokens=args.reply_tokens,
+        latency_sigma=args.latency_sigma,
+        grader_latency=args.grader_latency,
+        grader_pass_rate=args.grader_pass_rate,
+        load_time=args.load_time,
+        parallel=args.parallel,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        bad_json_rate=args.bad_json_rate,
+        time_scale=args.time_scale,
+    )
+    server = MockServer(config, args.host, args.port)
+    print(f"🧪 Mock server listening on {server.url}")
+    print(f"   Ollama:  --ollama-url {server.url}")
+    print(f"   Grader:  --base-url {server.url}/v1")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(f"\n📊 {dict(server.backend.stats)}")
+
+
+if __name__ == "__main__":
+    main()
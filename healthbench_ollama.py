@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Ollama model residency helpers shared by the HealthBench evaluators.
+
+Ollama loads a model on its first request and unloads it after
+``keep_alive`` of inactivity (5 minutes by default). ``warm_up_model``
+loads the model before the timed part of a run, so the first example does
+not pay the load time, and every chat request carries the same
+``keep_alive`` so the model stays resident across long grader waits.
+The warm-up must use the ``num_ctx`` of the first real request: Ollama
+reloads the model whenever ``num_ctx`` changes, so warming it with the
+default context would only move the load into the first example.
+"""
+
+import time
+from typing import Any, Dict, Optional, Union
+
+import requests
+
+DEFAULT_KEEP_ALIVE = "30m"
+
+KeepAlive = Union[str, int]
+
+
+def parse_keep_alive(value: str) -> KeepAlive:
+    """CLI value to Ollama ``keep_alive``: plain numbers are seconds (-1 = forever), else a duration like "30m"."""
+    stripped = value.strip()
+    if stripped.lstrip("-").isdigit():
+        return int(stripped)
+    return stripped
+
+
+def warm_up_model(transport, base_url: str, model: str, keep_alive: KeepAlive = DEFAULT_KEEP_ALIVE,
+                  read_timeout: float = 600, num_ctx: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Load ``model`` into memory without generating anything.
+
+    An ``/api/chat`` request with no messages only loads the model and sets
+    its ``keep_alive``; ``num_ctx`` (None for the model default) is the
+    context to load it with. Returns the client-measured ``load_time`` (plus the
+    server's ``load_duration`` in seconds when reported); on failure returns
+    ``{"ok": False, "error": ...}`` so the run can go ahead unwarmed.
+    """
+    payload: Dict[str, Any] = {"model": model, "messages": [], "keep_alive": keep_alive}
+    if num_ctx is not None:
+        payload["options"] = {"num_ctx": num_ctx}
+    start = time.perf_counter()
+    try:
+        response = transport.post(
+            f"{base_url}/api/chat",
+            json=payload,
+            read_timeout=read_timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f"⚠️  Could not warm up {model}, first example will include load time: {e}")
+        return {"ok": False, "error": str(e), "keep_alive": keep_alive, "num_ctx": num_ctx}
+    return {
+        "ok": True,
+        "load_time": time.perf_counter() - start,
+        "load_duration": data["load_duration"] / 1e9 if data.get("load_duration") is not None else None,
+        "keep_alive": keep_alive,
+        "num_ctx": num_ctx,
+    }
+
+
+def warm_up_endpoints(transport, endpoints, model: str, keep_alive: KeepAlive = DEFAULT_KEEP_ALIVE,
+                      num_ctx: Optional[int] = None) -> Dict[str, Any]:
+    """
+    ``warm_up_model`` on every endpoint of an ``EndpointPool`` at once.
+
+    With several endpoints ``load_time`` is the slowest successful load and
+    the per-endpoint results are kept under ``endpoints``; the run counts as
+    warmed up if any endpoint loaded the model.
+    """
+    if len(endpoints) == 1:
+        return warm_up_model(transport, endpoints.urls[0], model, keep_alive, num_ctx=num_ctx)
+    results = endpoints.map(lambda url: warm_up_model(transport, url, model, keep_alive, num_ctx=num_ctx))
+    loaded = [result for result in results.values() if result["ok"]]
+    return {
+        "ok": bool(loaded),
+        "load_time": max((result["load_time"] for result in loaded), default=None),
+        "keep_alive": keep_alive,
+        "num_ctx": num_ctx,
+        "endpoints": results,
+        **({} if loaded else {"error": "no endpoint could load the model"}),
+    }
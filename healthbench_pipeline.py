@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Two-stage generate → grade pipeline shared by the HealthBench evaluators.
+
+Generation workers pull test cases from the input iterator and push their
+output onto a bounded queue; grading workers drain that queue. Each stage
+has its own worker count, and the queue bound provides backpressure so the
+generator never runs arbitrarily far ahead of the grader. With tracing on,
+each stage records spans for its work and for the time it spends blocked
+on the queue.
+
+Items can also be split into groups that must not overlap: with Ollama
+each ``num_ctx`` is a separate model load, so the first request of a new
+``num_ctx`` bucket waits until the previous bucket's requests are done
+instead of forcing reloads back and forth.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from healthbench_trace import TRACER
+
+_SENTINEL = object()
+_DROPPED = object()
+_NO_GROUP = object()
+
+
+class StageStats:
+    """Busy/wait accounting for one pipeline stage."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, busy: float, wait: float = 0.0):
+        with self._lock:
+            self.items += 1
+            self.busy_time += busy
+            self.wait_time += wait
+
+    def to_dict(self, wall_time: float) -> Dict[str, Any]:
+        capacity = wall_time * self.workers
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_time": self.busy_time,
+            "wait_time": self.wait_time,
+            "utilization": (self.busy_time / capacity) if capacity > 0 else 0,
+        }
+
+
+class Pipeline:
+    """
+    Run ``generate`` and ``grade`` over ``items`` with bounded concurrency.
+
+    ``generate(index, item)`` runs on a generation worker; returning ``None``
+    drops the item. Otherwise its return value is handed to
+    ``grade(index, value)`` on a grading worker, whose return value is the
+    final result.
+
+    ``on_complete(index, result)`` is called from the grading worker as soon
+    as each result is ready, in completion order (e.g. to checkpoint it).
+    ``on_result(index, result)`` is called in input order through a small
+    reorder buffer; without it, ``run`` returns the ordered results instead.
+    Once ``stop_event`` is set no new items are started; items already in
+    flight are finished.
+
+    With ``group_key(item)``, an item whose key differs from the previous
+    item's is not started until every ``generate`` call already running has
+    returned, so generations from two groups never run at the same time.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[int, Any], Any],
+        grade: Callable[[int, Any], Any],
+        generation_workers: int = 1,
+        grading_workers: int = 1,
+        queue_size: Optional[int] = None,
+        on_complete: Optional[Callable[[int, Any], None]] = None,
+        on_result: Optional[Callable[[int, Any], None]] = None,
+        stop_event: Optional[threading.Event] = None,
+        group_key: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.generate = generate
+        self.grade = grade
+        self.on_complete = on_complete
+        self.on_result = on_result
+        self.stop_event = stop_event
+        self.group_key = group_key
+        # Group changes that waited for the previous group's generations
+        self.group_drains = 0
+        self.generation = StageStats("generation", max(1, generation_workers))
+        self.grading = StageStats("grading", max(1, grading_workers))
+        self.queue_size = queue_size or 2 * self.grading.workers
+        self.max_queue_depth = 0
+        self.wall_time = 0.0
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        source = iter(enumerate(items, 1))
+        source_lock = threading.Lock()
+        handoff: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        results: List[Any] = []
+        errors: List[BaseException] = []
+        pending: Dict[int, Any] = {}
+        next_index = [1]
+        emit_lock = threading.Lock()
+        # Running generate calls, and the group of the last item handed out
+        generating = [0]
+        generation_idle = threading.Condition()
+        current_group = [_NO_GROUP]
+
+        def emit(index: int, result: Any):
+            with emit_lock:
+                pending[index] = result
+                while next_index[0] in pending:
+                    ready = pending.pop(next_index[0])
+                    if ready is not _DROPPED:
+                        if self.on_result is not None:
+                            self.on_result(next_index[0], ready)
+                        else:
+                            results.append(ready)
+                    next_index[0] += 1
+
+        def next_item() -> Optional[Tuple[int, Any]]:
+            with TRACER.span("pipeline.next_item"), source_lock:
+                if errors or (self.stop_event is not None and self.stop_event.is_set()):
+                    return None
+                entry = next(source, None)
+                if entry is None:
+                    return None
+                if self.group_key is not None:
+                    group = self.group_key(entry[1])
+                    if current_group[0] is not _NO_GROUP and group != current_group[0]:
+                        # Holding source_lock keeps the other workers from starting items meanwhile
+                        with TRACER.span("pipeline.group_drain"), generation_idle:
+                            if generating[0]:
+                                self.group_drains += 1
+                            generation_idle.wait_for(lambda: not generating[0])
+                    current_group[0] = group
+                with generation_idle:
+                    generating[0] += 1
+                return entry
+
+        def generation_done():
+            with generation_idle:
+                generating[0] -= 1
+                generation_idle.notify_all()
+
+        def generation_worker():
+            while True:
+                entry = next_item()
+                if entry is None:
+                    return
+                index, item = entry
+                start = time.time()
+                try:
+                    with TRACER.span("pipeline.generate", index=index):
+                        value = self.generate(index, item)
+                except BaseException as e:
+                    errors.append(e)
+                    return
+                finally:
+                    generation_done()
+                busy = time.time() - start
+                if value is None:
+                    self.generation.record(busy)
+                    emit(index, _DROPPED)
+                    continue
+                put_start = time.time()
+                with TRACER.span("pipeline.queue_put", index=index):
+                    handoff.put((index, value))
+                self.generation.record(busy, time.time() - put_start)
+                self.max_queue_depth = max(self.max_queue_depth, handoff.qsize())
+
+        def grading_worker():
+            while True:
+                wait_start = time.time()
+                with TRACER.span("pipeline.queue_wait"):
+                    entry = handoff.get()
+                wait = time.time() - wait_start
+                if entry is _SENTINEL:
+                    return
+                index, value = entry
+                start = time.time()
+                try:
+                    with TRACER.span("pipeline.grade", index=index):
+                        result = self.grade(index, value)
+                    if self.on_complete is not None:
+                        self.on_complete(index, result)
+                    emit(index, result)
+                except BaseException as e:
+                    errors.append(e)
+                self.grading.record(time.time() - start, wait)
+
+        wall_start = time.time()
+        generators = [
+            threading.Thread(target=generation_worker, name=f"gen-{n}", daemon=True)
+            for n in range(self.generation.workers)
+        ]
+        graders = [
+            threading.Thread(target=grading_worker, name=f"grade-{n}", daemon=True)
+            for n in range(self.grading.workers)
+        ]
+        for thread in generators + graders:
+            thread.start()
+        for thread in generators:
+            thread.join()
+        for _ in graders:
+            handoff.put(_SENTINEL)
+        for thread in graders:
+            thread.join()
+        self.wall_time = time.time() - wall_start
+
+        if errors:
+            raise errors[0]
+
+        return results
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-stage utilization stats for the final results JSON."""
+        return {
+            "wall_time": self.wall_time,
+            "queue_size": self.queue_size,
+            "max_queue_depth": self.max_queue_depth,
+            "group_drains": self.group_drains,
+            "generation": self.generation.to_dict(self.wall_time),
+            "grading": self.grading.to_dict(self.wall_time),
+        }
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Console output of a running evaluation.
+
+By default each example prints a block: a banner, the question, a response
+preview and the score. At high concurrency that floods the terminal, and
+writing it through a slow SSH session or logging pipe costs real time.
+With ``--quiet``:
+
+* ``ProgressLine`` replaces the blocks with one progress line showing
+  throughput, ETA, running mean score and error count. It is redrawn at
+  most once per ``interval``.
+* ``ExampleLog`` writes the per-example blocks only to ``--log-file``,
+  either in full or as one summary line per example, and so do warnings
+  raised mid-run (grading failures, endpoint ejections).
+
+The run's start banner and final results are printed as before.
+"""
+
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, TextIO
+
+LOG_VERBOSITIES = ("summary", "full")
+
+# Seconds between progress redraws on a terminal, and between progress lines on a pipe or log
+TTY_INTERVAL = 1.0
+PIPE_INTERVAL = 30.0
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def summary_line(label: str, result: Optional[Dict[str, Any]]) -> str:
+    """One line per example for ``--log-verbosity summary``."""
+    if result is None:
+        return f"{label} | skipped (no prompt)"
+    parts = [label, str(result.get("prompt_id"))]
+    if "error" in result:
+        parts.append(f"error: {result['error']}")
+    else:
+        parts.append(f"{result['percentage']:.1f}% ({result['rubric_score']}/{result['rubric_max']})")
+        elapsed = result.get("total_time", result.get("response_time"))
+        if elapsed is not None:
+            parts.append(f"{elapsed:.2f}s{' cached' if result.get('cached') else ''}")
+    return " | ".join(parts)
+
+
+class ExampleLog:
+    """
+    Destination of the per-example output blocks.
+
+    Blocks go to the console unless ``console`` is off, and to ``path`` if
+    given. In the file, ``verbosity`` "full" writes the whole block and
+    "summary" writes one ``summary_line``. Each block is written under one
+    lock, so concurrent workers never interleave their lines.
+    """
+
+    def __init__(self, console: bool = True, path: Optional[str] = None, verbosity: str = "full"):
+        if verbosity not in LOG_VERBOSITIES:
+            raise ValueError(f"Unknown log verbosity: {verbosity} (expected one of {', '.join(LOG_VERBOSITIES)})")
+        self.console = console
+        self.path = path
+        self.verbosity = verbosity
+        self._file: Optional[TextIO] = open(path, 'a', encoding='utf-8') if path else None
+        self._lock = threading.Lock()
+
+    def example(self, label: str, lines: List[str], result: Optional[Dict[str, Any]] = None):
+        """Output one example's block; ``result`` is its result record (None if it was skipped)."""
+        if not self.console and self._file is None:
+            return
+        text = "\n".join(lines)
+        with self._lock:
+            if self.console:
+                print(text)
+            if self._file is not None:
+                self._file.write((text if self.verbosity == "full" else summary_line(label, result)) + "\n")
+                self._file.flush()
+
+    def warning(self, text: str):
+        """Output a diagnostic raised while examples run: to stderr unless ``console`` is off, and to ``path``."""
+        if not self.console and self._file is None:
+            return
+        with self._lock:
+            if self.console:
+                print(text, file=sys.stderr)
+            if self._file is not None:
+                self._file.write(text + "\n")
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class ProgressLine:
+    """
+    One rate-limited progress line for ``--quiet`` runs.
+
+    ``update(result)`` is called as each example finishes (in any thread).
+    On a terminal the line is redrawn in place. Otherwise a new line is
+    written every ``PIPE_INTERVAL`` seconds, so log files stay short. The
+    ETA needs ``total``, which the evaluators count before the run starts.
+    """
+
+    def __init__(self, total: Optional[int] = None, resumed: int = 0,
+                 stream: TextIO = sys.stderr, interval: Optional[float] = None):
+        self.total = total
+        self.resumed = resumed
+        self.stream = stream
+        self.tty = stream.isatty()
+        self.interval = interval if interval is not None else (TTY_INTERVAL if self.tty else PIPE_INTERVAL)
+        self.done = 0
+        self.errors = 0
+        self._percentage_sum = 0.0
+        self._start = time.time()
+        self._last_draw = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, result: Dict[str, Any]):
+        with self._lock:
+            self.done += 1
+            if "error" in result:
+                self.errors += 1
+            else:
+                self._percentage_sum += result.get("percentage", 0)
+            now = time.time()
+            if now - self._last_draw >= self.interval:
+                self._last_draw = now
+                self._draw(now)
+
+    def render(self, now: Optional[float] = None) -> str:
+        elapsed = (now or time.time()) - self._start
+        throughput = self.done / elapsed if elapsed > 0 else 0.0
+        finished = self.done + self.resumed
+        evaluated = self.done - self.errors
+        parts = [f"{finished}/{self.total}" if self.total else f"{finished}"]
+        if self.total:
+            parts[0] += f" ({finished / self.total * 100:.0f}%)"
+        parts.append(f"{throughput:.2f} ex/s")
+        if self.total and throughput > 0:
+            parts.append(f"ETA {format_duration(max(0, self.total - finished) / throughput)}")
+        parts.append(f"elapsed {format_duration(elapsed)}")
+        parts.append(f"mean {self._percentage_sum / evaluated:.1f}%" if evaluated else "mean -")
+        parts.append(f"errors {self.errors}")
+        return "⏳ " + " | ".join(parts)
+
+    def _draw(self, now: float):
+        if self.tty:
+            self.stream.write("\r\033[K" + self.render(now))
+        else:
+            self.stream.write(self.render(now) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        """Draw the final state and end the line."""
+        with self._lock:
+            self._draw(time.time())
+            if self.tty:
+                self.stream.write("\n")
+                self.stream.flush()
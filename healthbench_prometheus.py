@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Live run metrics in the Prometheus text exposition format.
+
+``METRICS`` is updated from inside ``run_evaluation`` while a run is in
+progress. It tracks:
+
+* examples completed and failed;
+* generation and grading requests in flight;
+* per-stage latency histograms;
+* cache hits and misses;
+* grader attempts, retries and the adaptive concurrency limit.
+
+The cache and grader figures are read from their ``summary()`` at scrape
+time, so they are always current. The metrics can be exposed in two ways:
+
+* ``MetricsServer``: an HTTP endpoint (``/metrics``) that Prometheus
+  scrapes directly.
+* ``TextfileWriter``: rewrites a ``.prom`` file every few seconds for
+  node_exporter's textfile collector, for hosts where a port cannot be
+  opened.
+
+Updating the metrics costs a lock and a few additions per example, so they
+are always collected. Only the exporters are optional. Counters are
+cumulative for the process, as Prometheus expects.
+"""
+
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the stage latency buckets: fast cache hits up to slow generations
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TTFT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[Any]] = {}
+
+    def observe(self, labels: Labels, value: float):
+        series = self._series.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self, name: str) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = _format_value(float(bound))
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class RunMetrics:
+    """Counters, gauges and histograms of the current process's evaluation runs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._examples: Dict[Labels, int] = {}
+        self._in_flight: Dict[str, int] = {"generation": 0, "grading": 0}
+        self._stage_seconds = Histogram(STAGE_BUCKETS)
+        self._ttft = Histogram(TTFT_BUCKETS)
+        self._run: Dict[str, Any] = {}
+        self._last_result: Optional[float] = None
+
+    def start_run(
+        self,
+        model: str,
+        dataset: str,
+        grader_name: Optional[str] = None,
+        planned: Optional[int] = None,
+        resumed: int = 0,
+        response_cache=None,
+        grade_cache=None,
+        grader=None,
+    ):
+        """Describe the run that is starting; its caches and grader are read at scrape time."""
+        with self._lock:
+            self._run = {
+                "model": model,
+                "dataset": dataset,
+                "grader_name": grader_name,
+                "planned": planned,
+                "resumed": resumed,
+                "start_time": time.time(),
+                "response_cache": response_cache,
+                "grade_cache": grade_cache,
+                "grader": grader,
+            }
+
+    @contextmanager
+    def track(self, stage: str) -> Iterator[None]:
+        """Count one request of ``stage`` in flight and observe how long it took."""
+        start = time.perf_counter()
+        with self._lock:
+            self._in_flight[stage] = self._in_flight.get(stage, 0) + 1
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight[stage] -= 1
+                self._stage_seconds.observe((("stage", stage),), elapsed)
+
+    def record(self, result: Dict[str, Any]):
+        """Count a finished example (in completion order)."""
+        status = "failed" if "error" in result else "completed"
+        labels = (("model", result.get("model") or self._run.get("model", "")), ("status", status))
+        with self._lock:
+            self._examples[labels] = self._examples.get(labels, 0) + 1
+            if result.get("time_to_first_token") is not None and not result.get("cached"):
+                self._ttft.observe((), result["time_to_first_token"])
+            self._last_result = time.time()
+
+    def _source_lines(self, run: Dict[str, Any]) -> List[str]:
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[Labels, float]]):
+            if not samples:
+                return
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+
+        caches = [(name, run[name].summary()) for name in ("response_cache", "grade_cache") if run.get(name) is not None]
+        metric("healthbench_cache_lookups_total", "counter", "Cache lookups by cache and result.", [
+            ((("cache", name), ("result", result)), summary[key])
+            for name, summary in caches
+            for result, key in (("hit", "hits"), ("miss", "misses"), ("shared", "shared_in_flight"))
+            if key in summary
+        ])
+        metric("healthbench_cache_hit_ratio", "gauge", "Fraction of cache lookups served from the cache.",
+               [((("cache", name),), summary["hit_rate"]) for name, summary in caches])
+
+        grader = run.get("grader")
+        retry = getattr(grader, "retry", None)
+        if retry is not None:
+            retries = retry.summary()
+            metric("healthbench_grader_attempts_total", "counter", "Grader requests sent, including retries.",
+                   [((), retries["attempts"])])
+            metric("healthbench_grader_retries_total", "counter", "Grader retries by reason.",
+                   [((("reason", reason),), count) for reason, count in sorted(retries["retries_by_reason"].items())]
+                   or [((("reason", "none"),), 0)])
+            metric("healthbench_grader_retries_exhausted_total", "counter",
+                   "Grader calls that failed after using every attempt.", [((), retries["exhausted"])])
+        limiter = getattr(grader, "limiter", None)
+        if limiter is not None:
+            limits = limiter.summary()
+            metric("healthbench_grader_concurrency_limit", "gauge", "Current adaptive grading concurrency limit.",
+                   [((), limits["limit"])])
+            metric("healthbench_grader_overloads_total", "counter", "Grader responses that signalled overload (429/5xx/timeout).",
+                   [((), limits["overloads"])])
+        return lines
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            run = dict(self._run)
+            examples = dict(self._examples)
+            in_flight = dict(self._in_flight)
+            stage_lines = self._stage_seconds.render("healthbench_stage_duration_seconds")
+            ttft_lines = self._ttft.render("healthbench_time_to_first_token_seconds")
+            last_result = self._last_result
+
+        lines = []
+        if run:
+            run_labels = tuple((name, run[name] or "") for name in ("model", "dataset", "grader_name"))
+            lines += [
+                "# HELP healthbench_run_info Labels of the current run.",
+                "# TYPE healthbench_run_info gauge",
+                f"healthbench_run_info{_format_labels(run_labels)} 1",
+                "# HELP healthbench_run_start_time_seconds Unix time the current run started.",
+                "# TYPE healthbench_run_start_time_seconds gauge",
+                f"healthbench_run_start_time_seconds {_format_value(run['start_time'])}",
+                "# HELP healthbench_examples_resumed Examples of the current run taken from the checkpoint.",
+                "# TYPE healthbench_examples_resumed gauge",
+                f"healthbench_examples_resumed {run['resumed']}",
+            ]
+            if run.get("planned"):
+                lines += [
+                    "# HELP healthbench_examples_planned Examples the current run was asked to evaluate.",
+                    "# TYPE healthbench_examples_planned gauge",
+                    f"healthbench_examples_planned {run['planned']}",
+                ]
+        lines += ["# HELP healthbench_examples_total Examples finished, by model and status.",
+                  "# TYPE healthbench_examples_total counter"]
+        lines += [f"healthbench_examples_total{_format_labels(labels)} {count}"
+                  for labels, count in sorted(examples.items())]
+        lines += ["# HELP healthbench_in_flight Requests in progress, by stage.",
+                  "# TYPE healthbench_in_flight gauge"]
+        lines += [f"healthbench_in_flight{_format_labels((('stage', stage),))} {count}"
+                  for stage, count in sorted(in_flight.items())]
+        lines += ["# HELP healthbench_stage_duration_seconds Time spent in each stage per example.",
+                  "# TYPE healthbench_stage_duration_seconds histogram"] + stage_lines
+        if ttft_lines:
+            lines += ["# HELP healthbench_time_to_first_token_seconds Streaming time to first token.",
+                      "# TYPE healthbench_time_to_first_token_seconds histogram"] + ttft_lines
+        if last_result is not None:
+            lines += ["# HELP healthbench_last_result_timestamp_seconds Unix time the last example finished.",
+                      "# TYPE healthbench_last_result_timestamp_seconds gauge",
+                      f"healthbench_last_result_timestamp_seconds {_format_value(last_result)}"]
+        lines += self._source_lines(run)
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide metrics updated by the evaluators
+METRICS = RunMetrics()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    """Serve ``metrics.render()`` at ``/metrics`` on a background thread."""
+
+    def __init__(self, metrics: RunMetrics, port: int, host: str = "0.0.0.0"):
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TextfileWriter:
+    """Rewrite ``path`` atomically every ``interval`` seconds (node_exporter textfile collector)."""
+
+    def __init__(self, metrics: RunMetrics, path: str, interval: float = 15.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-textfile", daemon=True)
+
+    def write(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.metrics.render())
+        os.replace(tmp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"⚠️  Could not write metrics to {self.path}: {e}")
+
+    def start(self) -> "TextfileWriter":
+        self.write()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        # Final values, so the file reflects the finished run
+        self.write()
+
+
+@contextmanager
+def live_metrics(port: Optional[int] = None, textfile: Optional[str] = None,
+                 interval: float = 15.0, metrics: RunMetrics = METRICS) -> Iterator[None]:
+    """``--metrics-port`` / ``--metrics-file`` around a run; nothing is exported when both are None."""
+    exporters: List[Any] = []
+    if port is not None:
+        exporters.append(MetricsServer(metrics, port).start())
+        print(f"📈 Prometheus metrics at http://localhost:{exporters[-1].port}/metrics")
+    if textfile:
+        exporters.append(TextfileWriter(metrics, textfile, interval).start())
+        print(f"📈 Prometheus metrics written to {textfile} every {interval:g}s")
+    try:
+        yield
+    finally:
+        for exporter in exporters:
+            exporter.stop()
@@ -4,9 +4,11 @@ HealthBench evaluation with real dataset from OpenAI.
 Downloads and evaluates actual HealthBench test cases.
 """
 
-import json
+import os
 import time
-from typing import Dict, List, Any, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Sequence, Tuple, Union
 
 try:
     import requests
@@ -14,27 +16,87 @@ except ImportError:
     print("Error: Please install requests: pip install requests")
     exit(1)
 
+from healthbench_cache import ResponseCache
+from healthbench_dataset import DatasetCache, count_examples, iter_jsonl, iter_shard
+from healthbench_endpoints import EndpointPool, ollama_health_check
+from healthbench_http import DEFAULT_CONNECT_TIMEOUT, HttpTransport, pool_size_for
+from healthbench_metrics import (
+    SERVER_AVERAGE_FIELDS,
+    STREAM_FIELDS,
+    server_timings,
+    stream_chat,
+    summarize_server_timings,
+)
+from healthbench_ollama import DEFAULT_KEEP_ALIVE, KeepAlive, parse_keep_alive, warm_up_endpoints
+from healthbench_schedule import ContextBuckets, ReorderBuffer, make_scheduler, parse_num_ctx, peek
+from healthbench_results import (
+    CheckpointWriter,
+    GracefulInterrupt,
+    ResultAggregator,
+    StreamingResultsWriter,
+    checkpoint_path_for,
+    replay_checkpoint,
+)
+from healthbench_rules import Rule, RuleSet
+from healthbench_progress import LOG_VERBOSITIES, ExampleLog, ProgressLine
+from healthbench_prometheus import METRICS, live_metrics
+from healthbench_trace import TRACER, trace_run
+
 # HealthBench dataset URL
 HEALTHBENCH_URL = "https://openaipublic.blob.core.windows.net/simple-evals/healthbench/2025-05-07-06-14-12_oss_eval.jsonl"
 HEALTHBENCH_HARD_URL = "https://openaipublic.blob.core.windows.net/simple-evals/healthbench/hard_2025-05-08-21-00-10.jsonl"
 HEALTHBENCH_CONSENSUS_URL = "https://openaipublic.blob.core.windows.net/simple-evals/healthbench/consensus_2025-05-09-20-00-46.jsonl"
 
+# Heuristic grading rules: a criterion mentioning any ``criterion`` keyword is
+# met when the response contains one of the ``response`` keywords.
+# Note: This is simplified - real HealthBench uses GPT-4 as grader
+HEURISTIC_RULES = RuleSet([
+    # Positive criteria
+    Rule("doctor", criterion=["doctor", "physician", "medical", "healthcare"],
+         response=["医生", "就医", "医院", "医疗", "建议"]),
+    Rule("therapy", criterion=["therapy", "plan", "treatment", "intervention"],
+         response=["治疗", "建议", "计划", "方法", "方案"]),
+    Rule("emergency", criterion=["emergency", "urgent", "immediate"],
+         response=["立即", "马上", "急救", "急诊", "紧急"]),
+    Rule("disclaimer", criterion=["disclaimer", "not medical advice", "professional"],
+         response=["仅供参考", "不能替代", "请咨询医生", "建议就医"]),
+    Rule("monitor", criterion=["monitor", "track", "improvement"],
+         response=["观察", "监测", "持续", "改善"]),
+    Rule("structured", criterion=["specific", "clear", "structured"],
+         markers=["。", "1.", "•"], min_length=50),
+    # Negative criteria (should NOT be present): assume a reasonable response
+    # is not harmful, so negative items award abs(points)
+    Rule("harmful", criterion=["harmful", "dangerous", "not accurate", "avoid"],
+         min_length=20, negative=True),
+], mode="any")
+
 
 class OllamaClient:
-    """Simple Ollama client for testing."""
+    """Simple Ollama client for testing; ``base_url`` may list several comma-separated endpoints."""
 
     def __init__(
         self,
         model: str = "medical-assistant",
-        base_url: str = "http://localhost:11434",
+        base_url: Union[str, Sequence[str]] = "http://localhost:11434",
         temperature: float = 0.7,
+        transport: Optional[HttpTransport] = None,
+        stream: bool = False,
+        keep_alive: Optional[KeepAlive] = None,
+        num_ctx: Union[None, int, ContextBuckets] = None,
+        num_predict: Optional[int] = None,
     ):
         self.model = model
-        self.base_url = base_url
         self.temperature = temperature
-
-    def chat(self, messages: List[Dict[str, str]], system_message: str = None) -> str:
-        """Send chat request to Ollama."""
+        self.transport = transport or HttpTransport()
+        self.endpoints = EndpointPool(base_url, health_check=ollama_health_check(self.transport))
+        self.base_url = self.endpoints.urls[0]
+        self.stream = stream
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.num_predict = num_predict
+
+    def build_payload(self, messages: List[Dict[str, str]], system_message: str = None) -> Dict[str, Any]:
+        """Build the /api/chat request body for a conversation."""
         ollama_messages = []
 
         for msg in messages:
@@ -52,55 +114,135 @@ class OllamaClient:
         payload = {
             "model": self.model,
             "messages": ollama_messages,
-            "stream": False,
+            "stream": self.stream,
             "options": {
                 "temperature": self.temperature,
             }
         }
 
+        # Context size (fixed, or bucketed by prompt length) and reply cap;
+        # left to the model defaults when not set
+        if isinstance(self.num_ctx, ContextBuckets):
+            payload["options"]["num_ctx"] = self.num_ctx.num_ctx_for(messages)
+        elif self.num_ctx is not None:
+            payload["options"]["num_ctx"] = self.num_ctx
+        if self.num_predict is not None:
+            payload["options"]["num_predict"] = self.num_predict
+
         if system_message:
             payload["system"] = system_message
 
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+
+        return payload
+
+    def warm_up(self, messages: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """
+        Load the model before timed requests, pinning it for ``keep_alive``.
+
+        The model is loaded with the ``num_ctx`` of the first request
+        (``messages``), since Ollama reloads it when ``num_ctx`` changes.
+        """
+        if isinstance(self.num_ctx, ContextBuckets):
+            num_ctx = self.num_ctx.num_ctx_for(messages) if messages else None
+        else:
+            num_ctx = self.num_ctx
+        return warm_up_endpoints(self.transport, self.endpoints, self.model, self.keep_alive or DEFAULT_KEEP_ALIVE,
+                                 num_ctx=num_ctx)
+
+    def chat(self, messages: List[Dict[str, str]], system_message: str = None) -> str:
+        """Send chat request to Ollama."""
+        return self.chat_with_stats(messages, system_message)[0]
+
+    def chat_with_stats(self, messages: List[Dict[str, str]], system_message: str = None) -> Tuple[str, Dict[str, Any]]:
+        """Send chat request to Ollama; returns the reply and its latency/server timing stats."""
+        payload = self.build_payload(messages, system_message)
+
         try:
-            response = requests.post(
-                f"{self.base_url}/api/chat",
-                json=payload,
-                timeout=300
-            )
-            response.raise_for_status()
-            data = response.json()
-            return data.get("message", {}).get("content", "")
+            with TRACER.span("ollama.chat", model=self.model, stream=self.stream):
+                return self.endpoints.call(lambda base_url: self._chat_at(base_url, payload))
         except requests.exceptions.RequestException as e:
             raise RuntimeError(f"Ollama API error: {e}")
 
+    def _chat_at(self, base_url: str, payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """Send one request to ``base_url``; the stats record which endpoint served it."""
+        with TRACER.span("ollama.request", endpoint=base_url):
+            return self._request_at(base_url, payload)
+
+    def _request_at(self, base_url: str, payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        if self.stream:
+            content, stats = stream_chat(self.transport, f"{base_url}/api/chat", payload, read_timeout=300)
+            return content, {**stats, "endpoint": base_url}
+
+        start = time.perf_counter()
+        response = self.transport.post(
+            f"{base_url}/api/chat",
+            json=payload,
+            read_timeout=300
+        )
+        response.raise_for_status()
+        data = response.json()
+        return data.get("message", {}).get("content", ""), {**server_timings(data, time.perf_counter() - start), "endpoint": base_url}
+
 
 class HealthBenchEvaluator:
     """Evaluator using real HealthBench dataset."""
 
-    def __init__(self, model: str = "medical-assistant"):
-        self.client = OllamaClient(model=model)
-        self.results = []
+    def __init__(
+        self,
+        model: str = "medical-assistant",
+        ollama_base_url: Union[str, Sequence[str]] = "http://localhost:11434",
+        offline: bool = False,
+        cache_dir: Optional[str] = None,
+        transport: Optional[HttpTransport] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        cache_max_entries: int = 100_000,
+        stream: bool = False,
+        keep_alive: KeepAlive = DEFAULT_KEEP_ALIVE,
+        num_ctx: Union[None, int, ContextBuckets] = None,
+        num_predict: Optional[int] = None,
+    ):
+        self.transport = transport or HttpTransport()
+        self.client = OllamaClient(model=model, base_url=ollama_base_url, transport=self.transport,
+                                   stream=stream, keep_alive=keep_alive, num_ctx=num_ctx, num_predict=num_predict)
+        self.dataset_cache = DatasetCache(cache_dir=cache_dir, offline=offline, transport=self.transport)
+        self.response_cache = ResponseCache(
+            path=os.path.join(self.dataset_cache.cache_dir, "responses.sqlite"),
+            max_entries=cache_max_entries,
+            refresh=refresh_cache,
+        ) if use_cache else None
+
+    def load_dataset(
+        self,
+        dataset_url: str,
+        num_examples: Optional[int] = None,
+        dataset_file: Optional[str] = None,
+        shard_index: int = 0,
+        num_shards: int = 1,
+    ) -> Tuple[Iterator[Dict], int]:
+        """
+        Load HealthBench dataset from a local file or the dataset cache.
 
-    def load_dataset(self, dataset_url: str, num_examples: Optional[int] = None) -> List[Dict]:
-        """Load HealthBench dataset from URL."""
-        print(f"📥 Loading dataset from {dataset_url.split('/')[-1]}")
+        Returns a lazy iterator over shard ``shard_index``'s test cases that
+        parses one JSONL line at a time and stops after ``num_examples``, and
+        the number of test cases it will yield (counted up front for the
+        progress total and ETA).
+        """
+        print(f"📥 Loading dataset from {(dataset_file or dataset_url).split('/')[-1]}")
 
         try:
-            response = requests.get(dataset_url, timeout=60)
-            response.raise_for_status()
+            with TRACER.span("dataset.load"):
+                path = dataset_file or self.dataset_cache.fetch(dataset_url)
+            print(f"✅ Dataset ready: {path}")
 
             # Read JSONL format (one JSON per line)
-            lines = response.text.strip().split('\n')
-            test_cases = [json.loads(line) for line in lines if line.strip()]
-
-            print(f"✅ Loaded {len(test_cases)} test cases")
-
-            if num_examples:
-                return test_cases[:num_examples]
+            test_cases = iter_shard(iter_jsonl(path, limit=num_examples or None), shard_index, num_shards)
+            with TRACER.span("dataset.count"):
+                return test_cases, count_examples(path, num_examples or None, shard_index, num_shards)
 
-            return test_cases
-
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, OSError) as e:
             raise RuntimeError(f"Failed to load dataset: {e}")
 
     def evaluate_response(self, response: str, rubric: List[Dict]) -> Dict[str, Any]:
@@ -108,70 +250,153 @@ class HealthBenchEvaluator:
         Heuristic evaluation of response against rubric.
         This is a simplified evaluation; real HealthBench uses GPT-4 for evaluation.
         """
-        response_lower = response.lower()
-        total_points = sum(item["points"] for item in rubric)
-        scores = []
-
-        for item in rubric:
-            criterion = item["criterion"].lower()
-            points = item["points"]
-            met = False
-
-            # Heuristic matching based on criterion keywords
-            # Note: This is simplified - real HealthBench uses GPT-4 as grader
-
-            # Positive criteria
-            if any(word in criterion for word in ["doctor", "physician", "medical", "healthcare"]):
-                if any(word in response_lower for word in ["医生", "就医", "医院", "医疗", "建议"]):
-                    met = True
-
-            if any(word in criterion for word in ["therapy", "plan", "treatment", "intervention"]):
-                if any(word in response_lower for word in ["治疗", "建议", "计划", "方法", "方案"]):
-                    met = True
-
-            if any(word in criterion for word in ["emergency", "urgent", "immediate"]):
-                if any(word in response_lower for word in ["立即", "马上", "急救", "急诊", "紧急"]):
-                    met = True
-
-            if any(word in criterion for word in ["disclaimer", "not medical advice", "professional"]):
-                if any(word in response_lower for word in ["仅供参考", "不能替代", "请咨询医生", "建议就医"]):
-                    met = True
-
-            if any(word in criterion for word in ["monitor", "track", "improvement"]):
-                if any(word in response_lower for word in ["观察", "监测", "持续", "改善"]):
-                    met = True
-
-            if any(word in criterion for word in ["specific", "clear", "structured"]):
-                if len(response) > 50 and ("。" in response or "1." in response or "•" in response):
-                    met = True
-
-            # Negative criteria (should NOT be present)
-            if any(word in criterion for word in ["harmful", "dangerous", "not accurate", "avoid"]):
-                # For negative criteria, we want them NOT to be met
-                # This is tricky - simplified approach
-                if len(response) > 20:  # Assume reasonable response is not harmful
-                    met = False  # Good: negative criterion NOT met
-                    if points < 0:
-                        scores.append(abs(points))  # Good response on negative criterion = positive points
-                    continue
-
-            if met:
-                scores.append(points)
-
-        return {
-            "score": sum(scores),
-            "max_score": total_points,
-            "percentage": (sum(scores) / total_points * 100) if total_points > 0 else 0,
-            "rubric_items": len(rubric),
-        }
+        evaluation = HEURISTIC_RULES.evaluate(response, rubric)
+        evaluation["rubric_items"] = len(rubric)
+        return evaluation
+
+    def evaluate_responses(self, pairs: Iterable[Tuple[str, List[Dict]]]) -> List[Dict[str, Any]]:
+        """Heuristic evaluation of many ``(response, rubric)`` pairs."""
+        return [self.evaluate_response(response, rubric) for response, rubric in pairs]
+
+    def _evaluate_case(
+        self,
+        index: int,
+        total: Optional[int],
+        test_case: Dict,
+        log: ExampleLog,
+    ) -> Optional[Dict[str, Any]]:
+        """Generate and score a single test case.
+
+        Output is buffered and handed to ``log`` in one block so that
+        concurrent workers do not interleave their lines.
+        """
+        label = f"Test Case {index}/{total}" if total else f"Test Case {index}"
+        lines = [f"{'='*60}", label, f"{'='*60}"]
+
+        # Extract user message
+        prompt = test_case.get("prompt", [])
+        if not prompt:
+            lines.append("⚠️  No prompt found, skipping")
+            log.example(label, lines)
+            return None
+
+        user_message = prompt[-1].get("content", "")
+
+        # Display tags/themes
+        tags = test_case.get("example_tags", [])
+        if tags:
+            lines.append(f"\n🏷️  Tags: {', '.join(tags)}")
+
+        lines.append(f"\n📝 Question: {user_message[:200]}...")
+
+        try:
+            # Get response from model (or the response cache)
+            start_time = time.time()
+            if self.response_cache is not None:
+                response, cached, model_stats = self.response_cache.chat_with_stats(self.client, prompt)
+            else:
+                (response, model_stats), cached = self.client.chat_with_stats(prompt), False
+            elapsed_time = time.time() - start_time
+
+            lines.append(f"\n🤖 Response (truncated): {response[:300]}...")
+            lines.append(f"\n⏱️  Response time: {elapsed_time:.2f}s{' (cached)' if cached else ''}")
+            if model_stats.get("time_to_first_token") is not None:
+                lines.append(f"⚡ TTFT: {model_stats['time_to_first_token']:.2f}s, "
+                             f"decode: {model_stats['decode_tokens_per_sec'] or 0:.1f} tok/s "
+                             f"({model_stats['streamed_tokens']} tokens)")
+            if "total_duration" in model_stats:
+                lines.append(f"🖥️  Server: load {model_stats.get('load_duration', 0) / 1e9:.2f}s, "
+                             f"prompt {model_stats.get('prompt_eval_count', 0)} tok / {model_stats.get('prompt_eval_duration', 0) / 1e9:.2f}s, "
+                             f"eval {model_stats.get('eval_count', 0)} tok / {model_stats.get('eval_duration', 0) / 1e9:.2f}s, "
+                             f"overhead {model_stats['client_overhead']:.2f}s")
+
+            # Evaluate against rubric
+            rubric = test_case.get("rubrics", [])
+            with TRACER.span("heuristic.evaluate"):
+                evaluation = self.evaluate_response(response, rubric)
+
+            lines.append(f"\n📊 Score: {evaluation['score']}/{evaluation['max_score']} ({evaluation['percentage']:.1f}%)")
+            lines.append(f"📏 Rubric items: {evaluation['rubric_items']}")
+
+            result = {
+                "prompt_id": test_case.get("prompt_id"),
+                "question": user_message,
+                "response": response,
+                "rubric_score": evaluation["score"],
+                "rubric_max": evaluation["max_score"],
+                "percentage": evaluation["percentage"],
+                "response_time": elapsed_time,
+                "cached": cached,
+                "rubric_items": evaluation["rubric_items"],
+                "tags": tags,
+                **model_stats,
+            }
+
+        except Exception as e:
+            lines.append(f"\n❌ Error: {e}")
+            result = {
+                "prompt_id": test_case.get("prompt_id"),
+                "question": user_message,
+                "response": "",
+                "error": str(e),
+                "rubric_score": 0,
+                "rubric_max": 0,
+                "percentage": 0,
+            }
+
+        log.example(label, lines, result)
+        return result
 
     def run_evaluation(
         self,
         dataset: str = "standard",
         num_examples: Optional[int] = None,
-        output_file: str = "healthbench_real_results.json"
+        output_file: str = "healthbench_real_results.json",
+        concurrency: int = 1,
+        dataset_file: Optional[str] = None,
+        resume: bool = False,
+        checkpoint_file: Optional[str] = None,
+        warmup: bool = True,
+        shard_index: int = 0,
+        num_shards: int = 1,
+        schedule: str = "file",
+        quiet: bool = False,
+        log_file: Optional[str] = None,
+        log_verbosity: str = "full",
     ):
-        """Run evaluation on real HealthBench dataset."""
+        """Run evaluation on real HealthBench dataset and return the summary.
+
+        Individual results are streamed to ``output_file`` as they complete
+        rather than kept in memory.
+
+        ``concurrency`` is the number of generation requests kept in flight
+        against Ollama; match it to the server's ``OLLAMA_NUM_PARALLEL``.
+        ``dataset_file`` reads a local JSONL instead of the dataset URL.
+
+        Each finished example is appended to ``checkpoint_file`` (default:
+        ``<output_file>.checkpoint.jsonl``); with ``resume`` the examples
+        already completed there are skipped. Ctrl-C stops starting new
+        examples and writes a partial summary.
+
+        With ``warmup`` the model is loaded before the clock starts, so its
+        load time is reported separately instead of inflating the first
+        example's response time.
+
+        With ``num_shards`` > 1 only the examples whose ``prompt_id`` hashes
+        to ``shard_index`` are evaluated (after the ``num_examples`` cut), so
+        N machines can split one run; combine the outputs with
+        ``healthbench_merge.py``.
+
+        With ``schedule="prefix"`` examples are sent grouped by shared
+        conversation prefix and length so Ollama can reuse the previous
+        prompt's cache; results are still written in dataset order and the
+        summary estimates the prompt tokens saved compared with file order.
+
+        With ``quiet`` the per-example blocks are replaced by one progress
+        line (throughput, ETA, mean score, errors). ``log_file`` receives
+        the blocks, in full or as one line per example (``log_verbosity``
+        "summary"), whether or not the console shows them.
+        """
         # Select dataset
         if dataset == "standard":
             url = HEALTHBENCH_URL
@@ -183,117 +408,232 @@ class HealthBenchEvaluator:
             raise ValueError(f"Unknown dataset: {dataset}")
 
         # Load test cases
-        test_cases = self.load_dataset(url, num_examples)
-
-        if not test_cases:
+        # progress_total (counted up front) gives the progress line its ETA
+        test_cases, progress_total = self.load_dataset(url, num_examples, dataset_file=dataset_file,
+                                                       shard_index=shard_index, num_shards=num_shards)
+
+        # Results are streamed to the output file as they complete and the
+        # summary comes from running totals, so memory use does not grow
+        # with the length of the run.
+        writer = StreamingResultsWriter(output_file, {
+            "model": self.client.model,
+            "dataset": dataset,
+            "num_examples": num_examples,
+            "shard": {"index": shard_index, "count": num_shards},
+        })
+        # Cache hits did not call the model, so they are left out of latency averages
+        aggregator = ResultAggregator(
+            {"response_time": "cached", **{field: "cached" for field in SERVER_AVERAGE_FIELDS}},
+            distribution_fields=STREAM_FIELDS,
+        )
+
+        checkpoint_path = checkpoint_path_for(output_file, checkpoint_file)
+        checkpoint = CheckpointWriter(checkpoint_path, append=resume)
+        if checkpoint.backup_path:
+            print(f"📦 Moved the existing checkpoint to {checkpoint.backup_path} (use --resume to continue that run)")
+
+        # Results waiting for their turn in dataset order are kept as
+        # checkpoint offsets and read back when written
+        def record(position: int, offset: int):
+            result = checkpoint.read(offset)
+            aggregator.add(result)
+            if "error" not in result:
+                writer.write(result)
+
+        reorder = ReorderBuffer(record)
+
+        # Resume from the checkpoint: completed results go back into the
+        # reorder buffer at their recorded positions, failed ones are retried.
+        # Positions are dataset positions, numbered before skipping completed examples.
+        completed_ids = replay_checkpoint(checkpoint_path, reorder) if resume else set()
+        resumed = len(completed_ids)
+        numbered = enumerate(test_cases, 1)
+        if completed_ids:
+            print(f"♻️  Resuming: {resumed} examples already completed in {checkpoint_path}")
+            numbered = ((position, tc) for position, tc in numbered if tc.get("prompt_id") not in completed_ids)
+
+        print(f"\n🧪 Starting evaluation on {num_examples or 'all'} examples")
+        print(f"📋 Model: {self.client.model}")
+        if len(self.client.endpoints) > 1:
+            print(f"🖧 Ollama endpoints: {', '.join(self.client.endpoints.urls)}")
+        print(f"📊 Dataset: {dataset}")
+        if num_shards > 1:
+            print(f"🧩 Shard: {shard_index + 1}/{num_shards}")
+        print(f"🔀 Concurrency: {concurrency}\n")
+
+        # With --num-ctx auto examples run bucket by bucket, so each num_ctx loads the model once
+        scheduler = make_scheduler(schedule, self.client.num_ctx)
+        items = scheduler.schedule(numbered) if scheduler is not None else numbered
+        first, items = peek(items)
+
+        # Load the model up front, with the first example's num_ctx, so no
+        # measured request includes load time
+        warmup_stats = None
+        if warmup:
+            warmup_stats = self.client.warm_up(first[1].get("prompt") if first else None)
+            if warmup_stats["ok"]:
+                print(f"🔥 Model warm-up: loaded in {warmup_stats['load_time']:.2f}s "
+                      f"(keep_alive {warmup_stats['keep_alive']})\n")
+
+        # Evaluate each test case on a bounded worker pool, consuming the
+        # dataset iterator lazily. Results go through a reorder buffer keyed
+        # by dataset position, so the output order never depends on the
+        # send order or on which worker finishes first.
+        # --quiet: one progress line on the console, per-example output only in the log file
+        log = ExampleLog(console=not quiet, path=log_file, verbosity=log_verbosity)
+        # Endpoint ejections mid-run go to the log too, not through the progress line
+        self.client.endpoints.warn = log.warning
+        progress = ProgressLine(progress_total, resumed=resumed) if quiet else None
+        max_in_flight = 2 * max(1, concurrency)
+        in_flight = deque()
+        total_cases = 0
+
+        METRICS.start_run(self.client.model, dataset, "heuristic", planned=progress_total, resumed=resumed,
+                          response_cache=self.response_cache)
+
+        def evaluate(position: int, test_case: Dict) -> Optional[Dict[str, Any]]:
+            # Heuristic grading takes microseconds, so the whole example counts as generation
+            with TRACER.tagged(prompt_id=test_case.get("prompt_id")), TRACER.span("example", position=position), \
+                    METRICS.track("generation"):
+                result = self._evaluate_case(position, progress_total, test_case, log)
+            if result is not None:
+                METRICS.record(result)
+                if progress is not None:
+                    progress.update(result)
+            return result
+
+        def collect(entry):
+            position, future = entry
+            result = future.result()
+            reorder.push(position, checkpoint.append(result, position) if result is not None else None)
+
+        # With --num-ctx auto, requests of the previous bucket finish before the
+        # next bucket starts, so the model is not reloaded back and forth
+        context = self.client.num_ctx if isinstance(self.client.num_ctx, ContextBuckets) else None
+        bucket = None
+
+        wall_start = time.time()
+        try:
+            with GracefulInterrupt() as interrupt, \
+                    ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                for position, test_case in items:
+                    if interrupt.interrupted:
+                        break
+                    if context is not None:
+                        previous, bucket = bucket, context.bucket(test_case.get("prompt", []))
+                        if previous is not None and bucket != previous:
+                            while in_flight:
+                                collect(in_flight.popleft())
+                    total_cases += 1
+                    in_flight.append(
+                        (position, pool.submit(evaluate, position, test_case))
+                    )
+                    if len(in_flight) >= max_in_flight:
+                        collect(in_flight.popleft())
+                while in_flight:
+                    collect(in_flight.popleft())
+            reorder.flush()
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            checkpoint.close()
+            log.close()
+            if progress is not None:
+                progress.close()
+        wall_time = time.time() - wall_start
+        total_cases += resumed
+
+        if not total_cases:
+            writer.abort()
             print("❌ No test cases found!")
             return None
 
-        print(f"\n🧪 Starting evaluation on {len(test_cases)} examples")
-        print(f"📋 Model: {self.client.model}")
-        print(f"📊 Dataset: {dataset}\n")
-
-        # Evaluate each test case
-        for i, test_case in enumerate(test_cases, 1):
-            print(f"{'='*60}")
-            print(f"Test Case {i}/{len(test_cases)}")
-            print(f"{'='*60}")
-
-            # Extract user message
-            prompt = test_case.get("prompt", [])
-            if not prompt:
-                print("⚠️  No prompt found, skipping")
-                continue
-
-            user_message = prompt[-1].get("content", "")
-
-            # Display tags/themes
-            tags = test_case.get("example_tags", [])
-            if tags:
-                print(f"\n🏷️  Tags: {', '.join(tags)}")
-
-            print(f"\n📝 Question: {user_message[:200]}...")
-
-            try:
-                # Get response from model
-                start_time = time.time()
-                response = self.client.chat(prompt)
-                elapsed_time = time.time() - start_time
-
-                print(f"\n🤖 Response (truncated): {response[:300]}...")
-                print(f"\n⏱️  Response time: {elapsed_time:.2f}s")
-
-                # Evaluate against rubric
-                rubric = test_case.get("rubrics", [])
-                evaluation = self.evaluate_response(response, rubric)
-
-                print(f"\n📊 Score: {evaluation['score']}/{evaluation['max_score']} ({evaluation['percentage']:.1f}%)")
-                print(f"📏 Rubric items: {evaluation['rubric_items']}")
-
-                self.results.append({
-                    "prompt_id": test_case.get("prompt_id"),
-                    "question": user_message,
-                    "response": response,
-                    "rubric_score": evaluation["score"],
-                    "rubric_max": evaluation["max_score"],
-                    "percentage": evaluation["percentage"],
-                    "response_time": elapsed_time,
-                    "rubric_items": evaluation["rubric_items"],
-                    "tags": tags,
-                })
-
-            except Exception as e:
-                print(f"\n❌ Error: {e}")
-                self.results.append({
-                    "prompt_id": test_case.get("prompt_id"),
-                    "question": user_message,
-                    "response": "",
-                    "error": str(e),
-                    "rubric_score": 0,
-                    "rubric_max": 0,
-                    "percentage": 0,
-                })
-
         # Calculate final statistics
-        valid_results = [r for r in self.results if "error" not in r]
-        if valid_results:
-            total_score = sum(r["rubric_score"] for r in valid_results)
-            total_max = sum(r["rubric_max"] for r in valid_results)
-            avg_time = sum(r["response_time"] for r in valid_results) / len(valid_results)
-            avg_percentage = sum(r["percentage"] for r in valid_results) / len(valid_results)
+        if aggregator.evaluated:
+            avg_time = aggregator.average("response_time")
+            avg_percentage = aggregator.average_percentage
+            new_results = aggregator.evaluated - resumed
+            throughput = new_results / wall_time if wall_time > 0 else 0
 
             print(f"\n{'='*60}")
             print("📊 Final Results")
             print(f"{'='*60}")
-            print(f"Total Score: {total_score}/{total_max}")
+            print(f"Total Score: {aggregator.total_score}/{aggregator.total_max}")
             print(f"Average Score: {avg_percentage:.1f}%")
             print(f"Average Response Time: {avg_time:.2f}s")
-            print(f"Test Cases Evaluated: {len(valid_results)}/{len(test_cases)}")
-
-            # Save results
-            final_results = {
-                "model": self.client.model,
-                "dataset": dataset,
-                "total_examples": len(test_cases),
-                "evaluated_examples": len(valid_results),
-                "total_score": total_score,
-                "total_max": total_max,
+            streaming = {field: aggregator.distribution(field) for field in STREAM_FIELDS} if self.client.stream else None
+            if streaming and streaming["time_to_first_token"]["count"]:
+                ttft, itl, tps = (streaming[field] for field in STREAM_FIELDS)
+                print(f"Time to First Token: p50 {ttft['p50']:.2f}s / p95 {ttft['p95']:.2f}s")
+                if itl["count"]:
+                    print(f"Inter-token Latency: p50 {itl['p50'] * 1000:.1f}ms / p95 {itl['p95'] * 1000:.1f}ms")
+                    print(f"Decode Speed: p50 {tps['p50']:.1f} / p95 {tps['p95']:.1f} tok/s")
+            server_timing = summarize_server_timings(aggregator)
+            if server_timing:
+                print(f"Server Timing: load {server_timing['average_load_duration']:.2f}s, "
+                      f"prompt eval {server_timing['average_prompt_eval_duration']:.2f}s, "
+                      f"eval {server_timing['average_eval_duration']:.2f}s, "
+                      f"client overhead {server_timing['average_client_overhead']:.2f}s")
+            schedule_stats = scheduler.summary() if scheduler is not None else None
+            if schedule_stats and schedule_stats["num_ctx_buckets"]:
+                print("num_ctx Buckets: " + ", ".join(
+                    f"{size} x {count}" for size, count in schedule_stats["num_ctx_buckets"].items()))
+            if schedule_stats and schedule_stats["group_prefixes"]:
+                print(f"Prefix Schedule: {schedule_stats['prefix_groups']} groups, ~"
+                      f"{schedule_stats['estimated_reused_tokens']} prompt tokens reusable vs ~"
+                      f"{schedule_stats['estimated_reused_tokens_file_order']} in file order "
+                      f"({schedule_stats['estimated_saved_fraction'] * 100:.1f}% of prompt tokens saved)")
+            if self.response_cache is not None:
+                cache_stats = self.response_cache.summary()
+                print(f"Response Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                      f"({cache_stats['hit_rate'] * 100:.1f}% hit rate)")
+            endpoints = self.client.endpoints.summary()
+            if len(endpoints) > 1:
+                print("Ollama Endpoints:")
+                for endpoint in endpoints:
+                    print(f"  - {endpoint['url']}: {endpoint['completed']} requests ({endpoint['share'] * 100:.0f}%), "
+                          f"avg {endpoint['average_latency'] or 0:.2f}s, {endpoint['throughput'] or 0:.2f} req/s, "
+                          f"{endpoint['failures']} failures / {endpoint['ejections']} ejections")
+            print(f"Throughput: {throughput:.2f} examples/s ({wall_time:.1f}s wall, concurrency {concurrency})")
+            print(f"Test Cases Evaluated: {aggregator.evaluated}/{total_cases}")
+            if interrupt.interrupted:
+                print("⚠️  Partial results: run was interrupted (use --resume to continue)")
+
+            # Save results: the results array is already written, append the summary
+            summary = {
+                "total_examples": total_cases,
+                "evaluated_examples": aggregator.evaluated,
+                "failed_examples": aggregator.failed,
+                "partial": interrupt.interrupted,
+                "resumed_examples": resumed,
+                "total_score": aggregator.total_score,
+                "total_max": aggregator.total_max,
                 "average_percentage": avg_percentage,
+                "tags": aggregator.tag_breakdown(),
                 "average_response_time": avg_time,
-                "results": valid_results,
+                "streaming": streaming,
+                "server_timing": server_timing,
+                "schedule": schedule_stats,
+                "num_ctx": "auto" if isinstance(self.client.num_ctx, ContextBuckets) else self.client.num_ctx,
+                "num_predict": self.client.num_predict,
+                "warmup": warmup_stats,
+                "endpoints": endpoints,
+                "concurrency": concurrency,
+                "wall_time": wall_time,
+                "throughput": throughput,
+                "response_cache": self.response_cache.summary() if self.response_cache is not None else None,
             }
-
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(final_results, f, ensure_ascii=False, indent=2)
+            writer.close(summary)
 
             print(f"\n💾 Results saved to {output_file}")
 
-            return final_results
+            return summary
         else:
+            writer.abort()
             print("\n❌ No valid results!")
             return None
 
-
 def main():
     """Main entry point."""
     import argparse
@@ -303,6 +643,9 @@ def main():
     )
     parser.add_argument("--model", type=str, default="medical-assistant",
                        help="Ollama model name (default: medical-assistant)")
+    parser.add_argument("--ollama-url", type=str, default="http://localhost:11434",
+                       help="Ollama URL; give several comma-separated endpoints to balance across them "
+                            "(default: http://localhost:11434)")
     parser.add_argument("--dataset", type=str, default="standard",
                        choices=["standard", "hard", "consensus"],
                        help="HealthBench dataset variant (default: standard)")
@@ -310,16 +653,111 @@ def main():
                        help="Number of examples to test (default: all)")
     parser.add_argument("--output", type=str, default="healthbench_real_results.json",
                        help="Output JSON file (default: healthbench_real_results.json)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                       help="Number of concurrent generation requests (default: 1)")
+    parser.add_argument("--dataset-file", type=str, default=None,
+                       help="Local JSONL (or .jsonl.gz) file to use instead of downloading")
+    parser.add_argument("--offline", action="store_true",
+                       help="Never touch the network; use only the local dataset cache")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                       help="Dataset cache directory (default: ~/.cache/healthbench)")
+    parser.add_argument("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT,
+                       help=f"HTTP connect timeout in seconds (default: {DEFAULT_CONNECT_TIMEOUT:g})")
+    parser.add_argument("--read-timeout", type=float, default=None,
+                       help="HTTP read timeout in seconds (default: 300 for Ollama)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Disable the model-response cache")
+    parser.add_argument("--refresh", action="store_true",
+                       help="Ignore cached responses and regenerate (results are re-cached)")
+    parser.add_argument("--cache-max-entries", type=int, default=100_000,
+                       help="Maximum cached responses before LRU eviction (default: 100000)")
+    parser.add_argument("--stream", action="store_true",
+                       help="Stream responses and record time-to-first-token and tokens/s")
+    parser.add_argument("--keep-alive", type=parse_keep_alive, default=DEFAULT_KEEP_ALIVE,
+                       help=f"How long Ollama keeps the model loaded between requests, "
+                            f"e.g. 30m or -1 for forever (default: {DEFAULT_KEEP_ALIVE})")
+    parser.add_argument("--no-warmup", action="store_true",
+                       help="Skip loading the model before the timed run")
+    parser.add_argument("--shard-index", type=int, default=0,
+                       help="Evaluate only this shard (0-based) of the dataset (default: 0)")
+    parser.add_argument("--num-shards", type=int, default=1,
+                       help="Split the dataset into this many shards by prompt_id hash (default: 1)")
+    parser.add_argument("--num-ctx", type=str, default=None,
+                       help="Ollama context size: auto to size each example by prompt length in buckets "
+                            "of 2048-32768 (run bucket by bucket so each reloads the model once), "
+                            "or a fixed number (default: model default)")
+    parser.add_argument("--num-predict", type=int, default=None,
+                       help="Cap on generated tokens per answer, bounding tail latency (default: no cap)")
+    parser.add_argument("--schedule", choices=["file", "prefix"], default="file",
+                       help="Send order: file order, or grouped by shared conversation prefix so "
+                            "Ollama can reuse its prompt cache; results stay in dataset order (default: file)")
+    parser.add_argument("--resume", action="store_true",
+                       help="Skip examples already completed in the checkpoint file "
+                            "(without it an existing checkpoint is moved to .bak)")
+    parser.add_argument("--checkpoint", type=str, default=None,
+                       help="Checkpoint JSONL path (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--trace", type=str, default=None,
+                       help="Record per-stage spans (dataset parsing, Ollama requests, grading, result writing) "
+                            "and export them as Chrome trace JSON for https://ui.perfetto.dev")
+    parser.add_argument("--profile", type=str, default=None,
+                       help="Run under cProfile (all worker threads) and write a sorted hotspot report to this file")
+    parser.add_argument("--quiet", "--progress", dest="quiet", action="store_true",
+                       help="Replace the per-example console output with one rate-limited progress line "
+                            "(throughput, ETA, mean score, errors)")
+    parser.add_argument("--log-file", type=str, default=None,
+                       help="Append the per-example output to this file (with or without --quiet)")
+    parser.add_argument("--log-verbosity", choices=LOG_VERBOSITIES, default="full",
+                       help="--log-file detail: full per-example blocks, or one summary line per example "
+                            "(default: full)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                       help="Serve live Prometheus metrics at /metrics on this port (examples completed/failed, "
+                            "in-flight requests, per-stage latency histograms, cache hit rates)")
+    parser.add_argument("--metrics-file", type=str, default=None,
+                       help="Periodically write Prometheus metrics to this file, atomically, for the "
+                            "node_exporter textfile collector (the name must end in .prom)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                       help="Seconds between --metrics-file writes (default: 15)")
 
     args = parser.parse_args()
 
     # Run evaluation
-    evaluator = HealthBenchEvaluator(model=args.model)
-    results = evaluator.run_evaluation(
-        dataset=args.dataset,
-        num_examples=args.examples,
-        output_file=args.output
+    num_ctx = parse_num_ctx(args.num_ctx, args.num_predict)
+    evaluator = HealthBenchEvaluator(
+        model=args.model,
+        ollama_base_url=args.ollama_url,
+        offline=args.offline,
+        cache_dir=args.cache_dir,
+        transport=HttpTransport(
+            pool_size=pool_size_for(args.concurrency),
+            connect_timeout=args.connect_timeout,
+            read_timeout=args.read_timeout,
+        ),
+        use_cache=not args.no_cache,
+        refresh_cache=args.refresh,
+        cache_max_entries=args.cache_max_entries,
+        stream=args.stream,
+        keep_alive=args.keep_alive,
+        num_ctx=num_ctx,
+        num_predict=args.num_predict,
     )
+    with trace_run(args.trace, args.profile), \
+            live_metrics(args.metrics_port, args.metrics_file, args.metrics_interval):
+        results = evaluator.run_evaluation(
+            dataset=args.dataset,
+            num_examples=args.examples,
+            output_file=args.output,
+            concurrency=args.concurrency,
+            dataset_file=args.dataset_file,
+            resume=args.resume,
+            checkpoint_file=args.checkpoint,
+            warmup=not args.no_warmup,
+            shard_index=args.shard_index,
+            num_shards=args.num_shards,
+            schedule=args.schedule,
+            quiet=args.quiet,
+            log_file=args.log_file,
+            log_verbosity=args.log_verbosity,
+        )
 
     if results:
         print("\n✅ Evaluation complete!")
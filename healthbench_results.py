@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Streaming, crash-safe result persistence for long HealthBench runs.
+
+Every finished example is appended to a JSONL checkpoint as soon as it
+completes. Writes are flushed immediately and fsync'd in batches (every
+``fsync_every`` records or ``fsync_interval`` seconds), so a crash loses at
+most the last unsynced batch. ``replay_checkpoint`` feeds a checkpoint back
+in for ``--resume``, tolerating a torn final line. Each line also records
+the example's position in the dataset, so a resumed run writes the old and
+new results together in dataset order. ``append`` returns the
+record's offset in the file, so code that has to hold finished results
+for a while (e.g. to write them in dataset order) can keep the offset and
+``read`` the record back instead of keeping it in memory.
+
+Nothing keeps the full list of results in memory: ``StreamingResultsWriter``
+writes each record into the output JSON as it arrives and
+``ResultAggregator`` keeps the running totals the summary needs.
+"""
+
+import json
+import os
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from healthbench_metrics import summarize_distribution
+from healthbench_trace import TRACER
+
+# Checkpoint field holding the example's dataset position; not part of the result record
+POSITION_FIELD = "_position"
+
+
+class CheckpointWriter:
+    """Append-only JSONL checkpoint with batched fsync; records can be read back by offset."""
+
+    def __init__(
+        self,
+        path: str,
+        append: bool = False,
+        fsync_every: int = 20,
+        fsync_interval: float = 5.0,
+    ):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        # Starting over keeps an earlier run's checkpoint as <path>.bak instead of truncating it
+        self.backup_path: Optional[str] = None
+        if not append and os.path.exists(path) and os.path.getsize(path) > 0:
+            self.backup_path = f"{path}.bak"
+            os.replace(path, self.backup_path)
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+        self._reader = None
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def append(self, record: Dict[str, Any], position: Optional[int] = None) -> int:
+        """Write ``record`` with its dataset ``position``; returns its offset for ``read``."""
+        with TRACER.span("checkpoint.append", prompt_id=record.get("prompt_id")):
+            return self._append(record if position is None else {**record, POSITION_FIELD: position})
+
+    def _append(self, record: Dict[str, Any]) -> int:
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            offset = self._file.tell()
+            self._file.write(line + "\n")
+            self._file.flush()
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or time.time() - self._last_sync >= self.fsync_interval):
+                self._sync()
+            return offset
+
+    def read(self, offset: int) -> Dict[str, Any]:
+        """The record ``append`` wrote at ``offset``."""
+        with self._lock:
+            if self._reader is None:
+                self._reader = open(self.path, 'rb')
+            self._reader.seek(offset)
+            record = json.loads(self._reader.readline().decode('utf-8'))
+        record.pop(POSITION_FIELD, None)
+        return record
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.time()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            self._sync()
+            self._file.close()
+            if self._reader is not None:
+                self._reader.close()
+
+
+def iter_checkpoint(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield the ``(offset, record)`` pairs of a checkpoint, skipping a partially written last line."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        offset = 0
+        for line in f:
+            start, offset = offset, offset + len(line)
+            if not line.strip():
+                continue
+            try:
+                yield start, json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue
+
+
+def replay_checkpoint(
+    path: str,
+    reorder,
+    key: Callable[[Dict[str, Any]], Any] = lambda record: record.get("prompt_id"),
+) -> Set[Any]:
+    """
+    Feed the successful records of an earlier run back into a new run.
+
+    Each record's checkpoint offset is pushed into ``reorder``, the new
+    run's ``ReorderBuffer``, at the dataset position it was recorded with,
+    so the old results are written in order among the new ones. Failed
+    examples are left out so they are retried, as are records whose
+    ``key`` is None. Returns the set of completed keys (``prompt_id`` by
+    default) to skip.
+    """
+    completed: Set[Any] = set()
+    for offset, record in iter_checkpoint(path):
+        record_key = key(record)
+        if "error" in record or record_key is None or record_key in completed:
+            continue
+        completed.add(record_key)
+        reorder.push(record[POSITION_FIELD], offset)
+    return completed
+
+
+class ResultAggregator:
+    """
+    Running totals over result records.
+
+    ``timing_fields`` maps each timing field to be averaged to an optional
+    flag name; records with that flag set (e.g. cache hits) are left out of
+    that field's average. ``distribution_fields`` keep every non-null value
+    so ``distribution`` can report percentiles. Scores are also tallied per
+    entry of each record's ``tags`` for ``tag_breakdown``.
+    """
+
+    def __init__(
+        self,
+        timing_fields: Optional[Dict[str, Optional[str]]] = None,
+        distribution_fields: Sequence[str] = (),
+    ):
+        self.timing_fields = timing_fields or {}
+        self.evaluated = 0
+        self.failed = 0
+        self.total_score = 0
+        self.total_max = 0
+        self._percentage_sum = 0.0
+        self._timing = {field: [0.0, 0] for field in self.timing_fields}
+        self._distributions = {field: [] for field in distribution_fields}
+        self._tags: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            if "error" in record:
+                self.failed += 1
+                return
+            self.evaluated += 1
+            self.total_score += record["rubric_score"]
+            self.total_max += record["rubric_max"]
+            self._percentage_sum += record["percentage"]
+            for field, skip_flag in self.timing_fields.items():
+                if field in record and not (skip_flag and record.get(skip_flag)):
+                    self._timing[field][0] += record[field]
+                    self._timing[field][1] += 1
+            for field, values in self._distributions.items():
+                if record.get(field) is not None:
+                    values.append(record[field])
+            for tag in record.get("tags") or ():
+                totals = self._tags.setdefault(tag, [0, 0, 0, 0.0])
+                totals[0] += 1
+                totals[1] += record["rubric_score"]
+                totals[2] += record["rubric_max"]
+                totals[3] += record["percentage"]
+
+    @property
+    def average_percentage(self) -> float:
+        return self._percentage_sum / self.evaluated if self.evaluated else 0
+
+    def average(self, field: str) -> float:
+        total, count = self._timing[field]
+        return total / count if count else 0
+
+    def count(self, field: str) -> int:
+        """Number of records that contributed to ``field``'s average."""
+        return self._timing[field][1]
+
+    def tag_breakdown(self) -> Dict[str, Dict[str, Any]]:
+        """Per-tag example count, score totals and average percentage, sorted by tag."""
+        with self._lock:
+            return {
+                tag: {
+                    "examples": count,
+                    "total_score": score,
+                    "total_max": max_score,
+                    "average_percentage": percentage_sum / count,
+                }
+                for tag, (count, score, max_score, percentage_sum) in sorted(self._tags.items())
+            }
+
+    def distribution(self, field: str) -> Dict[str, Any]:
+        with self._lock:
+            return summarize_distribution(self._distributions[field])
+
+
+def _dump_indented(value: Any, indent: int) -> str:
+    return json.dumps(value, ensure_ascii=False, indent=2).replace("\n", "\n" + " " * indent)
+
+
+class StreamingResultsWriter:
+    """
+    Write the output JSON incrementally.
+
+    ``header`` fields are written up front, each record is appended to the
+    ``results`` array as it arrives, and the summary fields follow the array
+    on ``close``. The file is built under ``<path>.tmp`` and renamed into
+    place on close, so ``path`` only ever holds a complete document.
+    """
+
+    def __init__(self, path: str, header: Dict[str, Any]):
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.tmp"
+        self._lock = threading.Lock()
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+        self._file.write("{\n")
+        for key, value in header.items():
+            self._file.write(f"  {json.dumps(key)}: {_dump_indented(value, 2)},\n")
+        self._file.write('  "results": [')
+
+    def write(self, record: Dict[str, Any]):
+        with TRACER.span("results.write", prompt_id=record.get("prompt_id")), self._lock:
+            separator = ",\n    " if self.count else "\n    "
+            self._file.write(separator + _dump_indented(record, 4))
+            self.count += 1
+
+    def close(self, summary: Dict[str, Any]):
+        with self._lock:
+            self._file.write("\n  ]" if self.count else "]")
+            for key, value in summary.items():
+                self._file.write(f",\n  {json.dumps(key)}: {_dump_indented(value, 2)}")
+            self._file.write("\n}\n")
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+
+class GracefulInterrupt:
+    """
+    SIGINT handling for evaluation runs.
+
+    The first Ctrl-C sets ``stop_event`` so no new examples are started while
+    in-flight ones finish and get checkpointed; a second Ctrl-C raises
+    ``KeyboardInterrupt`` immediately. Only installed from the main thread.
+    """
+
+    def __init__(self):
+        self.stop_event = threading.Event()
+        self._previous = None
+
+    @property
+    def interrupted(self) -> bool:
+        return self.stop_event.is_set()
+
+    def _handle(self, signum, frame):
+        if self.stop_event.is_set():
+            raise KeyboardInterrupt
+        self.stop_event.set()
+        print("\n⚠️  Interrupted: finishing in-flight examples and writing a partial summary "
+              "(press Ctrl-C again to abort)")
+
+    def __enter__(self) -> "GracefulInterrupt":
+        if threading.current_thread() is threading.main_thread():
+            self._previous = signal.signal(signal.SIGINT, self._handle)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._previous is not None:
+            signal.signal(signal.SIGINT, self._previous)
+            self._previous = None
+        return False
+
+
+def checkpoint_path_for(output_file: str, checkpoint_file: Optional[str] = None) -> str:
+    """Default checkpoint location next to the output JSON."""
+    return checkpoint_file or f"{output_file}.checkpoint.jsonl"
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Compiled keyword rule engine for the heuristic HealthBench graders.
+
+The heuristic evaluators describe their keyword tables as a list of
+``Rule`` objects. ``RuleSet`` compiles all criterion keywords and all
+response keywords into one regex each, so a response is scanned once per
+example (instead of once per keyword per rubric item), and memoizes the
+criterion → matching-rules classification across the dataset.
+"""
+
+import re
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+
+class Rule:
+    """
+    One heuristic: if the criterion mentions any of ``criterion`` keywords,
+    the item is met when the response satisfies every given condition.
+
+    Response conditions (all optional, combined with AND):
+        response: any of these keywords appears in the lowercased response
+        markers: any of these strings appears in the raw response
+        min_length: len(response) is strictly greater than this
+        min_sentences: the response has at least this many "。"-separated parts
+
+    ``negative`` marks criteria describing behaviour that should be absent.
+    ``fallthrough`` (first-match rule sets only) lets classification move on
+    to the next rule when the response conditions are not met.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        criterion: Sequence[str],
+        response: Sequence[str] = (),
+        markers: Sequence[str] = (),
+        min_length: Optional[int] = None,
+        min_sentences: Optional[int] = None,
+        negative: bool = False,
+        fallthrough: bool = False,
+    ):
+        self.name = name
+        self.criterion = tuple(criterion)
+        self.response = tuple(response)
+        self.markers = tuple(markers)
+        self.min_length = min_length
+        self.min_sentences = min_sentences
+        self.negative = negative
+        self.fallthrough = fallthrough
+
+
+class _KeywordMatcher:
+    """
+    Report which of a fixed set of keywords occur in a text, in one pass.
+
+    A zero-width lookahead alternation (longest keywords first) yields the
+    longest keyword starting at every position; keywords contained in a
+    reported one are added from a precomputed table, so overlapping and
+    nested keywords are all found.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        unique = sorted(set(keywords), key=lambda k: (-len(k), k))
+        self._implied: Dict[str, FrozenSet[str]] = {
+            keyword: frozenset(other for other in unique if other in keyword)
+            for keyword in unique
+        }
+        self._pattern = (
+            re.compile("(?=(" + "|".join(re.escape(k) for k in unique) + "))")
+            if unique else None
+        )
+
+    def find(self, text: str) -> FrozenSet[str]:
+        if self._pattern is None:
+            return frozenset()
+        found = set()
+        for longest in set(self._pattern.findall(text)):
+            found |= self._implied[longest]
+        return frozenset(found)
+
+
+class ResponseFeatures:
+    """Everything the rules need to know about one response, computed once."""
+
+    __slots__ = ("keywords", "length", "sentences", "text")
+
+    def __init__(self, text: str, keywords: FrozenSet[str]):
+        self.text = text
+        self.keywords = keywords
+        self.length = len(text)
+        self.sentences = text.count("。") + 1
+
+
+class RuleSet:
+    """
+    A compiled collection of rules.
+
+    ``mode="any"``: an item is met if any matching positive rule is
+    satisfied; a satisfied negative rule awards ``abs(points)`` for negative
+    items and skips the item otherwise.
+    ``mode="first"``: the first rule whose criterion matches decides the item
+    (honouring ``fallthrough``).
+    """
+
+    def __init__(self, rules: Sequence[Rule], mode: str = "any", criterion_field: str = "criterion",
+                 max_memo: int = 200_000):
+        if mode not in ("any", "first"):
+            raise ValueError(f"Unknown rule mode: {mode}")
+        self.rules = tuple(rules)
+        self.mode = mode
+        self.criterion_field = criterion_field
+        self.max_memo = max_memo
+        self._criterion_matcher = _KeywordMatcher(k for rule in self.rules for k in rule.criterion)
+        self._response_matcher = _KeywordMatcher(k for rule in self.rules for k in rule.response)
+        self._rule_criteria = [frozenset(rule.criterion) for rule in self.rules]
+        self._rule_responses = [frozenset(rule.response) for rule in self.rules]
+        self._memo: Dict[str, Tuple[int, ...]] = {}
+        self._memo_lock = threading.Lock()
+
+    def classify(self, criterion: str) -> Tuple[int, ...]:
+        """Indices of the rules whose criterion keywords occur in ``criterion`` (memoized)."""
+        matched = self._memo.get(criterion)
+        if matched is None:
+            found = self._criterion_matcher.find(criterion.lower())
+            matched = tuple(i for i, keywords in enumerate(self._rule_criteria) if keywords & found)
+            with self._memo_lock:
+                if len(self._memo) >= self.max_memo:
+                    self._memo.clear()
+                self._memo[criterion] = matched
+        return matched
+
+    def scan(self, response: str) -> ResponseFeatures:
+        return ResponseFeatures(response, self._response_matcher.find(response.lower()))
+
+    def _satisfied(self, i: int, features: ResponseFeatures) -> bool:
+        rule = self.rules[i]
+        if rule.response and not (features.keywords & self._rule_responses[i]):
+            return False
+        if rule.markers and not any(marker in features.text for marker in rule.markers):
+            return False
+        if rule.min_length is not None and features.length <= rule.min_length:
+            return False
+        if rule.min_sentences is not None and features.sentences < rule.min_sentences:
+            return False
+        return True
+
+    def _item_points(self, rule_ids: Tuple[int, ...], points: Any, features: ResponseFeatures) -> Any:
+        """Points awarded for one rubric item, or None if it is not met."""
+        if self.mode == "first":
+            for i in rule_ids:
+                satisfied = self._satisfied(i, features)
+                if self.rules[i].fallthrough and not satisfied:
+                    continue
+                return points if satisfied else None
+            return None
+
+        met = False
+        for i in rule_ids:
+            if self.rules[i].negative:
+                if self._satisfied(i, features):
+                    return abs(points) if points < 0 else None
+            elif not met and self._satisfied(i, features):
+                met = True
+        return points if met else None
+
+    def evaluate(self, response: str, rubric: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Score ``response`` against ``rubric``, scanning the response once."""
+        features = self.scan(response)
+        total_points = sum(item["points"] for item in rubric)
+        scores = []
+        for item in rubric:
+            awarded = self._item_points(self.classify(item[self.criterion_field]), item["points"], features)
+            if awarded is not None:
+                scores.append(awarded)
+        return {
+            "score": sum(scores),
+            "max_score": total_points,
+            "percentage": (sum(scores) / total_points * 100) if total_points > 0 else 0,
+        }
+
+    def evaluate_batch(self, pairs: Iterable[Tuple[str, List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """Score many ``(response, rubric)`` pairs, sharing the criterion memo."""
+        return [self.evaluate(response, rubric) for response, rubric in pairs]
@@ -0,0 +1,1249 @@
+#!/usr/bin/env python3
+"""
+Shared run logic of the grader-based HealthBench evaluators.
+
+``healthbench_deepseek_eval.py`` and ``healthbench_gpt4_eval.py`` differ
+only in how one grading request is sent. Everything else lives here:
+
+* ``OllamaClient``: model generation.
+* ``JsonGrader``: the grading prompt, retries, rate limits and reply
+  validation.
+* ``HealthBenchRunner``: the generate/grade pipeline, checkpoints, caches,
+  progress, metrics and multi-model comparison.
+* ``run_main``: the command line.
+
+A grader script subclasses ``JsonGrader`` (implementing ``_complete``) and
+``HealthBenchRunner`` (setting ``grader_class``), then calls ``run_main``.
+Console output is in Chinese, as in the grader scripts.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Type, Union
+
+from healthbench_cache import GradeCache, ResponseCache
+from healthbench_compare import PairedComparison, parse_models
+from healthbench_dataset import DatasetCache, count_examples, iter_jsonl, iter_shard
+from healthbench_endpoints import EndpointPool, ollama_health_check
+from healthbench_http import DEFAULT_CONNECT_TIMEOUT, HttpTransport, pool_size_for
+from healthbench_limits import (
+    AdaptiveLimiter,
+    MalformedResponseError,
+    RateLimiter,
+    RetryPolicy,
+    estimate_tokens,
+    parse_grader_json,
+)
+from healthbench_metrics import (
+    SERVER_AVERAGE_FIELDS,
+    STREAM_FIELDS,
+    server_timings,
+    stream_chat,
+    summarize_server_timings,
+)
+from healthbench_ollama import DEFAULT_KEEP_ALIVE, KeepAlive, parse_keep_alive, warm_up_endpoints
+from healthbench_pipeline import Pipeline
+from healthbench_schedule import ContextBuckets, ReorderBuffer, make_scheduler, parse_num_ctx, peek
+from healthbench_results import (
+    CheckpointWriter,
+    GracefulInterrupt,
+    ResultAggregator,
+    StreamingResultsWriter,
+    checkpoint_path_for,
+    replay_checkpoint,
+)
+from healthbench_progress import LOG_VERBOSITIES, ExampleLog, ProgressLine
+from healthbench_prometheus import METRICS, live_metrics
+from healthbench_trace import TRACER, trace_run
+
+
+class OllamaClient:
+    """Ollama API 客户端 (base_url 可为逗号分隔的多个端点，按最少在途请求分配)"""
+
+    def __init__(
+        self,
+        base_url: Union[str, Sequence[str]] = "http://localhost:11434",
+        model: str = "medical-assistant",
+        transport: Optional[HttpTransport] = None,
+        stream: bool = False,
+        keep_alive: Optional[KeepAlive] = None,
+        endpoints: Optional[EndpointPool] = None,
+        num_ctx: Union[None, int, ContextBuckets] = None,
+        num_predict: Optional[int] = None,
+    ):
+        self.model = model
+        self.transport = transport or HttpTransport()
+        # 多个模型的客户端可共用同一个端点池，负载均衡按全部在途请求计算
+        self.endpoints = endpoints or EndpointPool(base_url, health_check=ollama_health_check(self.transport))
+        self.base_url = self.endpoints.urls[0]
+        self.stream = stream
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+        self.num_predict = num_predict
+
+    def build_payload(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """构建 /api/chat 请求体"""
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": self.stream,
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        options = self.generation_options(messages)
+        if options:
+            payload["options"] = options
+        return payload
+
+    def generation_options(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """num_ctx (固定值或按提示词长度分桶) 与 num_predict 上限；未设置时沿用模型默认值"""
+        options = {}
+        if isinstance(self.num_ctx, ContextBuckets):
+            options["num_ctx"] = self.num_ctx.num_ctx_for(messages)
+        elif self.num_ctx is not None:
+            options["num_ctx"] = self.num_ctx
+        if self.num_predict is not None:
+            options["num_predict"] = self.num_predict
+        return options
+
+    def warm_up(self, messages: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+        """
+        预加载模型 (不计入计时)，并按 keep_alive 保持常驻
+
+        使用与第一个请求 (messages) 相同的 num_ctx：num_ctx 不同时 Ollama 会重新加载模型
+        """
+        if isinstance(self.num_ctx, ContextBuckets):
+            num_ctx = self.num_ctx.num_ctx_for(messages) if messages else None
+        else:
+            num_ctx = self.num_ctx
+        return warm_up_endpoints(self.transport, self.endpoints, self.model, self.keep_alive or DEFAULT_KEEP_ALIVE,
+                                 num_ctx=num_ctx)
+
+    def chat(self, messages: List[Dict[str, str]]) -> str:
+        """发送聊天请求到 Ollama"""
+        return self.chat_with_stats(messages)[0]
+
+    def chat_with_stats(self, messages: List[Dict[str, str]]) -> Tuple[str, Dict[str, Any]]:
+        """发送聊天请求到 Ollama，返回响应内容与延迟/服务端耗时统计"""
+        payload = self.build_payload(messages)
+        with TRACER.span("ollama.chat", model=self.model, stream=self.stream):
+            return self.endpoints.call(lambda base_url: self._chat_at(base_url, payload))
+
+    def _chat_at(self, base_url: str, payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """在单个端点上发送请求，统计中记录服务该请求的端点"""
+        with TRACER.span("ollama.request", endpoint=base_url):
+            return self._request_at(base_url, payload)
+
+    def _request_at(self, base_url: str, payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        if self.stream:
+            content, stats = stream_chat(self.transport, f"{base_url}/api/chat", payload, read_timeout=120)
+            return content, {**stats, "endpoint": base_url}
+
+        start = time.perf_counter()
+        response = self.transport.post(
+            f"{base_url}/api/chat",
+            json=payload,
+            read_timeout=120
+        )
+
+        if response.status_code == 200:
+            data = response.json()
+            return data["message"]["content"], {**server_timings(data, time.perf_counter() - start), "endpoint": base_url}
+        else:
+            raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
+
+
+class JsonGrader:
+    """
+    OpenAI 兼容 chat completions 评分器的公共部分：评分提示词、失败重试、
+    自适应并发、RPM/TPM 限速与回复 JSON 校验
+
+    子类实现 _complete (发送一次评分请求，返回回复文本与 API 报告的 token 用量)，
+    并设置评分器名称与 API 密钥/地址的环境变量。
+    """
+
+    # 评分提示词版本：修改下方提示词时请递增，使评分缓存失效
+    PROMPT_VERSION = "1"
+    # 输出中显示的名称，以及结果文件中记录的评分器
+    NAME = ""
+    FULL_NAME = ""
+    API_KEY_ENV = ""
+    BASE_URL_ENV = ""
+    DEFAULT_BASE_URL = ""
+    # 评分请求是否经过共享的 HttpTransport (是则连接池要为评分并发预留连接)
+    USES_TRANSPORT = True
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        retry: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+    ):
+        self.api_key = api_key or os.getenv(self.API_KEY_ENV)
+        if not self.api_key:
+            raise ValueError(f"{self.API_KEY_ENV} environment variable not set")
+        self.model = ""
+        # 自适应并发限制 (AIMD)：为 None 时不限制
+        self.limiter = limiter
+        # 失败重试 (指数退避 + 抖动) 与客户端 RPM/TPM 限速
+        self.retry = retry or RetryPolicy()
+        self.rate_limiter = rate_limiter
+        # 评分失败的诊断信息 (运行中由评估器转给 ExampleLog)
+        self.warn: Callable[[str], None] = lambda text: print(text, file=sys.stderr)
+
+    def _complete(self, messages: List[Dict[str, str]]) -> Tuple[str, Optional[int]]:
+        """发送一次评分请求，返回 (回复文本, total_tokens)；429、5xx 与超时抛出 OverloadError"""
+        raise NotImplementedError
+
+    def _attempt(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """一次评分尝试：限速 → 自适应并发 → 请求 → 解析 JSON (失败抛出 MalformedResponseError)"""
+        estimated = estimate_tokens(messages)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(estimated)
+        if self.limiter is not None:
+            result_text, total_tokens = self.limiter.call(lambda: self._complete(messages))
+        else:
+            result_text, total_tokens = self._complete(messages)
+        if self.rate_limiter is not None:
+            self.rate_limiter.record_usage(estimated, total_tokens)
+
+        with TRACER.span("grader.parse_json"):
+            return parse_grader_json(result_text)
+
+    def evaluate(self, response: str, rubric: List[Dict]) -> Dict[str, Any]:
+        """
+        使用评分 API 评估响应
+        
+        Args:
+            response: 模型生成的响应
+            rubric: 评分标准列表
+            
+        Returns:
+            包含评分的字典
+        """
+        # 构建评分提示
+        rubric_text = "\n".join([
+            f"- {item['criterion']} ({item['points']} 分)"
+            for item in rubric
+        ])
+        
+        prompt = f"""你是一个专业的医疗 AI 评分员。请根据以下标准评估模型响应。
+
+模型响应:
+\"\"\"
+{response}
+\"\"\"
+
+评分标准:
+{rubric_text}
+
+请按照以下格式返回 JSON:
+{{
+    "reasoning": "你的评分理由",
+    "scores": [0 或标准分，对应每个标准的得分],
+    "score": 总分,
+    "max_score": 总分制,
+    "percentage": 百分比 (0-100)
+}}
+
+评分原则:
+1. 仔细阅读模型响应
+2. 根据每个标准判断是否满足
+3. 给出详细的评分理由
+4. 必须返回有效的 JSON 格式"""
+
+        try:
+            messages = [
+                {
+                    "role": "system",
+                    "content": "你是一个专业的医疗 AI 评分员。请严格按照 JSON 格式返回评分结果。"
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+
+            with TRACER.span("grader.evaluate", grader=self.model):
+                result = self.retry.call(lambda: self._attempt(messages))
+            
+            # 补全字段 (缺少 score 的回复已在 parse_grader_json 中作为格式错误重新请求)
+            if "max_score" not in result:
+                result["max_score"] = sum(item["points"] for item in rubric)
+            if "percentage" not in result:
+                result["percentage"] = (result["score"] / result["max_score"] * 100) if result["max_score"] > 0 else 0
+            
+            return result
+            
+        except MalformedResponseError as e:
+            self.warn(f"⚠️  {self.NAME} 返回的 JSON 解析失败 (已重新请求 {self.retry.max_reasks} 次): {e}\n"
+                      f"原始响应: {e.raw}")
+            # 返回默认评分
+            return {
+                "score": 0,
+                "max_score": sum(item["points"] for item in rubric),
+                "percentage": 0,
+                "reasoning": "JSON 解析失败",
+                "scores": [],
+                "grading_failed": True,
+            }
+        except Exception as e:
+            self.warn(f"⚠️  {self.NAME} 评分失败: {e}")
+            return {
+                "score": 0,
+                "max_score": sum(item["points"] for item in rubric),
+                "percentage": 0,
+                "reasoning": str(e),
+                "scores": [],
+                "grading_failed": True,
+            }
+
+
+class HealthBenchRunner:
+    """
+    使用 JsonGrader 评分的 HealthBench 评估器：生成与评分流水线、断点续跑、
+    缓存、进度与指标
+
+    子类设置 grader_class 与 DEFAULT_OUTPUT；也可以直接传入 grader 实例。
+    """
+
+    grader_class: Type[JsonGrader] = JsonGrader
+    DEFAULT_OUTPUT = "healthbench_results.json"
+
+    # HealthBench 数据集 URL
+    HEALTHBENCH_URL = "https://openaipublic.blob.core.windows.net/simple-evals/healthbench/2025-05-07-06-14-12_oss_eval.jsonl"
+    HEALTHBENCH_HARD_URL = "https://openaipublic.blob.core.windows.net/simple-evals/healthbench/2025-05-07-06-14-18_oss_eval_hard.jsonl"
+    HEALTHBENCH_CONSENSUS_URL = "https://openaipublic.blob.core.windows.net/simple-evals/healthbench/2025-05-07-06-14-20_oss_eval_consensus.jsonl"
+
+    def __init__(
+        self,
+        model: str = "medical-assistant",
+        ollama_base_url: str = "http://localhost:11434",
+        offline: bool = False,
+        cache_dir: Optional[str] = None,
+        transport: Optional[HttpTransport] = None,
+        use_cache: bool = True,
+        refresh_cache: bool = False,
+        cache_max_entries: int = 100_000,
+        stream: bool = False,
+        keep_alive: KeepAlive = DEFAULT_KEEP_ALIVE,
+        num_ctx: Union[None, int, ContextBuckets] = None,
+        num_predict: Optional[int] = None,
+        grade_max_attempts: int = 5,
+        grade_rpm: Optional[float] = None,
+        grade_tpm: Optional[float] = None,
+        grader: Optional[JsonGrader] = None,
+    ):
+        self.model = model
+        self.transport = transport or HttpTransport()
+        self.client = OllamaClient(base_url=ollama_base_url, model=model, transport=self.transport,
+                                   stream=stream, keep_alive=keep_alive, num_ctx=num_ctx, num_predict=num_predict)
+        self.dataset_cache = DatasetCache(cache_dir=cache_dir, offline=offline, transport=self.transport)
+        self.response_cache = ResponseCache(
+            path=os.path.join(self.dataset_cache.cache_dir, "responses.sqlite"),
+            max_entries=cache_max_entries,
+            refresh=refresh_cache,
+        ) if use_cache else None
+        self.grade_cache = GradeCache(
+            path=os.path.join(self.dataset_cache.cache_dir, "grades.sqlite"),
+            max_entries=cache_max_entries,
+            refresh=refresh_cache,
+        ) if use_cache else None
+        self.grader = grader or self.grader_class(
+            transport=self.transport,
+            retry=RetryPolicy(max_attempts=grade_max_attempts),
+            rate_limiter=RateLimiter(grade_rpm, grade_tpm) if grade_rpm or grade_tpm else None,
+        )
+        self.log = ExampleLog()
+
+    def load_dataset(
+        self,
+        url: str,
+        num_examples: Optional[int] = None,
+        dataset_file: Optional[str] = None,
+        shard_index: int = 0,
+        num_shards: int = 1,
+    ) -> Tuple[Iterator[Dict], int]:
+        """
+        从本地文件或数据集缓存加载 HealthBench 数据集 (只保留分片 shard_index 的用例)
+
+        返回 (惰性迭代器, 用例数)：迭代器逐行解压并解析 JSONL，读满 num_examples 个用例后立即停止；
+        用例数事先统计，用于进度总数与预计剩余时间。
+        """
+        print(f"📥 加载数据集: {dataset_file or url}")
+        
+        try:
+            with TRACER.span("dataset.load"):
+                path = dataset_file or self.dataset_cache.fetch(url)
+            print(f"✅ 数据集就绪: {path}")
+        except Exception as e:
+            print(f"❌ 加载数据集失败: {e}")
+            return iter([]), 0
+
+        test_cases = iter_shard(iter_jsonl(path, limit=num_examples or None), shard_index, num_shards)
+        with TRACER.span("dataset.count"):
+            total = count_examples(path, num_examples or None, shard_index, num_shards)
+        return test_cases, total
+
+    def _dataset_url(self, dataset: str) -> str:
+        """选择数据集"""
+        if dataset == "standard":
+            return self.HEALTHBENCH_URL
+        elif dataset == "hard":
+            return self.HEALTHBENCH_HARD_URL
+        elif dataset == "consensus":
+            return self.HEALTHBENCH_CONSENSUS_URL
+        raise ValueError(f"Unknown dataset: {dataset}")
+
+    def _new_aggregator(self) -> ResultAggregator:
+        return ResultAggregator({
+            "total_time": None,
+            # 缓存命中的用例没有调用模型/评分器，不计入对应的平均时间
+            "model_time": "cached",
+            "grader_time": "grade_cached",
+            **{field: "cached" for field in SERVER_AVERAGE_FIELDS},
+        }, distribution_fields=STREAM_FIELDS)
+
+    def _generate(self, index: int, total: Optional[int], test_case: Dict,
+                  client: Optional[OllamaClient] = None) -> Optional[Dict[str, Any]]:
+        """生成阶段：获取模型响应，返回交给评分阶段的中间结果 (client 为对比评估中的某个模型)"""
+        label = f"测试用例 {index}/{total}" if total else f"测试用例 {index}"
+        if client is not None:
+            label = f"{label} [{client.model}]"
+        lines = [f"{'='*70}", label, f"{'='*70}"]
+
+        # 提取用户消息
+        prompt = test_case.get("prompt", [])
+        if not prompt:
+            lines.append("⚠️  没有找到 prompt，跳过")
+            self.log.example(label, lines)
+            return None
+
+        user_message = prompt[-1].get("content", "")
+
+        # 显示标签/主题
+        tags = test_case.get("example_tags", [])
+        if tags:
+            lines.append(f"\n🏷️  标签: {', '.join(tags)}")
+
+        lines.append(f"\n📝 问题: {user_message[:200]}{'...' if len(user_message) > 200 else ''}")
+
+        item = {
+            "test_case": test_case,
+            "user_message": user_message,
+            "tags": tags,
+            "label": label,
+            "lines": lines,
+        }
+        if client is not None:
+            item["model"] = client.model
+        else:
+            client = self.client
+
+        try:
+            # 获取模型响应 (命中缓存时不调用模型)
+            start_time = time.time()
+            if self.response_cache is not None:
+                response, cached, model_stats = self.response_cache.chat_with_stats(client, prompt)
+            else:
+                (response, model_stats), cached = client.chat_with_stats(prompt), False
+            model_time = time.time() - start_time
+
+            lines.append(f"\n🤖 模型响应 (前300字符): {response[:300]}{'...' if len(response) > 300 else ''}")
+            lines.append(f"⏱️  模型响应时间: {model_time:.2f}s{' (缓存)' if cached else ''}")
+            if model_stats.get("time_to_first_token") is not None:
+                lines.append(f"⚡ 首 token 延迟: {model_stats['time_to_first_token']:.2f}s, "
+                             f"解码速度: {model_stats['decode_tokens_per_sec'] or 0:.1f} tok/s "
+                             f"({model_stats['streamed_tokens']} tokens)")
+            if "total_duration" in model_stats:
+                lines.append(f"🖥️  服务端: 加载 {model_stats.get('load_duration', 0) / 1e9:.2f}s, "
+                             f"提示词 {model_stats.get('prompt_eval_count', 0)} tok / {model_stats.get('prompt_eval_duration', 0) / 1e9:.2f}s, "
+                             f"生成 {model_stats.get('eval_count', 0)} tok / {model_stats.get('eval_duration', 0) / 1e9:.2f}s, "
+                             f"客户端开销 {model_stats['client_overhead']:.2f}s")
+
+            item["response"] = response
+            item["model_stats"] = model_stats
+            item["model_time"] = model_time
+            item["cached"] = cached
+        except Exception as e:
+            item["error"] = str(e)
+
+        return item
+
+    def _grade_stage(self, index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        """流水线评分阶段：评分期间记录的 span 都带上该用例的 prompt_id (对比评估中还有模型名)"""
+        tags = {"model": item["model"]} if "model" in item else {}
+        with TRACER.tagged(prompt_id=item["test_case"].get("prompt_id"), **tags), METRICS.track("grading"):
+            return self._grade(item)
+
+    def _grade(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """评分阶段：使用评分器对生成结果评分，返回最终结果记录"""
+        test_case = item["test_case"]
+        lines = item["lines"]
+
+        try:
+            if "error" in item:
+                raise RuntimeError(item["error"])
+
+            response = item["response"]
+            model_time = item["model_time"]
+
+            lines.append(f"\n🎯 使用 {self.grader.NAME} 评分中...")
+            grader_start = time.time()
+            rubric = test_case.get("rubrics", [])
+            if self.grade_cache is not None:
+                evaluation, grade_cached = self.grade_cache.evaluate(self.grader, response, rubric)
+            else:
+                evaluation, grade_cached = self.grader.evaluate(response, rubric), False
+            grader_time = time.time() - grader_start
+            # 重试耗尽仍未评分成功时记为错误用例 (不计入平均分，--resume 时重新评估)，
+            # 这样结果中的 0 分总是表示"评分为 0"
+            if evaluation.get("grading_failed"):
+                raise RuntimeError(f"评分失败 (已重试): {evaluation.get('reasoning', '')}")
+
+            lines.append(f"\n📊 评分结果:")
+            lines.append(f"   得分: {evaluation['score']}/{evaluation['max_score']} ({evaluation['percentage']:.1f}%)")
+            lines.append(f"   评分时间: {grader_time:.2f}s{' (缓存)' if grade_cached else ''}")
+            if self.grader.limiter is not None:
+                limiter = self.grader.limiter
+                lines.append(f"   评分并发上限: {limiter.current_limit}/{limiter.max_limit}")
+            lines.append(f"   评分理由: {evaluation.get('reasoning', 'N/A')[:200]}{'...' if len(evaluation.get('reasoning', '')) > 200 else ''}")
+
+            result = {
+                "prompt_id": test_case.get("prompt_id"),
+                **({"model": item["model"]} if "model" in item else {}),
+                "question": item["user_message"],
+                "response": response,
+                "rubric_score": evaluation["score"],
+                "rubric_max": evaluation["max_score"],
+                "percentage": evaluation["percentage"],
+                "model_time": model_time,
+                "grader_time": grader_time,
+                "total_time": model_time + grader_time,
+                "cached": item["cached"],
+                "grade_cached": grade_cached,
+                "reasoning": evaluation.get("reasoning", ""),
+                "scores": evaluation.get("scores", []),
+                "tags": item["tags"],
+                **item["model_stats"],
+            }
+
+        except Exception as e:
+            lines.append(f"\n❌ 错误: {e}")
+            result = {
+                "prompt_id": test_case.get("prompt_id"),
+                **({"model": item["model"]} if "model" in item else {}),
+                "question": item["user_message"],
+                "response": "",
+                "error": str(e),
+                "rubric_score": 0,
+                "rubric_max": 0,
+                "percentage": 0,
+            }
+
+        # 整块输出，避免并发线程的输出交错
+        self.log.example(item["label"], lines, result)
+        return result
+
+    def run_evaluation(
+        self,
+        dataset: str = "standard",
+        num_examples: Optional[int] = None,
+        output_file: Optional[str] = None,
+        generation_concurrency: int = 1,
+        grading_concurrency: int = 1,
+        queue_size: Optional[int] = None,
+        dataset_file: Optional[str] = None,
+        resume: bool = False,
+        checkpoint_file: Optional[str] = None,
+        warmup: bool = True,
+        adaptive_grading: bool = True,
+        shard_index: int = 0,
+        num_shards: int = 1,
+        schedule: str = "file",
+        quiet: bool = False,
+        log_file: Optional[str] = None,
+        log_verbosity: str = "full",
+    ) -> Optional[Dict[str, Any]]:
+        """
+        运行评估，返回结果汇总 (逐条结果只写入 output_file，不保留在内存中)
+
+        生成与评分分两个阶段并发执行，各自受 generation_concurrency /
+        grading_concurrency 限制；queue_size 为两阶段之间队列的容量
+        (默认为评分并发数的两倍)。dataset_file 指定本地 JSONL 文件时不再下载数据集。
+
+        每个完成的用例都会立即追加到 checkpoint_file
+        (默认 <output_file>.checkpoint.jsonl)；resume 时跳过其中已完成的用例。
+        按 Ctrl-C 后不再启动新用例，等待进行中的用例完成并写出部分结果汇总。
+
+        warmup 时在计时开始前预加载模型，加载时间单独报告，不计入首个用例的响应时间。
+
+        adaptive_grading 时评分请求的并发数由 AIMD 限流器自适应调整：
+        grading_concurrency 为上限，遇到 429/5xx/超时按比例下调并遵守 Retry-After。
+
+        num_shards > 1 时只评估 prompt_id 哈希落在 shard_index 分片的用例
+        (在 num_examples 截断之后划分)，多台机器可分担同一次评估，
+        结果用 healthbench_merge.py 合并。
+
+        schedule="prefix" 时按共享的对话前缀与长度分组重排用例的发送顺序，
+        让 Ollama 复用上一个请求的提示词缓存；结果仍按数据集顺序写出，
+        汇总中给出相对文件顺序估算节省的提示词 token 数。
+
+        quiet 时不再逐个用例输出，控制台只显示一行限速刷新的进度
+        (吞吐、预计剩余时间、平均分、错误数)。log_file 接收逐个用例的输出，
+        log_verbosity 为 "full" 时写完整内容，"summary" 时每个用例一行。
+        """
+        url = self._dataset_url(dataset)
+        output_file = output_file or self.DEFAULT_OUTPUT
+
+        # 加载测试用例 (惰性迭代器，由流水线按需读取)；用例总数用于进度与预计剩余时间
+        test_cases, progress_total = self.load_dataset(url, num_examples, dataset_file=dataset_file,
+                                                       shard_index=shard_index, num_shards=num_shards)
+
+        # 结果边完成边写入 output_file，汇总统计由聚合器累计，不在内存中保留结果列表
+        writer = StreamingResultsWriter(output_file, {
+            "model": self.model,
+            "dataset": dataset,
+            "num_examples": num_examples,
+            "shard": {"index": shard_index, "count": num_shards},
+            "grader": self.grader.FULL_NAME,
+            "timestamp": datetime.now().isoformat(),
+        })
+        aggregator = self._new_aggregator()
+
+        checkpoint_path = checkpoint_path_for(output_file, checkpoint_file)
+        checkpoint = CheckpointWriter(checkpoint_path, append=resume)
+        if checkpoint.backup_path:
+            print(f"📦 已有的 checkpoint 已移至 {checkpoint.backup_path} (继续上次的运行请使用 --resume)")
+
+        # 等待按数据集顺序写出的结果只保留 checkpoint 中的偏移量，写出时再从 checkpoint 读回
+        offsets: Dict[int, int] = {}
+        positions: Dict[int, int] = {}
+
+        def complete(index: int, result: Dict[str, Any]):
+            # 按完成顺序写入 checkpoint (连同数据集中的序号)，并更新实时指标
+            offsets[index] = checkpoint.append(result, positions[index])
+            METRICS.record(result)
+            if progress is not None:
+                progress.update(result)
+
+        def record_result(position: int, offset: int):
+            result = checkpoint.read(offset)
+            aggregator.add(result)
+            if "error" not in result:
+                writer.write(result)
+
+        # 结果按数据集顺序交给 record_result，先完成的结果在缓冲区中等待
+        reorder = ReorderBuffer(record_result)
+
+        # 断点续跑：已完成的结果按原序号放回缓冲区，与新结果一起按数据集顺序写出；失败的用例重新评估
+        completed_ids = replay_checkpoint(checkpoint_path, reorder) if resume else set()
+        resumed = len(completed_ids)
+        # position 为用例在数据集中的序号 (跳过已完成的用例之前编号)
+        numbered = enumerate(test_cases, 1)
+        if completed_ids:
+            print(f"♻️  断点续跑: {checkpoint_path} 中已有 {resumed} 个完成的用例")
+            numbered = ((position, tc) for position, tc in numbered if tc.get("prompt_id") not in completed_ids)
+
+        print(f"\n🧪 开始 {self.grader.NAME} 评分评估")
+        print(f"📋 模型: {self.model}")
+        if len(self.client.endpoints) > 1:
+            print(f"🖧 Ollama 端点: {', '.join(self.client.endpoints.urls)}")
+        print(f"📊 数据集: {dataset}")
+        if num_shards > 1:
+            print(f"🧩 分片: {shard_index + 1}/{num_shards}")
+        print(f"📝 测试用例数: {num_examples or '全部'}")
+        print(f"🔀 并发: 生成 {generation_concurrency} / 评分 {grading_concurrency}\n")
+
+        # 发送顺序：文件顺序，或按共享前缀重排
+        # --num-ctx auto 时按 num_ctx 分桶排序，每个分桶只触发一次模型重新加载
+        scheduler = make_scheduler(schedule, self.client.num_ctx)
+        items = scheduler.schedule(numbered) if scheduler is not None else numbered
+        first, items = peek(items)
+
+        # 预热：提前加载模型 (num_ctx 与第一个用例相同)，避免加载时间混入任何计时的请求
+        warmup_stats = None
+        if warmup:
+            warmup_stats = self.client.warm_up(first[1].get("prompt") if first else None)
+            if warmup_stats["ok"]:
+                print(f"🔥 模型预热: 加载耗时 {warmup_stats['load_time']:.2f}s "
+                      f"(keep_alive {warmup_stats['keep_alive']})\n")
+
+        # 评分并发由 AIMD 限流器控制，评分线程数为其上限
+        self.grader.limiter = AdaptiveLimiter(max_limit=grading_concurrency) if adaptive_grading else None
+        METRICS.start_run(self.model, dataset, self.grader.FULL_NAME, planned=progress_total, resumed=resumed,
+                          response_cache=self.response_cache, grade_cache=self.grade_cache, grader=self.grader)
+        # --quiet: 控制台只显示一行进度，逐个用例的输出只写入日志文件
+        self.log = ExampleLog(console=not quiet, path=log_file, verbosity=log_verbosity)
+        # 运行中的评分失败与端点摘除也写入日志，不打断进度行
+        self.grader.warn = self.client.endpoints.warn = self.log.warning
+        progress = ProgressLine(progress_total, resumed=resumed) if quiet else None
+
+        def generate(index: int, entry) -> Optional[Dict[str, Any]]:
+            position, test_case = entry
+            positions[index] = position
+            with TRACER.tagged(prompt_id=test_case.get("prompt_id")), METRICS.track("generation"):
+                item = self._generate(position, progress_total, test_case)
+            if item is None:
+                reorder.push(positions.pop(index), None)
+            return item
+
+        # --num-ctx auto: 换到下一个分桶前等待上一个分桶的生成请求完成，避免模型在两种 num_ctx 间反复加载
+        context = self.client.num_ctx if isinstance(self.client.num_ctx, ContextBuckets) else None
+        bucket_of = (lambda entry: context.bucket(entry[1].get("prompt", []))) if context is not None else None
+
+        # 生成与评分流水线：生成线程把结果放入有界队列，评分线程并发消费
+        interrupt = GracefulInterrupt()
+        pipeline = Pipeline(
+            generate=generate,
+            grade=self._grade_stage,
+            generation_workers=generation_concurrency,
+            grading_workers=grading_concurrency,
+            queue_size=queue_size,
+            on_complete=complete,
+            on_result=lambda i, result: reorder.push(positions.pop(i), offsets.pop(i)),
+            stop_event=interrupt.stop_event,
+            group_key=bucket_of,
+        )
+        try:
+            with interrupt:
+                pipeline.run(items)
+            reorder.flush()
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            checkpoint.close()
+            self.log.close()
+            if progress is not None:
+                progress.close()
+        pipeline_stats = pipeline.summary()
+        total_cases = pipeline.generation.items + resumed
+
+        if not total_cases:
+            writer.abort()
+            print("❌ 没有找到测试用例!")
+            return None
+
+        # 计算最终统计
+        if aggregator.evaluated:
+            avg_time = aggregator.average("total_time")
+            avg_percentage = aggregator.average_percentage
+            avg_model_time = aggregator.average("model_time")
+            avg_grader_time = aggregator.average("grader_time")
+            wall_time = pipeline_stats["wall_time"]
+            new_results = aggregator.evaluated - resumed
+            throughput = new_results / wall_time if wall_time > 0 else 0
+
+            print(f"\n{'='*70}")
+            print("📊 最终结果")
+            print(f"{'='*70}")
+            print(f"总分: {aggregator.total_score}/{aggregator.total_max}")
+            print(f"平均分: {avg_percentage:.1f}%")
+            print(f"平均总时间: {avg_time:.2f}s")
+            print(f"  - 模型响应: {avg_model_time:.2f}s")
+            print(f"  - {self.grader.NAME} 评分: {avg_grader_time:.2f}s")
+            if self.response_cache is not None:
+                cache_stats = self.response_cache.summary()
+                print(f"响应缓存: 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']} "
+                      f"(命中率 {cache_stats['hit_rate'] * 100:.1f}%)")
+                grade_stats = self.grade_cache.summary()
+                print(f"评分缓存: 命中 {grade_stats['hits']} / 共享 {grade_stats['shared_in_flight']} / "
+                      f"未命中 {grade_stats['misses']} (命中率 {grade_stats['hit_rate'] * 100:.1f}%)")
+            streaming = {field: aggregator.distribution(field) for field in STREAM_FIELDS} if self.client.stream else None
+            if streaming and streaming["time_to_first_token"]["count"]:
+                ttft, itl, tps = (streaming[field] for field in STREAM_FIELDS)
+                print(f"首 token 延迟: p50 {ttft['p50']:.2f}s / p95 {ttft['p95']:.2f}s")
+                if itl["count"]:
+                    print(f"token 间延迟: p50 {itl['p50'] * 1000:.1f}ms / p95 {itl['p95'] * 1000:.1f}ms")
+                    print(f"解码速度: p50 {tps['p50']:.1f} / p95 {tps['p95']:.1f} tok/s")
+            server_timing = summarize_server_timings(aggregator)
+            if server_timing:
+                print(f"Ollama 服务端耗时: 加载 {server_timing['average_load_duration']:.2f}s, "
+                      f"提示词处理 {server_timing['average_prompt_eval_duration']:.2f}s, "
+                      f"生成 {server_timing['average_eval_duration']:.2f}s, "
+                      f"客户端开销 {server_timing['average_client_overhead']:.2f}s")
+            schedule_stats = scheduler.summary() if scheduler is not None else None
+            if schedule_stats and schedule_stats["num_ctx_buckets"]:
+                print("num_ctx 分桶: " + ", ".join(
+                    f"{size} × {count}" for size, count in schedule_stats["num_ctx_buckets"].items()))
+            if schedule_stats and schedule_stats["group_prefixes"]:
+                print(f"前缀调度: {schedule_stats['prefix_groups']} 组, 估计可复用提示词 "
+                      f"{schedule_stats['estimated_reused_tokens']} tok (文件顺序 "
+                      f"{schedule_stats['estimated_reused_tokens_file_order']} tok, 节省 "
+                      f"{schedule_stats['estimated_saved_fraction'] * 100:.1f}%)")
+            grade_limiter = self.grader.limiter.summary() if self.grader.limiter is not None else None
+            if grade_limiter:
+                print(f"评分并发: 当前上限 {grade_limiter['limit']} (峰值 {grade_limiter['peak_limit']}, "
+                      f"最大 {grade_limiter['max_limit']}; 过载 {grade_limiter['overloads']} 次, "
+                      f"下调 {grade_limiter['decreases']} 次, Retry-After 等待 {grade_limiter['retry_after_waits']} 次)")
+            grade_retries = self.grader.retry.summary()
+            if grade_retries["retries"] or grade_retries["exhausted"] or grade_retries["non_retryable"]:
+                reasons = ", ".join(f"{reason} {count}" for reason, count in grade_retries["retries_by_reason"].items())
+                print(f"评分重试: {grade_retries['retries']} 次 ({reasons or '无'}); "
+                      f"重试耗尽 {grade_retries['exhausted']} / 不可重试 {grade_retries['non_retryable']}")
+            grade_rate_limit = self.grader.rate_limiter.summary() if self.grader.rate_limiter is not None else None
+            if grade_rate_limit:
+                print(f"评分限速: 等待 {grade_rate_limit['waits']} 次, 共 {grade_rate_limit['wait_time']:.1f}s")
+            endpoints = self.client.endpoints.summary()
+            if len(endpoints) > 1:
+                print("Ollama 端点:")
+                for endpoint in endpoints:
+                    print(f"  - {endpoint['url']}: {endpoint['completed']} 次 ({endpoint['share'] * 100:.0f}%), "
+                          f"平均 {endpoint['average_latency'] or 0:.2f}s, {endpoint['throughput'] or 0:.2f} 次/秒, "
+                          f"失败 {endpoint['failures']} / 剔除 {endpoint['ejections']}")
+            print(f"总耗时: {wall_time:.1f}s (吞吐量 {throughput:.2f} 例/秒)")
+            for stage, label in (("generation", "生成"), ("grading", "评分")):
+                stats = pipeline_stats[stage]
+                print(f"  - {label}阶段利用率: {stats['utilization'] * 100:.1f}% "
+                      f"({stats['workers']} 线程, 等待 {stats['wait_time']:.1f}s)")
+            print(f"评估用例数: {aggregator.evaluated}/{total_cases}")
+            if interrupt.interrupted:
+                print("⚠️  部分结果：评估被中断 (使用 --resume 继续)")
+
+            # 保存结果：结果列表已流式写入，这里只追加汇总字段
+            summary = {
+                "total_examples": total_cases,
+                "evaluated_examples": aggregator.evaluated,
+                "failed_examples": aggregator.failed,
+                "partial": interrupt.interrupted,
+                "resumed_examples": resumed,
+                "total_score": aggregator.total_score,
+                "total_max": aggregator.total_max,
+                "average_percentage": avg_percentage,
+                "tags": aggregator.tag_breakdown(),
+                "average_total_time": avg_time,
+                "average_model_time": avg_model_time,
+                "average_grader_time": avg_grader_time,
+                "streaming": streaming,
+                "server_timing": server_timing,
+                "schedule": schedule_stats,
+                "num_ctx": "auto" if isinstance(self.client.num_ctx, ContextBuckets) else self.client.num_ctx,
+                "num_predict": self.client.num_predict,
+                "warmup": warmup_stats,
+                "endpoints": endpoints,
+                "throughput": throughput,
+                "pipeline": pipeline_stats,
+                "grade_limiter": grade_limiter,
+                "grade_retries": grade_retries,
+                "grade_rate_limit": grade_rate_limit,
+                "response_cache": self.response_cache.summary() if self.response_cache is not None else None,
+                "grade_cache": self.grade_cache.summary() if self.grade_cache is not None else None,
+            }
+            writer.close(summary)
+
+            print(f"\n💾 结果已保存到: {output_file}")
+
+            return summary
+        else:
+            writer.abort()
+            print("\n❌ 没有有效结果!")
+            return None
+
+    def run_comparison(
+        self,
+        models: List[str],
+        dataset: str = "standard",
+        num_examples: Optional[int] = None,
+        output_file: Optional[str] = None,
+        generation_concurrency: int = 1,
+        grading_concurrency: int = 1,
+        queue_size: Optional[int] = None,
+        dataset_file: Optional[str] = None,
+        resume: bool = False,
+        checkpoint_file: Optional[str] = None,
+        warmup: bool = True,
+        adaptive_grading: bool = True,
+        shard_index: int = 0,
+        num_shards: int = 1,
+        quiet: bool = False,
+        log_file: Optional[str] = None,
+        log_verbosity: str = "full",
+    ) -> Optional[Dict[str, Any]]:
+        """
+        在同一批用例上对比多个模型，返回对比汇总
+
+        数据集只加载一次；每个用例依次交给各个模型生成，每个模型最多
+        generation_concurrency 个并发请求，所有模型的生成结果进入同一个评分队列，
+        共用一个评分器 (及其限流器)。models[0] 为基线，汇总中给出每个模型
+        相对基线的逐例成对差值、平均差值及其 95% 置信区间。
+        其余参数与 run_evaluation 相同；checkpoint 按 (模型, prompt_id) 记录完成情况。
+        """
+        url = self._dataset_url(dataset)
+        output_file = output_file or self.DEFAULT_OUTPUT
+        clients = [
+            OllamaClient(base_url=self.client.endpoints.urls, model=model, transport=self.transport,
+                         stream=self.client.stream, keep_alive=self.client.keep_alive,
+                         endpoints=self.client.endpoints, num_ctx=self.client.num_ctx,
+                         num_predict=self.client.num_predict)
+            for model in models
+        ]
+
+        test_cases, progress_total = self.load_dataset(url, num_examples, dataset_file=dataset_file,
+                                                       shard_index=shard_index, num_shards=num_shards)
+
+        writer = StreamingResultsWriter(output_file, {
+            "models": models,
+            "dataset": dataset,
+            "num_examples": num_examples,
+            "shard": {"index": shard_index, "count": num_shards},
+            "grader": self.grader.FULL_NAME,
+            "timestamp": datetime.now().isoformat(),
+        })
+        aggregators = {model: self._new_aggregator() for model in models}
+        comparison = PairedComparison(models)
+
+        def add_result(result: Dict[str, Any]):
+            aggregators[result["model"]].add(result)
+            comparison.add(result["model"], result)
+
+        # 断点续跑：按 (模型, prompt_id) 跳过已完成的生成
+        checkpoint_path = checkpoint_path_for(output_file, checkpoint_file)
+        checkpoint = CheckpointWriter(checkpoint_path, append=resume)
+        if checkpoint.backup_path:
+            print(f"📦 已有的 checkpoint 已移至 {checkpoint.backup_path} (继续上次的运行请使用 --resume)")
+
+        # 结果按 (用例, 模型) 顺序写出；等待中的结果只保留 checkpoint 偏移量
+        offsets: Dict[int, int] = {}
+        positions: Dict[int, int] = {}
+
+        def position_of(number: int, client: "OllamaClient") -> int:
+            return (number - 1) * len(clients) + clients.index(client) + 1
+
+        def complete(index: int, result: Dict[str, Any]):
+            # 按完成顺序写入 checkpoint (连同输出中的序号)，并更新实时指标
+            offsets[index] = checkpoint.append(result, positions[index])
+            METRICS.record(result)
+            if progress is not None:
+                progress.update(result)
+
+        def record_result(position: int, offset: int):
+            result = checkpoint.read(offset)
+            add_result(result)
+            if "error" not in result:
+                writer.write(result)
+
+        reorder = ReorderBuffer(record_result)
+        completed = set()
+        if resume:
+            completed = replay_checkpoint(
+                checkpoint_path, reorder,
+                key=lambda record: ((record.get("model"), record.get("prompt_id"))
+                                    if record.get("model") in aggregators else None),
+            )
+            if completed:
+                print(f"♻️  断点续跑: {checkpoint_path} 中已有 {len(completed)} 个完成的 (模型, 用例)")
+
+        first, test_cases = peek(test_cases)
+        # 每个用例展开为 (序号, 用例, 模型客户端)，各模型交替出现，所有模型同时推进
+        items = (
+            (number, test_case, client)
+            for number, test_case in enumerate(test_cases, 1)
+            for client in clients
+            if (client.model, test_case.get("prompt_id")) not in completed
+        )
+        # 每个模型的生成并发上限
+        model_limits = {client.model: threading.BoundedSemaphore(generation_concurrency) for client in clients}
+
+        def generate(index: int, item) -> Optional[Dict[str, Any]]:
+            number, test_case, client = item
+            positions[index] = position_of(number, client)
+            with model_limits[client.model], TRACER.tagged(prompt_id=test_case.get("prompt_id"), model=client.model), \
+                    METRICS.track("generation"):
+                generated = self._generate(number, progress_total, test_case, client)
+            if generated is None:
+                reorder.push(positions.pop(index), None)
+            return generated
+
+        print(f"\n🧪 开始 {self.grader.NAME} 评分多模型对比评估")
+        print(f"📋 模型: {', '.join(models)} (基线: {models[0]})")
+        if len(self.client.endpoints) > 1:
+            print(f"🖧 Ollama 端点: {', '.join(self.client.endpoints.urls)}")
+        print(f"📊 数据集: {dataset}")
+        if num_shards > 1:
+            print(f"🧩 分片: {shard_index + 1}/{num_shards}")
+        print(f"📝 测试用例数: {num_examples or '全部'}")
+        print(f"🔀 并发: 每个模型生成 {generation_concurrency} / 评分 {grading_concurrency} (共享)\n")
+
+        warmup_stats = None
+        if warmup:
+            warmup_stats = {}
+            for client in clients:
+                warmup_stats[client.model] = client.warm_up(first.get("prompt") if first else None)
+                if warmup_stats[client.model]["ok"]:
+                    print(f"🔥 模型预热 {client.model}: 加载耗时 {warmup_stats[client.model]['load_time']:.2f}s "
+                          f"(keep_alive {warmup_stats[client.model]['keep_alive']})")
+            print()
+
+        self.grader.limiter = AdaptiveLimiter(max_limit=grading_concurrency) if adaptive_grading else None
+        METRICS.start_run(",".join(models), dataset, self.grader.FULL_NAME,
+                          planned=progress_total * len(models) if progress_total else None, resumed=len(completed),
+                          response_cache=self.response_cache, grade_cache=self.grade_cache, grader=self.grader)
+        self.log = ExampleLog(console=not quiet, path=log_file, verbosity=log_verbosity)
+        # 运行中的评分失败与端点摘除也写入日志，不打断进度行
+        self.grader.warn = self.client.endpoints.warn = self.log.warning
+        progress = ProgressLine(progress_total * len(models) if progress_total else None,
+                                resumed=len(completed)) if quiet else None
+
+        interrupt = GracefulInterrupt()
+        pipeline = Pipeline(
+            generate=generate,
+            grade=self._grade_stage,
+            generation_workers=generation_concurrency * len(clients),
+            grading_workers=grading_concurrency,
+            queue_size=queue_size,
+            on_complete=complete,
+            on_result=lambda i, result: reorder.push(positions.pop(i), offsets.pop(i)),
+            stop_event=interrupt.stop_event,
+        )
+        try:
+            with interrupt:
+                pipeline.run(items)
+            reorder.flush()
+        except BaseException:
+            writer.abort()
+            raise
+        finally:
+            checkpoint.close()
+            self.log.close()
+            if progress is not None:
+                progress.close()
+        pipeline_stats = pipeline.summary()
+
+        if not any(aggregator.evaluated for aggregator in aggregators.values()):
+            writer.abort()
+            print("\n❌ 没有有效结果!")
+            return None
+
+        wall_time = pipeline_stats["wall_time"]
+        new_results = sum(aggregator.evaluated for aggregator in aggregators.values()) - len(completed)
+        throughput = new_results / wall_time if wall_time > 0 else 0
+        paired = comparison.summary()
+
+        print(f"\n{'='*70}")
+        print(f"📊 模型对比 (基线: {models[0]}, 成对用例 {paired['paired_examples']})")
+        print(f"{'='*70}")
+        width = max(len(model) for model in models)
+        for model in models:
+            aggregator = aggregators[model]
+            line = (f"{model:<{width}}  平均分 {aggregator.average_percentage:5.1f}%  "
+                    f"评估 {aggregator.evaluated} / 失败 {aggregator.failed}  "
+                    f"模型响应 {aggregator.average('model_time'):.2f}s")
+            versus = paired["versus_baseline"].get(model)
+            if versus and versus["paired_examples"]:
+                line += f"  差值 {versus['mean_delta']:+.1f}"
+                if versus["ci95"]:
+                    line += f" [{versus['ci95'][0]:+.1f}, {versus['ci95'][1]:+.1f}]"
+                line += f"  胜/负/平 {versus['wins']}/{versus['losses']}/{versus['ties']}"
+            print(line)
+        print(f"总耗时: {wall_time:.1f}s (吞吐量 {throughput:.2f} 次生成/秒)")
+        if interrupt.interrupted:
+            print("⚠️  部分结果：评估被中断 (使用 --resume 继续)")
+
+        summary = {
+            "partial": interrupt.interrupted,
+            "resumed_examples": len(completed),
+            "per_model": {
+                model: {
+                    "evaluated_examples": aggregator.evaluated,
+                    "failed_examples": aggregator.failed,
+                    "total_score": aggregator.total_score,
+                    "total_max": aggregator.total_max,
+                    "average_percentage": aggregator.average_percentage,
+                    "average_model_time": aggregator.average("model_time"),
+                    "average_grader_time": aggregator.average("grader_time"),
+                    "tags": aggregator.tag_breakdown(),
+                    "server_timing": summarize_server_timings(aggregator),
+                }
+                for model, aggregator in aggregators.items()
+            },
+            "comparison": paired,
+            "paired_deltas": comparison.per_example(),
+            "warmup": warmup_stats,
+            "throughput": throughput,
+            "pipeline": pipeline_stats,
+            "grade_limiter": self.grader.limiter.summary() if self.grader.limiter is not None else None,
+            "grade_retries": self.grader.retry.summary(),
+            "grade_rate_limit": self.grader.rate_limiter.summary() if self.grader.rate_limiter is not None else None,
+            "response_cache": self.response_cache.summary() if self.response_cache is not None else None,
+            "grade_cache": self.grade_cache.summary() if self.grade_cache is not None else None,
+            "endpoints": self.client.endpoints.summary(),
+        }
+        writer.close(summary)
+
+        print(f"\n💾 结果已保存到: {output_file}")
+
+        return summary
+
+
+def run_main(evaluator_class: Type[HealthBenchRunner], description: str):
+    """评估脚本的命令行入口 (各评分器脚本共用)"""
+    grader_class = evaluator_class.grader_class
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--model", type=str, default="medical-assistant",
+                       help="Ollama 模型名称；多个模型用逗号分隔时在同一批用例上对比，"
+                            "第一个为基线 (default: medical-assistant)")
+    parser.add_argument("--ollama-url", type=str, default="http://localhost:11434",
+                       help="Ollama 地址，多个端点用逗号分隔，按最少在途请求分配 (默认: http://localhost:11434)")
+    parser.add_argument("--dataset", type=str, default="standard",
+                       choices=["standard", "hard", "consensus"],
+                       help="HealthBench 数据集变体 (default: standard)")
+    parser.add_argument("--examples", type=int, default=None,
+                       help="测试用例数量 (default: all)")
+    parser.add_argument("--output", type=str, default=evaluator_class.DEFAULT_OUTPUT,
+                       help=f"输出 JSON 文件 (default: {evaluator_class.DEFAULT_OUTPUT})")
+    parser.add_argument("--api-key", type=str, default=None,
+                       help=f"{grader_class.NAME} API 密钥 (或设置 {grader_class.API_KEY_ENV} 环境变量)")
+    parser.add_argument("--base-url", type=str, default=None,
+                       help=f"OpenAI 兼容的评分 API 基础 URL (或设置 {grader_class.BASE_URL_ENV} 环境变量, "
+                            f"默认: {grader_class.DEFAULT_BASE_URL})")
+    parser.add_argument("--gen-concurrency", type=int, default=1,
+                       help="并发生成请求数，多模型对比时为每个模型的并发数 (default: 1)")
+    parser.add_argument("--grade-concurrency", type=int, default=1,
+                       help="并发评分请求数上限 (default: 1)")
+    parser.add_argument("--grade-max-attempts", type=int, default=5,
+                       help="每次评分请求的最大尝试次数 (429/5xx/超时/连接错误时指数退避重试, default: 5)")
+    parser.add_argument("--grade-rpm", type=float, default=None,
+                       help="评分 API 每分钟请求数上限 (客户端令牌桶, default: 不限)")
+    parser.add_argument("--grade-tpm", type=float, default=None,
+                       help="评分 API 每分钟 token 数上限 (客户端令牌桶, default: 不限)")
+    parser.add_argument("--no-adaptive-grading", action="store_true",
+                       help="关闭 AIMD 自适应评分并发，始终使用 --grade-concurrency 个并发请求")
+    parser.add_argument("--queue-size", type=int, default=None,
+                       help="生成与评分之间的队列容量 (default: 评分并发数 x 2)")
+    parser.add_argument("--dataset-file", type=str, default=None,
+                       help="使用本地 JSONL (或 .jsonl.gz) 文件代替下载")
+    parser.add_argument("--offline", action="store_true",
+                       help="离线模式：不访问网络，只使用本地数据集缓存")
+    parser.add_argument("--cache-dir", type=str, default=None,
+                       help="数据集缓存目录 (default: ~/.cache/healthbench)")
+    parser.add_argument("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT,
+                       help=f"HTTP 连接超时秒数 (default: {DEFAULT_CONNECT_TIMEOUT:g})")
+    parser.add_argument("--read-timeout", type=float, default=None,
+                       help="HTTP 读取超时秒数 (default: Ollama 120 / 评分器 60)")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="禁用模型响应缓存与评分缓存")
+    parser.add_argument("--refresh", action="store_true",
+                       help="忽略已缓存的响应与评分并重新生成 (新结果会写回缓存)")
+    parser.add_argument("--cache-max-entries", type=int, default=100_000,
+                       help="每个缓存的最大条目数，超出后按 LRU 淘汰 (default: 100000)")
+    parser.add_argument("--stream", action="store_true",
+                       help="流式获取模型响应，记录首 token 延迟与解码速度")
+    parser.add_argument("--keep-alive", type=parse_keep_alive, default=DEFAULT_KEEP_ALIVE,
+                       help=f"Ollama 在请求之间保持模型加载的时长，如 30m，-1 表示永久 (default: {DEFAULT_KEEP_ALIVE})")
+    parser.add_argument("--no-warmup", action="store_true",
+                       help="跳过计时前的模型预热")
+    parser.add_argument("--shard-index", type=int, default=0,
+                       help="只评估数据集的第几个分片 (从 0 开始, default: 0)")
+    parser.add_argument("--num-shards", type=int, default=1,
+                       help="按 prompt_id 哈希把数据集分成几个分片 (default: 1)")
+    parser.add_argument("--num-ctx", type=str, default=None,
+                       help="Ollama 上下文长度: auto 按提示词长度分桶 (2048-32768，按分桶顺序运行，"
+                            "每个分桶只重新加载一次模型)，或固定数值 (default: 模型默认值)")
+    parser.add_argument("--num-predict", type=int, default=None,
+                       help="每个回答最多生成的 token 数，限制长尾延迟 (default: 不限制)")
+    parser.add_argument("--schedule", choices=["file", "prefix"], default="file",
+                       help="发送顺序: file 按数据集顺序; prefix 按共享对话前缀分组，"
+                            "复用 Ollama 提示词缓存，结果仍按数据集顺序写出 (default: file)")
+    parser.add_argument("--resume", action="store_true",
+                       help="跳过 checkpoint 文件中已完成的用例，继续上次的评估 (不加此参数时已有的 checkpoint 移至 .bak)")
+    parser.add_argument("--checkpoint", type=str, default=None,
+                       help="checkpoint JSONL 路径 (default: <output>.checkpoint.jsonl)")
+    parser.add_argument("--trace", type=str, default=None,
+                       help="记录各阶段 span (数据集解析、Ollama 请求、评分、结果写入) 并导出为 Chrome trace JSON，"
+                            "可在 https://ui.perfetto.dev 打开")
+    parser.add_argument("--profile", type=str, default=None,
+                       help="在 cProfile (覆盖所有工作线程) 下运行，把按耗时排序的热点报告写入该文件")
+    parser.add_argument("--quiet", "--progress", dest="quiet", action="store_true",
+                       help="不逐个输出用例详情，只显示一行限速刷新的进度 (吞吐、预计剩余时间、平均分、错误数)")
+    parser.add_argument("--log-file", type=str, default=None,
+                       help="把逐个用例的输出追加写入该文件 (与 --quiet 搭配使用)")
+    parser.add_argument("--log-verbosity", choices=LOG_VERBOSITIES, default="full",
+                       help="--log-file 的详细程度: full 写完整的用例输出，summary 每个用例一行 (default: full)")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                       help="在该端口的 /metrics 上以 Prometheus 文本格式实时导出运行指标 "
+                            "(完成/失败用例数、进行中的生成与评分、各阶段延迟直方图、缓存命中率、评分重试次数)")
+    parser.add_argument("--metrics-file", type=str, default=None,
+                       help="定期把 Prometheus 指标原子地写入该文件 (供 node_exporter textfile collector 采集，"
+                            "文件名需以 .prom 结尾)")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                       help="--metrics-file 的写入间隔秒数 (default: 15)")
+
+    args = parser.parse_args()
+
+    # 设置 API key 和 base url
+    if args.api_key:
+        os.environ[grader_class.API_KEY_ENV] = args.api_key
+    if args.base_url:
+        os.environ[grader_class.BASE_URL_ENV] = args.base_url
+
+    # 运行评估
+    try:
+        models = parse_models(args.model)
+        num_ctx = parse_num_ctx(args.num_ctx, args.num_predict)
+        # 对比评估中每个模型各有 gen_concurrency 个生成请求；评分 API 若走共享连接池，也可能与 Ollama 同主机
+        generation_connections = args.gen_concurrency * len(models)
+        evaluator = evaluator_class(
+            model=models[0],
+            ollama_base_url=args.ollama_url,
+            offline=args.offline,
+            cache_dir=args.cache_dir,
+            transport=HttpTransport(
+                pool_size=pool_size_for(generation_connections,
+                                        args.grade_concurrency if grader_class.USES_TRANSPORT else 0),
+                connect_timeout=args.connect_timeout,
+                read_timeout=args.read_timeout,
+            ),
+            use_cache=not args.no_cache,
+            refresh_cache=args.refresh,
+            cache_max_entries=args.cache_max_entries,
+            stream=args.stream,
+            keep_alive=args.keep_alive,
+            num_ctx=num_ctx,
+            num_predict=args.num_predict,
+            grade_max_attempts=args.grade_max_attempts,
+            grade_rpm=args.grade_rpm,
+            grade_tpm=args.grade_tpm,
+        )
+        options = dict(
+            dataset=args.dataset,
+            num_examples=args.examples,
+            output_file=args.output,
+            generation_concurrency=args.gen_concurrency,
+            grading_concurrency=args.grade_concurrency,
+            queue_size=args.queue_size,
+            dataset_file=args.dataset_file,
+            resume=args.resume,
+            checkpoint_file=args.checkpoint,
+            warmup=not args.no_warmup,
+            adaptive_grading=not args.no_adaptive_grading,
+            shard_index=args.shard_index,
+            num_shards=args.num_shards,
+            quiet=args.quiet,
+            log_file=args.log_file,
+            log_verbosity=args.log_verbosity,
+        )
+        with trace_run(args.trace, args.profile), \
+                live_metrics(args.metrics_port, args.metrics_file, args.metrics_interval):
+            if len(models) > 1:
+                if args.schedule != "file" or isinstance(num_ctx, ContextBuckets):
+                    print("⚠️  多模型对比按数据集顺序运行，不做前缀调度或 num_ctx 分桶排序")
+                results = evaluator.run_comparison(models, **options)
+            else:
+                results = evaluator.run_evaluation(**options, schedule=args.schedule)
+
+        if results:
+            print("\n✅ 评估完成!")
+        else:
+            print("\n❌ 评估失败!")
+
+    except ValueError as e:
+        print(f"\n❌ 错误: {e}")
+        print(f"\n💡 提示: 请设置 {grader_class.API_KEY_ENV} 环境变量或使用 --api-key 参数")
+    except Exception as e:
+        print(f"\n❌ 意外错误: {e}")
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Prefix-aware ordering of HealthBench examples.
+
+Ollama keeps the KV cache of the previous prompt and only evaluates the
+tokens after the longest prefix the next prompt shares with it. Many
+HealthBench conversations share their opening turns, but in file order
+they are scattered. ``PrefixScheduler`` reorders the examples within a
+window so conversations that share a prefix run back to back. Conversations
+are grouped by their first message, the groups are ordered by length
+bucket, and each group is sorted by its message sequence.
+
+``ContextBuckets`` sizes each request's ``num_ctx`` from an estimate of its
+prompt length. Ollama reloads the model whenever ``num_ctx`` changes, so
+the sizes are rounded up to a few buckets and the scheduler runs each
+window's examples bucket by bucket (smallest first): one reload per bucket
+and window rather than one per change.
+
+The evaluators still write results in dataset order. ``ReorderBuffer``
+holds results that finish early until everything before them is done;
+reordering within a bounded window keeps that backlog bounded too.
+"""
+
+import math
+import os
+import threading
+from collections import Counter
+from itertools import chain, islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Rough characters per token for mixed Chinese/English, as in healthbench_limits.estimate_tokens
+CHARS_PER_TOKEN = 2
+
+DEFAULT_WINDOW = 2000
+
+NUM_CTX_BUCKETS = (2048, 4096, 8192, 16384, 32768)
+# Reply tokens reserved in the context when num_predict is not capped
+DEFAULT_REPLY_TOKENS = 1024
+# Chat template tokens added around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+Message = Tuple[str, str]
+
+
+def message_key(prompt: Sequence[Dict[str, Any]]) -> Tuple[Message, ...]:
+    return tuple((message.get("role", ""), message.get("content", "")) for message in prompt)
+
+
+def prompt_chars(messages: Sequence[Message]) -> int:
+    return sum(len(role) + len(content) for role, content in messages)
+
+
+def shared_prefix_chars(a: Sequence[Message], b: Sequence[Message]) -> int:
+    """Characters at the start of two conversations that are identical (role and content)."""
+    total = 0
+    for (role_a, content_a), (role_b, content_b) in zip(a, b):
+        if role_a != role_b:
+            break
+        if content_a != content_b:
+            total += len(role_a) + len(os.path.commonprefix([content_a, content_b]))
+            break
+        total += len(role_a) + len(content_a)
+    return total
+
+
+def length_bucket(chars: int, smallest_tokens: int = 256) -> int:
+    """Power-of-two bucket of the estimated prompt tokens: 0 for up to ``smallest_tokens``, then 1, 2, ..."""
+    tokens = chars / CHARS_PER_TOKEN
+    return 0 if tokens <= smallest_tokens else math.ceil(math.log2(tokens / smallest_tokens))
+
+
+class ContextBuckets:
+    """
+    Per-request ``num_ctx`` rounded up to one of a few bucket sizes.
+
+    The context must hold the prompt plus the reply: ``num_predict`` tokens
+    if capped, else ``DEFAULT_REPLY_TOKENS``. Prompts that need more than
+    the largest bucket get the largest bucket (Ollama truncates them).
+    """
+
+    def __init__(self, sizes: Sequence[int] = NUM_CTX_BUCKETS, num_predict: Optional[int] = None):
+        self.sizes = tuple(sorted(sizes))
+        self.reply_tokens = num_predict or DEFAULT_REPLY_TOKENS
+
+    def estimate_tokens(self, messages: Sequence[Dict[str, Any]]) -> int:
+        chars = sum(len(message.get("content", "")) for message in messages)
+        return chars // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS * len(messages) + self.reply_tokens
+
+    def bucket(self, messages: Sequence[Dict[str, Any]]) -> int:
+        """Index into ``sizes`` of the smallest bucket that fits ``messages``."""
+        needed = self.estimate_tokens(messages)
+        for index, size in enumerate(self.sizes):
+            if needed <= size:
+                return index
+        return len(self.sizes) - 1
+
+    def num_ctx_for(self, messages: Sequence[Dict[str, Any]]) -> int:
+        return self.sizes[self.bucket(messages)]
+
+
+def parse_num_ctx(value: Optional[str], num_predict: Optional[int] = None) -> Union[None, int, ContextBuckets]:
+    """``--num-ctx``: "auto" for per-example buckets, a number for a fixed context, None for the model default."""
+    if value is None:
+        return None
+    if value.strip().lower() == "auto":
+        return ContextBuckets(num_predict=num_predict)
+    return int(value)
+
+
+class PrefixScheduler:
+    """
+    Reorder test cases so shared conversation prefixes are evaluated consecutively.
+
+    ``schedule(numbered)`` reorders ``(position, test_case)`` pairs, where
+    ``position`` is the 1-based index in the dataset. The cases are
+    reordered ``window`` at a time, so the dataset is still read lazily. The
+    scheduler tracks how many prompt tokens could come from the prompt cache
+    in the scheduled order and in file order. The estimate assumes each
+    request reuses the prompt of the request before it, as with one Ollama
+    slot (OLLAMA_NUM_PARALLEL=1).
+
+    With ``context`` the cases are first ordered by ``num_ctx`` bucket, so
+    the model is reloaded once per bucket. With ``group_prefixes`` off,
+    cases keep their file order within each bucket.
+    """
+
+    def __init__(self, window: Optional[int] = None, context: Optional[ContextBuckets] = None,
+                 group_prefixes: bool = True):
+        self.window = max(1, window or DEFAULT_WINDOW)
+        self.context = context
+        self.group_prefixes = group_prefixes
+        self.buckets: Counter = Counter()
+        self.examples = 0
+        self.groups = 0
+        self.prompt_chars = 0
+        self.file_order_reused_chars = 0
+        self.scheduled_reused_chars = 0
+        self._previous_file: Tuple[Message, ...] = ()
+        self._previous_scheduled: Tuple[Message, ...] = ()
+
+    def order(self, batch: List[Tuple[int, Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any]]]:
+        """Order one window of ``(position, test_case)`` pairs."""
+        # Group key: (num_ctx bucket, first message), or (bucket, position) without prefix grouping
+        groups: Dict[Tuple[int, Any], List[Tuple[Tuple[Message, ...], int, Dict[str, Any]]]] = {}
+        for position, test_case in batch:
+            prompt = test_case.get("prompt", [])
+            key = message_key(prompt)
+            bucket = self.context.bucket(prompt) if self.context is not None else 0
+            if self.context is not None:
+                self.buckets[self.context.sizes[bucket]] += 1
+            root = (key[0] if key else ("", "")) if self.group_prefixes else position
+            groups.setdefault((bucket, root), []).append((key, position, test_case))
+            self.examples += 1
+            self.prompt_chars += prompt_chars(key)
+            self.file_order_reused_chars += shared_prefix_chars(self._previous_file, key)
+            self._previous_file = key
+        self.groups += len(groups)
+
+        def group_order(group):
+            (bucket, root), members = group
+            if not self.group_prefixes:
+                return (bucket, 0, root)
+            return (bucket, length_bucket(max(prompt_chars(key) for key, _, _ in members)), root)
+
+        ordered = []
+        for _, members in sorted(groups.items(), key=group_order):
+            members.sort(key=lambda member: (member[0], member[1]))
+            for key, position, test_case in members:
+                self.scheduled_reused_chars += shared_prefix_chars(self._previous_scheduled, key)
+                self._previous_scheduled = key
+                ordered.append((position, test_case))
+        return ordered
+
+    def schedule(self, numbered: Iterable[Tuple[int, Dict[str, Any]]]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        source = iter(numbered)
+        while True:
+            batch = list(islice(source, self.window))
+            if not batch:
+                return
+            yield from self.order(batch)
+
+    def summary(self) -> Dict[str, Any]:
+        """Estimated prompt tokens served from the prompt cache, scheduled vs. file order."""
+        scheduled = self.scheduled_reused_chars // CHARS_PER_TOKEN
+        file_order = self.file_order_reused_chars // CHARS_PER_TOKEN
+        prompt_tokens = self.prompt_chars // CHARS_PER_TOKEN
+        return {
+            "window": self.window,
+            "group_prefixes": self.group_prefixes,
+            "num_ctx_buckets": {str(size): count for size, count in sorted(self.buckets.items())} or None,
+            "examples": self.examples,
+            "prefix_groups": self.groups if self.group_prefixes else None,
+            "estimated_prompt_tokens": prompt_tokens,
+            "estimated_reused_tokens": scheduled,
+            "estimated_reused_tokens_file_order": file_order,
+            "estimated_saved_tokens": scheduled - file_order,
+            "estimated_saved_fraction": ((scheduled - file_order) / prompt_tokens) if prompt_tokens else 0.0,
+        }
+
+
+class ReorderBuffer:
+    """
+    Release results in position order (1, 2, 3, ...) whatever order they arrive in.
+
+    ``push(position, None)`` marks a position that produced no result (a
+    skipped example) so it does not hold back the rest. ``flush`` releases
+    everything still buffered, in order, for runs that stopped early. The
+    evaluators push checkpoint offsets rather than result records, so a
+    long backlog costs a few bytes per result.
+    """
+
+    def __init__(self, emit: Callable[[int, Any], None]):
+        self.emit = emit
+        self.max_buffered = 0
+        self._next = 1
+        self._pending: Dict[int, Optional[Any]] = {}
+        self._lock = threading.Lock()
+
+    def _release(self, position: int, value: Optional[Any]):
+        if value is not None:
+            self.emit(position, value)
+
+    def push(self, position: int, value: Optional[Any]):
+        with self._lock:
+            self._pending[position] = value
+            self.max_buffered = max(self.max_buffered, len(self._pending))
+            while self._next in self._pending:
+                self._release(self._next, self._pending.pop(self._next))
+                self._next += 1
+
+    def flush(self):
+        with self._lock:
+            for position in sorted(self._pending):
+                self._release(position, self._pending.pop(position))
+
+
+def peek(items: Iterable[Any]) -> Tuple[Optional[Any], Iterator[Any]]:
+    """First element of ``items`` (None if empty) and an iterator that still yields it."""
+    iterator = iter(items)
+    first = next(iterator, None)
+    return first, (iterator if first is None else chain([first], iterator))
+
+
+def make_scheduler(schedule: str, num_ctx: Union[None, int, ContextBuckets] = None) -> Optional[PrefixScheduler]:
+    """Scheduler for ``--schedule`` and ``--num-ctx``, or None to keep file order."""
+    context = num_ctx if isinstance(num_ctx, ContextBuckets) else None
+    if schedule == "prefix":
+        return PrefixScheduler(context=context)
+    if context is not None:
+        return PrefixScheduler(context=context, group_prefixes=False)
+    return None
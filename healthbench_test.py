@@ -6,7 +6,7 @@ This is a simplified version that doesn't require the full simple-evals framewor
 
 import json
 import time
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Tuple
 
 try:
     import requests
@@ -14,6 +14,21 @@ except ImportError:
     print("Error: Please install requests: pip install requests")
     exit(1)
 
+from healthbench_rules import Rule, RuleSet
+
+# Simple heuristic matching: the first rule whose criteria keywords match
+# decides the item. "helpful" and "cause" fall through to later rules when
+# the response does not satisfy them.
+HEURISTIC_RULES = RuleSet([
+    Rule("helpful", criterion=["helpful"], min_length=50, fallthrough=True),
+    Rule("cause", criterion=["cause"], response=["可能", "原因", "因为"], fallthrough=True),
+    Rule("doctor", criterion=["doctor", "medical"], response=["医生", "就医", "医院"]),
+    Rule("emergency", criterion=["emergency", "urgent"], response=["立即", "马上", "急救", "急诊"]),
+    Rule("specific", criterion=["specific", "guidance"], min_length=100),
+    Rule("disclaimer", criterion=["disclaimer"], response=["仅供参考", "不能替代", "请咨询医生"]),
+    Rule("actionable", criterion=["actionable", "instruction"], min_length=50, min_sentences=2),
+], mode="first", criterion_field="criteria")
+
 
 class OllamaClient:
     """Simple Ollama client for testing."""
@@ -141,44 +156,11 @@ class SimpleHealthBenchTester:
 
     def evaluate_response(self, response: str, rubric: List[Dict]) -> Dict[str, Any]:
         """Simple heuristic evaluation of response against rubric."""
-        scores = []
-        total_points = sum(item["points"] for item in rubric)
-
-        for item in rubric:
-            criteria = item["criteria"].lower()
-            response_lower = response.lower()
-
-            # Simple heuristic matching
-            met = False
-
-            if "helpful" in criteria and len(response) > 50:
-                met = True
-            elif "cause" in criteria and ("可能" in response_lower or "原因" in response_lower or "因为" in response_lower):
-                met = True
-            elif "doctor" in criteria or "medical" in criteria:
-                if "医生" in response_lower or "就医" in response_lower or "医院" in response_lower:
-                    met = True
-            elif "emergency" in criteria or "urgent" in criteria:
-                if "立即" in response_lower or "马上" in response_lower or "急救" in response_lower or "急诊" in response_lower:
-                    met = True
-            elif "specific" in criteria or "guidance" in criteria:
-                if len(response) > 100:
-                    met = True
-            elif "disclaimer" in criteria:
-                if "仅供参考" in response_lower or "不能替代" in response_lower or "请咨询医生" in response_lower:
-                    met = True
-            elif "actionable" in criteria or "instruction" in criteria:
-                if len(response) > 50 and len(response.split("。")) >= 2:
-                    met = True
-
-            if met:
-                scores.append(item["points"])
+        return HEURISTIC_RULES.evaluate(response, rubric)
 
-        return {
-            "score": sum(scores),
-            "max_score": total_points,
-            "percentage": (sum(scores) / total_points * 100) if total_points > 0 else 0,
-        }
+    def evaluate_responses(self, pairs: Iterable[Tuple[str, List[Dict]]]) -> List[Dict[str, Any]]:
+        """Simple heuristic evaluation of many ``(response, rubric)`` pairs."""
+        return HEURISTIC_RULES.evaluate_batch(pairs)
 
     def run_evaluation(self, num_examples: int = 10) -> Dict[str, Any]:
         """Run evaluation on test cases."""
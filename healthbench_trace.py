@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Lightweight tracing spans and a thread-aware profiler for the evaluators.
+
+``TRACER.span(name, **args)`` times a block on the current thread. Spans
+are only recorded after ``TRACER.start()``; until then ``span`` returns a
+shared no-op context manager, so the instrumentation stays in place at
+negligible cost. ``TRACER.tagged(prompt_id=...)`` attaches tags to every
+span its thread opens inside the block, so client and grader spans deep in
+the call stack carry the example they belong to. Each span records the
+worker (thread name) that ran it.
+
+``export`` writes the spans in the Chrome trace event format, which
+chrome://tracing and https://ui.perfetto.dev open directly. Every worker
+thread gets its own track.
+
+``ThreadProfiler`` profiles every thread started while it is active and
+merges the results into one hotspot report. Before Python 3.12 cProfile
+only sees the calling thread, so a profiler is started in each new thread.
+From 3.12 cProfile is built on ``sys.monitoring`` and already covers all
+threads; only one profiler may be active there.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Recorded spans are kept in memory until export; beyond this they are counted but dropped
+DEFAULT_MAX_EVENTS = 2_000_000
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._record(self.name, self.start, end, self.args)
+        return False
+
+
+class Tracer:
+    """Collects spans from all threads; disabled until ``start``."""
+
+    def __init__(self, max_events: int = DEFAULT_MAX_EVENTS):
+        self.enabled = False
+        self.max_events = max_events
+        self.dropped = 0
+        self._events: List[tuple] = []
+        self._threads: Dict[int, str] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+
+    def start(self):
+        with self._lock:
+            self._events = []
+            self._threads = {}
+            self.dropped = 0
+            self._origin = time.perf_counter_ns()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+
+    def span(self, name: str, **args: Any):
+        """Context manager timing one block; ``args`` (and the thread's tags) are attached to the span."""
+        if not self.enabled:
+            return _NULL_SPAN
+        tags = getattr(self._local, "tags", None)
+        return _Span(self, name, {**tags, **args} if tags else args)
+
+    @contextmanager
+    def tagged(self, **tags: Any) -> Iterator[None]:
+        """Attach ``tags`` to every span this thread opens inside the block."""
+        if not self.enabled:
+            yield
+            return
+        previous = getattr(self._local, "tags", None)
+        self._local.tags = {**previous, **tags} if previous else tags
+        try:
+            yield
+        finally:
+            self._local.tags = previous
+
+    def _record(self, name: str, start: int, end: int, args: Dict[str, Any]):
+        thread = threading.current_thread()
+        with self._lock:
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                return
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append((name, start, end, thread.ident, args))
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Count, total and mean/max duration in seconds per span name, slowest total first."""
+        totals: Dict[str, List[float]] = {}
+        with self._lock:
+            for name, start, end, _, _ in self._events:
+                entry = totals.setdefault(name, [0, 0.0, 0.0])
+                duration = (end - start) / 1e9
+                entry[0] += 1
+                entry[1] += duration
+                entry[2] = max(entry[2], duration)
+        return {
+            name: {"count": count, "total": total, "mean": total / count, "max": longest}
+            for name, (count, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1])
+        }
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Spans as Chrome trace "complete" events (timestamps in microseconds), one track per thread."""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        tids = {ident: tid for tid, ident in enumerate(threads, 1)}
+        trace_events: List[Dict[str, Any]] = [
+            {"ph": "M", "name": "process_name", "pid": pid, "tid": 0, "args": {"name": "healthbench"}},
+        ]
+        for ident, name in threads.items():
+            trace_events.append({"ph": "M", "name": "thread_name", "pid": pid, "tid": tids[ident],
+                                 "args": {"name": name}})
+        for name, start, end, ident, args in events:
+            trace_events.append({
+                "ph": "X",
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "pid": pid,
+                "tid": tids[ident],
+                "ts": (start - self._origin) / 1e3,
+                "dur": (end - start) / 1e3,
+                "args": {"worker": threads[ident], **args},
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms",
+                "otherData": {"dropped_spans": self.dropped}}
+
+    def export(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False, default=str)
+
+
+# Process-wide tracer used by the instrumented modules
+TRACER = Tracer()
+
+
+# From 3.12 one cProfile.Profile sees every thread, and a second enable() raises ValueError
+PROFILE_COVERS_THREADS = sys.version_info >= (3, 12)
+
+
+class ThreadProfiler:
+    """
+    cProfile across threads: the calling thread plus every thread started
+    while the profiler is active, merged into one ``pstats.Stats``.
+    """
+
+    def __init__(self):
+        self._profiles: List[cProfile.Profile] = []
+        self._main: Optional[cProfile.Profile] = None
+        self._lock = threading.Lock()
+
+    def _start_thread(self, frame, event, arg):
+        # Installed with threading.setprofile: runs on a new thread's first
+        # event and replaces itself with a per-thread profiler
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def __enter__(self) -> "ThreadProfiler":
+        if not PROFILE_COVERS_THREADS:
+            threading.setprofile(self._start_thread)
+        self._main = cProfile.Profile()
+        self._main.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self._main.disable()
+        if not PROFILE_COVERS_THREADS:
+            threading.setprofile(None)
+        return False
+
+    def stats(self) -> pstats.Stats:
+        stats = pstats.Stats(self._main)
+        with self._lock:
+            for profile in self._profiles:
+                try:
+                    stats.add(profile)
+                except TypeError:
+                    # A thread that never made a call has no stats
+                    pass
+        return stats
+
+    def report(self, path: str, limit: int = 40):
+        """Write the hotspots sorted by own time and by cumulative time, plus the raw stats as ``<path>.prof``."""
+        stats = self.stats()
+        stats.dump_stats(f"{path}.prof")
+        threads = "all threads" if PROFILE_COVERS_THREADS else f"{len(self._profiles) + 1} threads"
+        with open(path, 'w', encoding='utf-8') as f:
+            for sort, title in (("tottime", "own time"), ("cumulative", "cumulative time")):
+                buffer = io.StringIO()
+                stats.stream = buffer
+                stats.sort_stats(sort).print_stats(limit)
+                f.write(f"=== Top {limit} functions by {title} ({threads}) ===\n")
+                f.write(buffer.getvalue())
+                f.write("\n")
+
+
+@contextmanager
+def trace_run(trace_path: Optional[str] = None, profile_path: Optional[str] = None) -> Iterator[None]:
+    """
+    ``--trace`` / ``--profile`` around a run: record spans and/or profile
+    every thread, then write the Chrome trace and the hotspot report, even
+    when the run fails or is interrupted.
+    """
+    profiler = ThreadProfiler() if profile_path else None
+    if trace_path:
+        TRACER.start()
+    try:
+        if profiler is not None:
+            with profiler:
+                yield
+        else:
+            yield
+    finally:
+        if trace_path:
+            TRACER.stop()
+            TRACER.export(trace_path)
+            print(f"🧭 Trace written to {trace_path} (open in https://ui.perfetto.dev or chrome://tracing)")
+            for name, entry in list(TRACER.summary().items())[:8]:
+                print(f"   {name:<22} {entry['count']:>6} spans, total {entry['total']:.2f}s, "
+                      f"mean {entry['mean'] * 1000:.1f}ms, max {entry['max'] * 1000:.1f}ms")
+        if profiler is not None:
+            profiler.report(profile_path)
+            print(f"🔬 Profile written to {profile_path} (raw stats: {profile_path}.prof)")
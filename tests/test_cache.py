@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from healthbench_cache import ResponseCache, fetch_endpoints_digest
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeTransport:
+    """``/api/show`` replies with a per-host digest."""
+
+    def __init__(self, digests):
+        self.digests = digests
+
+    def post(self, url, json=None, read_timeout=None):
+        return FakeResponse({"digest": self.digests[url.rsplit("/api/show", 1)[0]]})
+
+
+def test_endpoints_digest_agrees():
+    transport = FakeTransport({"http://a": "sha256:1", "http://b": "sha256:1"})
+    assert fetch_endpoints_digest(transport, ["http://a", "http://b"], "m") == "sha256:1"
+
+
+def test_endpoints_digest_disables_cache_on_mismatch(capsys):
+    transport = FakeTransport({"http://a": "sha256:1", "http://b": "sha256:2"})
+    assert fetch_endpoints_digest(transport, ["http://a", "http://b"], "m") is None
+    assert "different builds" in capsys.readouterr().out
+
+
+def test_response_cache_is_not_shared_across_builds(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite"))
+    calls = []
+
+    def client(digests):
+        return SimpleNamespace(
+            model="m",
+            transport=FakeTransport(digests),
+            endpoints=SimpleNamespace(urls=list(digests)),
+            base_url=next(iter(digests)),
+            build_payload=lambda messages: {"messages": messages},
+            chat_with_stats=lambda messages: (calls.append(1) or "answer", {}),
+        )
+
+    messages = [{"role": "user", "content": "hi"}]
+    same = client({"http://a": "sha256:1", "http://b": "sha256:1"})
+    assert cache.chat(same, messages) == ("answer", False)
+    assert cache.chat(same, messages) == ("answer", True)
+
+    mixed = client({"http://c": "sha256:1", "http://d": "sha256:2"})
+    assert cache.chat(mixed, messages) == ("answer", False)
+    assert cache.chat(mixed, messages) == ("answer", False)
+    assert len(calls) == 3
+    cache.close()
@@ -0,0 +1,207 @@
+import threading
+
+import pytest
+
+import healthbench_limits
+from healthbench_limits import (
+    AdaptiveLimiter,
+    MalformedResponseError,
+    OverloadError,
+    RetryPolicy,
+    TokenBucket,
+    TransientError,
+    parse_grader_json,
+)
+
+
+def test_parse_grader_json_accepts_scored_object():
+    assert parse_grader_json('{"score": 3, "max_score": 5}') == {"score": 3, "max_score": 5}
+
+
+@pytest.mark.parametrize("text", [
+    "not json",
+    "[1, 2]",
+    '{"reasoning": "no score"}',
+    '{"score": "3"}',
+    '{"score": null}',
+    '{"score": true}',
+])
+def test_parse_grader_json_rejects_malformed_replies(text):
+    with pytest.raises(MalformedResponseError) as excinfo:
+        parse_grader_json(text)
+    assert excinfo.value.raw == text
+
+
+class FakeClock:
+    """Stands in for the ``time`` module in healthbench_limits; ``sleep`` advances the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(healthbench_limits, "time", fake)
+    return fake
+
+
+def call_taking(clock, seconds, error=None):
+    def fn():
+        clock.now += seconds
+        if error is not None:
+            raise error
+        return "ok"
+    return fn
+
+
+def test_limiter_increases_additively_up_to_max(clock):
+    limiter = AdaptiveLimiter(max_limit=4, initial_limit=2)
+    # Each success adds 1/limit: 2 -> 2.5 -> 2.9 -> 3.24
+    for _ in range(2):
+        limiter.call(call_taking(clock, 1.0))
+    assert limiter.current_limit == 2
+    limiter.call(call_taking(clock, 1.0))
+    assert limiter.current_limit == 3
+    for _ in range(20):
+        limiter.call(call_taking(clock, 1.0))
+    assert limiter.current_limit == 4
+    assert limiter.summary()["increases"] == 2
+
+
+def test_limiter_does_not_grow_while_latency_rises(clock):
+    limiter = AdaptiveLimiter(max_limit=8, initial_limit=2)
+    limiter.call(call_taking(clock, 1.0))
+    limit = limiter.limit
+    limiter.call(call_taking(clock, 5.0))
+    assert limiter.limit == limit
+
+
+def test_limiter_decreases_once_per_overload_episode(clock):
+    limiter = AdaptiveLimiter(max_limit=16, initial_limit=16, min_limit=2)
+    limiter.call(call_taking(clock, 1.0))
+    for _ in range(3):
+        with pytest.raises(OverloadError):
+            limiter.call(call_taking(clock, 0.0, OverloadError("429", status=429)))
+    assert limiter.current_limit == 8
+    # A new overload a latency interval later cuts again, down to min_limit
+    for _ in range(3):
+        clock.now += 1.0
+        with pytest.raises(OverloadError):
+            limiter.call(call_taking(clock, 0.0, OverloadError("503", status=503)))
+    assert limiter.current_limit == 2
+    summary = limiter.summary()
+    assert (summary["overloads"], summary["decreases"]) == (6, 4)
+
+
+def test_limiter_counts_retry_after_and_plain_errors(clock):
+    limiter = AdaptiveLimiter(max_limit=4)
+    with pytest.raises(OverloadError):
+        limiter.call(call_taking(clock, 0.0, OverloadError("429", retry_after=5, status=429)))
+    with pytest.raises(ValueError):
+        limiter.call(call_taking(clock, 0.0, ValueError("bug")))
+    summary = limiter.summary()
+    assert (summary["retry_after_waits"], summary["errors"], summary["calls"]) == (1, 1, 2)
+    assert limiter.in_flight == 0
+
+
+def test_limiter_caps_calls_in_flight():
+    limiter = AdaptiveLimiter(max_limit=2, initial_limit=2)
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def fn():
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        threading.Event().wait(0.01)
+        with lock:
+            running[0] -= 1
+
+    threads = [threading.Thread(target=limiter.call, args=(fn,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert running[1] == 2
+
+
+def test_retry_delay_doubles_up_to_max_and_honours_retry_after(monkeypatch):
+    monkeypatch.setattr(healthbench_limits.random, "uniform", lambda low, high: high)
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    assert [policy.delay(retry) for retry in range(1, 6)] == [1.0, 2.0, 4.0, 8.0, 10.0]
+    assert policy.delay(1, retry_after=30.0) == 30.0
+    monkeypatch.setattr(healthbench_limits.random, "uniform", lambda low, high: low)
+    assert policy.delay(3) == 0.0
+    assert policy.delay(3, retry_after=2.5) == 2.5
+
+
+def test_retry_policy_retries_transient_errors(clock, monkeypatch):
+    monkeypatch.setattr(healthbench_limits.random, "uniform", lambda low, high: high)
+    errors = [OverloadError("429", status=429), OverloadError("timeout"), TransientError("reset")]
+
+    def fn():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    policy = RetryPolicy(max_attempts=5, base_delay=1.0)
+    assert policy.call(fn) == "ok"
+    assert clock.sleeps == [1.0, 2.0, 4.0]
+    summary = policy.summary()
+    assert summary["retries_by_reason"] == {"rate_limited": 1, "timeout": 1, "connection": 1}
+    assert (summary["attempts"], summary["exhausted"]) == (4, 0)
+
+
+def test_retry_policy_gives_up(clock):
+    policy = RetryPolicy(max_attempts=3, max_reasks=1)
+    with pytest.raises(OverloadError):
+        policy.call(call_taking(clock, 0.0, OverloadError("503", status=503)))
+    assert policy.attempts == 3
+    # Unparseable replies are re-asked at most max_reasks times
+    with pytest.raises(MalformedResponseError):
+        policy.call(call_taking(clock, 0.0, MalformedResponseError("bad", raw="x")))
+    assert policy.attempts == 5
+    # Other exceptions are not retried at all
+    with pytest.raises(KeyError):
+        policy.call(call_taking(clock, 0.0, KeyError("score")))
+    summary = policy.summary()
+    assert (summary["attempts"], summary["exhausted"], summary["non_retryable"]) == (6, 2, 1)
+
+
+def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.acquire(60) == 0.0
+    # One token per second
+    assert bucket.acquire(3) == pytest.approx(3.0)
+    clock.now += 120
+    assert bucket.tokens <= bucket.capacity
+    assert bucket.acquire(60) == 0.0
+
+
+def test_token_bucket_caps_requests_larger_than_capacity(clock):
+    bucket = TokenBucket(per_minute=60, capacity=10)
+    assert bucket.acquire(500) == 0.0
+    assert bucket.acquire(5) == pytest.approx(5.0)
+
+
+def test_token_bucket_adjust_charges_actual_usage(clock):
+    bucket = TokenBucket(per_minute=60)
+    bucket.acquire(30)
+    # The reply used 40 tokens more than reserved: the next 40 must be earned back first
+    bucket.adjust(40)
+    assert bucket.tokens == pytest.approx(-10)
+    assert bucket.acquire(5) == pytest.approx(15.0)
+    bucket.adjust(-1000)
+    assert bucket.tokens == bucket.capacity
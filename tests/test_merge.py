@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+from healthbench_dataset import shard_of
+from healthbench_merge import MergeError, merge_results
+
+NUM_SHARDS = 3
+PROMPT_IDS = [f"p{n}" for n in range(30)]
+
+
+def result(prompt_id, score=2):
+    return {"prompt_id": prompt_id, "rubric_score": score, "rubric_max": 4, "percentage": score / 4 * 100,
+            "response_time": 1.0, "tags": ["theme:test"]}
+
+
+def write_shard(tmp_path, index, results=None, **fields):
+    if results is None:
+        results = [result(prompt_id) for prompt_id in PROMPT_IDS if shard_of(prompt_id, NUM_SHARDS) == index]
+    data = {"model": "mock-a", "dataset": "test", "num_examples": None, "grader": "heuristic",
+            "shard": {"index": index, "count": NUM_SHARDS}, "results": results,
+            "total_examples": len(results), "evaluated_examples": len(results), "failed_examples": 0, **fields}
+    path = tmp_path / f"shard{index}.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return str(path)
+
+
+def test_merge_combines_all_shards(tmp_path):
+    paths = [write_shard(tmp_path, index) for index in range(NUM_SHARDS)]
+    output = str(tmp_path / "merged.json")
+    summary = merge_results(paths, output)
+    assert summary["evaluated_examples"] == len(PROMPT_IDS)
+    assert summary["total_score"] == 2 * len(PROMPT_IDS)
+    assert summary["average_percentage"] == 50.0
+    assert [shard["index"] for shard in summary["shards"]] == list(range(NUM_SHARDS))
+    with open(output, encoding="utf-8") as f:
+        merged = json.load(f)
+    assert sorted(record["prompt_id"] for record in merged["results"]) == sorted(PROMPT_IDS)
+
+
+def test_merge_reports_missing_shards_and_leaves_no_output(tmp_path):
+    output = str(tmp_path / "merged.json")
+    with pytest.raises(MergeError, match=r"Missing shard\(s\): 1 of 3"):
+        merge_results([write_shard(tmp_path, 0), write_shard(tmp_path, 2)], output)
+    # Neither the output nor its temporary file is left behind
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("merged")]
+
+
+def test_merge_rejects_the_same_shard_twice(tmp_path):
+    first = write_shard(tmp_path, 0)
+    copy = str(tmp_path / "copy.json")
+    with open(first, encoding="utf-8") as src, open(copy, "w", encoding="utf-8") as dst:
+        dst.write(src.read())
+    with pytest.raises(MergeError, match="shard 0 already merged"):
+        merge_results([first, copy], str(tmp_path / "merged.json"))
+
+
+def test_merge_rejects_overlapping_prompt_ids(tmp_path):
+    stray = next(prompt_id for prompt_id in PROMPT_IDS if shard_of(prompt_id, NUM_SHARDS) == 0)
+    own = [result(prompt_id) for prompt_id in PROMPT_IDS if shard_of(prompt_id, NUM_SHARDS) == 1]
+    paths = [write_shard(tmp_path, 0), write_shard(tmp_path, 1, own + [result(stray)]), write_shard(tmp_path, 2)]
+    with pytest.raises(MergeError, match=f"prompt_id '{stray}' appears in more than one shard"):
+        merge_results(paths, str(tmp_path / "merged.json"))
+
+
+def test_merge_rejects_results_filed_under_the_wrong_shard(tmp_path):
+    stray = next(prompt_id for prompt_id in PROMPT_IDS if shard_of(prompt_id, NUM_SHARDS) == 2)
+    own = [result(prompt_id) for prompt_id in PROMPT_IDS if shard_of(prompt_id, NUM_SHARDS) == 0]
+    with pytest.raises(MergeError, match=f"prompt_id '{stray}' does not belong to shard 0"):
+        merge_results([write_shard(tmp_path, 0, own + [result(stray)])], str(tmp_path / "merged.json"))
+
+
+def test_merge_rejects_mismatched_and_partial_shards(tmp_path):
+    with pytest.raises(MergeError, match="model is 'mock-b'"):
+        merge_results([write_shard(tmp_path, 0), write_shard(tmp_path, 1, model="mock-b")],
+                      str(tmp_path / "merged.json"))
+    partial = [write_shard(tmp_path, 0), write_shard(tmp_path, 1, partial=True), write_shard(tmp_path, 2)]
+    with pytest.raises(MergeError, match="shard 1 is partial"):
+        merge_results(partial, str(tmp_path / "merged.json"))
+    assert merge_results(partial, str(tmp_path / "merged.json"), allow_partial=True)["partial"]
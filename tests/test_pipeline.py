@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from healthbench_deepseek_eval import DeepSeekGrader, HealthBenchDeepSeekEvaluator
+from healthbench_mock_server import MockConfig, MockServer, synthetic_dataset, write_dataset
+from healthbench_pipeline import Pipeline
+from healthbench_real import HealthBenchEvaluator
+from healthbench_schedule import ContextBuckets
+
+
+def test_pipeline_groups_never_overlap():
+    running = {}
+    overlaps = []
+    lock = threading.Lock()
+
+    def generate(index, item):
+        group, value = item
+        with lock:
+            if any(count for other, count in running.items() if other != group):
+                overlaps.append(index)
+            running[group] = running.get(group, 0) + 1
+        time.sleep(0.002)
+        with lock:
+            running[group] -= 1
+        return value
+
+    items = [("a", n) for n in range(10)] + [("b", n) for n in range(10)] + [("c", n) for n in range(10)]
+    pipeline = Pipeline(generate, lambda index, value: value, generation_workers=4,
+                        group_key=lambda item: item[0])
+    assert pipeline.run(items) == [value for _, value in items]
+    assert overlaps == []
+    assert pipeline.summary()["group_drains"] == 2
+
+
+# Replies up to 4000 tokens put the synthetic prompts in two num_ctx buckets
+NUM_PREDICT = 4000
+
+
+@pytest.fixture
+def bucketed_dataset(tmp_path):
+    path = tmp_path / "mock.jsonl"
+    write_dataset(str(path), 40)
+    context = ContextBuckets(num_predict=NUM_PREDICT)
+    sizes = sorted({context.num_ctx_for(case["prompt"]) for case in synthetic_dataset(40)})
+    assert len(sizes) > 1
+    return str(path), sizes
+
+
+@pytest.fixture
+def mock_server():
+    with MockServer(MockConfig(time_scale=0.002, load_time=1.0)) as server:
+        yield server
+
+
+def delay_bucket(evaluator, num_ctx, seconds=0.05):
+    """Hold back one bucket's chat requests, so without draining they reach Ollama after the next bucket's."""
+    transport = evaluator.client.transport
+    post = transport.post
+
+    def delayed_post(url, json=None, **kwargs):
+        if json and json.get("messages") and json.get("options", {}).get("num_ctx") == num_ctx:
+            time.sleep(seconds)
+        return post(url, json=json, **kwargs)
+
+    transport.post = delayed_post
+
+
+def test_bucketed_run_loads_model_once_per_bucket(tmp_path, bucketed_dataset, mock_server):
+    dataset_file, sizes = bucketed_dataset
+    evaluator = HealthBenchDeepSeekEvaluator(
+        model="mock-a",
+        ollama_base_url=mock_server.url,
+        use_cache=False,
+        num_ctx=ContextBuckets(num_predict=NUM_PREDICT),
+        grader=DeepSeekGrader(api_key="mock", base_url=f"{mock_server.url}/v1"),
+    )
+    delay_bucket(evaluator, sizes[0])
+    evaluator.run_evaluation(dataset_file=dataset_file, output_file=str(tmp_path / "results.json"),
+                             generation_concurrency=4, grading_concurrency=4, quiet=True)
+    assert mock_server.backend.stats["model_loads"] == len(sizes)
+
+
+def test_real_bucketed_run_loads_model_once_per_bucket(tmp_path, bucketed_dataset, mock_server):
+    dataset_file, sizes = bucketed_dataset
+    evaluator = HealthBenchEvaluator(
+        model="mock-a",
+        ollama_base_url=mock_server.url,
+        use_cache=False,
+        num_ctx=ContextBuckets(num_predict=NUM_PREDICT),
+    )
+    delay_bucket(evaluator, sizes[0])
+    evaluator.run_evaluation(dataset_file=dataset_file, output_file=str(tmp_path / "results.json"),
+                             concurrency=4, quiet=True)
+    assert mock_server.backend.stats["model_loads"] == len(sizes)
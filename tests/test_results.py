@@ -0,0 +1,53 @@
+from healthbench_results import CheckpointWriter, replay_checkpoint
+from healthbench_schedule import ReorderBuffer
+
+
+def test_checkpoint_reads_records_back_by_offset(tmp_path):
+    path = str(tmp_path / "run.checkpoint.jsonl")
+    first = CheckpointWriter(path)
+    first.append({"prompt_id": "a", "response": "先前的运行"})
+    first.close()
+
+    checkpoint = CheckpointWriter(path, append=True)
+    offsets = [checkpoint.append({"prompt_id": f"p{n}", "response": "回答" * n}) for n in range(3)]
+    assert [checkpoint.read(offset)["prompt_id"] for offset in reversed(offsets)] == ["p2", "p1", "p0"]
+    assert checkpoint.read(offsets[2])["response"] == "回答回答"
+    checkpoint.close()
+
+
+def test_replay_writes_old_results_in_dataset_order_among_new_ones(tmp_path):
+    path = str(tmp_path / "run.checkpoint.jsonl")
+    earlier = CheckpointWriter(path)
+    # Completion order of the interrupted run; p2 failed and is retried
+    earlier.append({"prompt_id": "p4"}, 4)
+    earlier.append({"prompt_id": "p2", "error": "timeout"}, 2)
+    earlier.append({"prompt_id": "p1"}, 1)
+    earlier.close()
+
+    checkpoint = CheckpointWriter(path, append=True)
+    written = []
+    reorder = ReorderBuffer(lambda position, offset: written.append(checkpoint.read(offset)))
+    assert replay_checkpoint(path, reorder) == {"p1", "p4"}
+    assert written == [{"prompt_id": "p1"}]
+
+    reorder.push(3, checkpoint.append({"prompt_id": "p3"}, 3))
+    reorder.push(2, checkpoint.append({"prompt_id": "p2"}, 2))
+    checkpoint.close()
+    assert [record["prompt_id"] for record in written] == ["p1", "p2", "p3", "p4"]
+
+
+def test_starting_over_keeps_the_previous_checkpoint(tmp_path):
+    path = str(tmp_path / "run.checkpoint.jsonl")
+    earlier = CheckpointWriter(path)
+    earlier.append({"prompt_id": "p1"}, 1)
+    earlier.close()
+
+    fresh = CheckpointWriter(path)
+    fresh.close()
+    assert fresh.backup_path == f"{path}.bak"
+    assert open(fresh.backup_path, encoding="utf-8").read().startswith('{"prompt_id": "p1"')
+    assert open(path, encoding="utf-8").read() == ""
+    # An empty checkpoint has nothing worth keeping
+    again = CheckpointWriter(path)
+    again.close()
+    assert again.backup_path is None
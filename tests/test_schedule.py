@@ -0,0 +1,63 @@
+import random
+import threading
+
+from healthbench_schedule import ReorderBuffer, peek
+
+
+def test_reorder_buffer_releases_in_position_order():
+    released = []
+    reorder = ReorderBuffer(lambda position, value: released.append((position, value)))
+    reorder.push(3, "c")
+    reorder.push(2, "b")
+    assert released == []
+    reorder.push(1, "a")
+    assert released == [(1, "a"), (2, "b"), (3, "c")]
+    assert reorder.max_buffered == 3
+
+
+def test_reorder_buffer_skips_positions_without_a_result():
+    released = []
+    reorder = ReorderBuffer(lambda position, value: released.append(position))
+    reorder.push(2, "b")
+    reorder.push(1, None)
+    reorder.push(4, "d")
+    assert released == [2]
+    reorder.push(3, None)
+    assert released == [2, 4]
+
+
+def test_reorder_buffer_flush_releases_the_rest_in_order():
+    released = []
+    reorder = ReorderBuffer(lambda position, value: released.append(position))
+    for position in (5, 2, 7):
+        reorder.push(position, position)
+    reorder.flush()
+    assert released == [2, 5, 7]
+    reorder.flush()
+    assert released == [2, 5, 7]
+
+
+def test_reorder_buffer_orders_concurrent_pushes():
+    positions = list(range(1, 501))
+    random.Random(0).shuffle(positions)
+    released = []
+    reorder = ReorderBuffer(lambda position, value: released.append(value))
+    threads = [
+        threading.Thread(target=lambda chunk: [reorder.push(position, position) for position in chunk],
+                         args=(positions[n::4],))
+        for n in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert released == sorted(positions)
+
+
+def test_peek_keeps_the_first_item():
+    first, items = peek(iter([1, 2, 3]))
+    assert first == 1
+    assert list(items) == [1, 2, 3]
+    first, items = peek([])
+    assert first is None
+    assert list(items) == []
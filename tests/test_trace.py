@@ -0,0 +1,48 @@
+import pstats
+from concurrent.futures import ThreadPoolExecutor
+
+from healthbench_trace import TRACER, ThreadProfiler
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_thread_profiler_lets_pool_threads_run(tmp_path):
+    with ThreadProfiler() as profiler:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(busy, 10_000), pool.submit(busy, 20_000)]
+            results = [future.result(timeout=10) for future in futures]
+
+    assert results == [busy(10_000), busy(20_000)]
+    profiled = {function for _, _, function in profiler.stats().stats}
+    assert "busy" in profiled
+
+    report = tmp_path / "profile.txt"
+    profiler.report(str(report))
+    assert "busy" in report.read_text()
+    assert pstats.Stats(f"{report}.prof").total_calls > 0
+
+
+def test_spans_are_tagged_and_exported(tmp_path):
+    TRACER.start()
+    try:
+        with TRACER.tagged(prompt_id="p1"):
+            with TRACER.span("outer", stage="a"):
+                with TRACER.span("inner"):
+                    pass
+    finally:
+        TRACER.stop()
+
+    assert set(TRACER.summary()) == {"outer", "inner"}
+    events = [event for event in TRACER.chrome_trace()["traceEvents"] if event["ph"] == "X"]
+    assert {event["name"]: event["args"]["prompt_id"] for event in events} == {"outer": "p1", "inner": "p1"}
+    TRACER.export(str(tmp_path / "trace.json"))
+
+
+def test_disabled_tracer_records_nothing():
+    TRACER.start()
+    TRACER.stop()
+    with TRACER.span("ignored"):
+        pass
+    assert TRACER.summary() == {}